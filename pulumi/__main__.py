@@ -5,14 +5,31 @@ import pulumi_kubernetes as k8s
 from pulumi_kubernetes import Provider
 
 from src.lib.kubernetes_api_endpoint import KubernetesApiEndpointIp
+from src.lib.helm_release import get_helm_engine, get_helm_releases, get_helm_timeouts
+from src.lib.sizing import get_sizing
+from src.lib.priority import get_priority_class
+from src.priority_classes.deploy import deploy_priority_classes
+from src.node_local_dns.deploy import deploy_node_local_dns
+from src.vpa.deploy import deploy_vpa, get_vpa_namespaces
+from src.descheduler.deploy import deploy_descheduler, get_thresholds as get_descheduler_thresholds
+from src.storage_benchmark.deploy import deploy_storage_benchmark, get_storage_classes as get_benchmark_storage_classes
+from src.network_benchmark.deploy import deploy_network_benchmark, get_paths as get_network_benchmark_paths
+from src.ingress_benchmark.deploy import deploy_ingress_benchmark
+from src.profiling.deploy import deploy_profiling
+from src.control_plane_accounting.deploy import deploy_control_plane_accounting
+from src.canary.deploy import deploy_canary_gate, get_slos as get_canary_slos
+from src.lib.outputs import module_output, export_module_outputs, DEFAULT_OUTPUT_SIZE_BUDGET
+from src.lib.instrumentation import instrument_module, write_module_metrics
+from src.lib.helm_values_schema import helm_values_check, validate_helm_values, UNKNOWN
 from src.cilium.deploy import deploy_cilium
+from src.cilium.config import get_hubble as get_cilium_hubble, get_load_balancer as get_cilium_load_balancer, get_performance as get_cilium_performance
 from src.cert_manager.deploy import deploy_cert_manager
 from src.kubevirt.deploy import deploy_kubevirt
 from src.containerized_data_importer.deploy import deploy_cdi
 from src.cluster_network_addons.deploy import deploy_cnao
 from src.multus.deploy import deploy_multus
 from src.hostpath_provisioner.deploy import deploy as deploy_hostpath_provisioner
-from src.openunison.deploy import deploy_openunison
+from src.openunison.deploy import deploy_openunison, get_openunison_hosts
 from src.prometheus.deploy import deploy_prometheus
 from src.kubernetes_dashboard.deploy import deploy_kubernetes_dashboard
 from src.kv_manager.deploy import deploy_ui_for_kubevirt
@@ -21,6 +38,14 @@ from src.vm.ubuntu import deploy_ubuntu_vm
 from src.vm.talos import deploy_talos_cluster
 from src.ingress_nginx.deploy import deploy_ingress_nginx
 from src.kv_manager.deploy import deploy_ui_for_kubevirt
+from src.cilium import deploy as cilium_module
+from src.cert_manager import deploy as cert_manager_module
+from src.prometheus import deploy as prometheus_module
+from src.kubernetes_dashboard import deploy as kubernetes_dashboard_module
+from src.ingress_nginx import deploy as ingress_nginx_module
+from src.openunison import deploy as openunison_module
+from src.descheduler import deploy as descheduler_module
+from src.profiling import deploy as profiling_module
 
 ##################################################################################
 # Load the Pulumi Config
@@ -52,6 +77,7 @@ k8s_provider = Provider(
     context=kubernetes_context
 )
 
+# Compact per-module stack outputs, see src/lib/outputs.ModuleOutput
 versions = {}
 
 ##################################################################################
@@ -78,6 +104,125 @@ config_kubernetes_dashboard, kubernetes_dashboard_enabled = get_module_config('k
 config_kubevirt_manager, kubevirt_manager_enabled = get_module_config('kubevirt_manager')
 config_vm, vm_enabled = get_module_config('vm')
 config_talos, talos_cluster_enabled = get_module_config('talos')
+config_ingress_nginx, _ = get_module_config('ingress_nginx')
+config_ceph, _ = get_module_config('ceph')
+config_priority_classes, priority_classes_enabled = get_module_config('priority_classes')
+config_node_local_dns, node_local_dns_enabled = get_module_config('node_local_dns')
+config_vpa, vpa_enabled = get_module_config('vpa')
+config_descheduler, descheduler_enabled = get_module_config('descheduler')
+config_storage_benchmark, storage_benchmark_enabled = get_module_config('storage_benchmark')
+config_network_benchmark, network_benchmark_enabled = get_module_config('network_benchmark')
+config_ingress_benchmark, ingress_benchmark_enabled = get_module_config('ingress_benchmark')
+config_profiling, profiling_enabled = get_module_config('profiling')
+config_control_plane_accounting, control_plane_accounting_enabled = get_module_config('control_plane_accounting')
+config_canary, canary_enabled = get_module_config('canary')
+
+# Size platform components from the stack sizing profile and per-module overrides, see src/lib/sizing.py
+sizing_profile = (config.get_object("sizing") or {}).get("profile")
+sizing_cilium = get_sizing("cilium", config_cilium, sizing_profile, get_priority_class("cilium", priority_classes_enabled))
+performance_cilium = get_cilium_performance(config_cilium, kubernetes_distribution) if cilium_enabled else None
+load_balancer_cilium = get_cilium_load_balancer(config_cilium, kubernetes_distribution) if cilium_enabled else None
+hubble_cilium = get_cilium_hubble(config_cilium) if cilium_enabled else None
+sizing_cert_manager = get_sizing("cert_manager", config_cert_manager, sizing_profile, get_priority_class("cert_manager", priority_classes_enabled))
+sizing_prometheus = get_sizing("prometheus", config_prometheus, sizing_profile, get_priority_class("prometheus", priority_classes_enabled))
+sizing_kubernetes_dashboard = get_sizing("kubernetes_dashboard", config_kubernetes_dashboard, sizing_profile, get_priority_class("kubernetes_dashboard", priority_classes_enabled))
+sizing_ingress_nginx = get_sizing("ingress_nginx", config_ingress_nginx, sizing_profile, get_priority_class("ingress_nginx", priority_classes_enabled))
+sizing_openunison = get_sizing("openunison", config_openunison, sizing_profile, get_priority_class("openunison", priority_classes_enabled))
+
+##################################################################################
+# Validate the generated Helm values of every enabled module against the chart
+# values schemas, before any release is registered
+def run_helm_values_validation():
+    config_validation = config.get_object("helm_values_validation") or {}
+    if str(config_validation.get("enabled", True)).lower() != "true":
+        return
+
+    checks = []
+    if cilium_enabled:
+        checks.append(helm_values_check(
+            "cilium",
+            cilium_module.CHART_NAME,
+            cilium_module.CHART_REPOSITORY,
+            config_cilium.get('version'),
+            cilium_module.get_helm_values(kubernetes_distribution, project_name, UNKNOWN, sizing_cilium, performance_cilium, load_balancer_cilium, hubble_cilium, node_local_dns_enabled),
+        ))
+    if cert_manager_enabled:
+        checks.append(helm_values_check(
+            "cert_manager",
+            cert_manager_module.CHART_NAME,
+            cert_manager_module.CHART_REPOSITORY,
+            config_cert_manager.get('version'),
+            cert_manager_module.gen_helm_values(kubernetes_distribution, sizing_cert_manager),
+        ))
+    if prometheus_enabled:
+        checks.append(helm_values_check(
+            "prometheus",
+            prometheus_module.CHART_NAME,
+            prometheus_module.CHART_REPOSITORY,
+            config_prometheus.get('version'),
+            prometheus_module.gen_helm_values(openunison_enabled, sizing_prometheus),
+        ))
+    if kubernetes_dashboard_enabled:
+        checks.append(helm_values_check(
+            "kubernetes_dashboard",
+            kubernetes_dashboard_module.CHART_NAME,
+            kubernetes_dashboard_module.CHART_REPOSITORY,
+            config_kubernetes_dashboard.get('version'),
+            kubernetes_dashboard_module.gen_helm_values(openunison_enabled, sizing_kubernetes_dashboard),
+        ))
+    if openunison_enabled:
+        checks.append(helm_values_check(
+            "ingress_nginx",
+            ingress_nginx_module.CHART_NAME,
+            ingress_nginx_module.CHART_REPOSITORY,
+            None,
+            ingress_nginx_module.gen_helm_values(sizing_ingress_nginx),
+        ))
+        config_openunison_github = config_openunison.get('github') or {}
+        openunison_values = openunison_module.gen_helm_values(
+            config_openunison.get('dns_suffix') or "kargo.arpa",
+            UNKNOWN,
+            config_openunison_github.get('client_id'),
+            config_openunison_github.get('teams') or "",
+            {
+                "kubevirt_manager": {"enabled": bool(config_kubevirt_manager.get("enabled"))},
+                "prometheus": {"enabled": prometheus_enabled},
+            },
+            sizing_openunison,
+        )
+        for chart_name in openunison_module.CHART_NAMES:
+            checks.append(helm_values_check(
+                "openunison",
+                chart_name,
+                openunison_module.CHART_REPOSITORY,
+                config_openunison.get('version') if chart_name == "openunison-operator" else None,
+                openunison_values,
+            ))
+
+    if descheduler_enabled:
+        checks.append(helm_values_check(
+            "descheduler",
+            descheduler_module.CHART_NAME,
+            descheduler_module.CHART_REPOSITORY,
+            config_descheduler.get('version'),
+            descheduler_module.gen_helm_values(
+                config_descheduler.get('interval'),
+                *get_descheduler_thresholds(config_descheduler)
+            ),
+        ))
+
+    if profiling_enabled:
+        checks.append(helm_values_check(
+            "profiling",
+            profiling_module.CHART_NAME,
+            profiling_module.CHART_REPOSITORY,
+            config_profiling.get('version'),
+            profiling_module.gen_helm_values(["kube-system"], profiling_module.get_pyroscope_url("profiling")),
+        ))
+
+    validate_helm_values(checks)
+
+run_helm_values_validation()
 
 ##################################################################################
 ## Core Kargo Kubevirt PaaS Infrastructure
@@ -92,9 +237,30 @@ def safe_append(depends, resource):
     if resource:
         depends.append(resource)
 
+##################################################################################
+# Deploy the Kargo PriorityClasses, module workloads reference them via src/lib/priority
+@instrument_module("priority_classes")
+def run_priority_classes():
+    if priority_classes_enabled:
+        priority_classes = deploy_priority_classes(
+            [],
+            k8s_provider
+        )
+
+        for priority_class in priority_classes:
+            safe_append(depends, priority_class)
+
+        versions["priority_classes"] = module_output(priority_classes_enabled)
+
+        return priority_classes
+    return []
+
+priority_classes = run_priority_classes()
+
 ##################################################################################
 # Fetch the Cilium Version
 # Deploy Cilium
+@instrument_module("cilium")
 def run_cilium():
     if cilium_enabled:
         namespace = "kube-system"
@@ -112,13 +278,20 @@ def run_cilium():
             cilium_version,
             l2_bridge_name,
             l2announcements,
+            helm_engine=get_helm_engine(config_cilium),
+            helm_timeouts=get_helm_timeouts(config_cilium),
+            sizing=sizing_cilium,
+            performance=performance_cilium,
+            load_balancer=load_balancer_cilium,
+            hubble=hubble_cilium,
+            local_redirect_policy=node_local_dns_enabled,
         )
         cilium_version = cilium[0]
         cilium_release = cilium[1]
 
         safe_append(depends, cilium_release)
 
-        versions["cilium"] = {"enabled": cilium_enabled, "version": cilium_version}
+        versions["cilium"] = module_output(cilium_enabled, cilium_version)
 
         return cilium_version, cilium_release
 
@@ -126,9 +299,40 @@ def run_cilium():
 
 cilium_version, cilium_release = run_cilium()
 
+##################################################################################
+# Deploy NodeLocal DNSCache, kube-dns traffic is redirected to it by Cilium
+@instrument_module("node_local_dns")
+def run_node_local_dns():
+    if node_local_dns_enabled:
+        if not cilium_enabled:
+            pulumi.log.warn("Skipping node_local_dns, it relies on the Cilium local redirect policy and cilium is not enabled")
+            return None, None
+
+        node_local_dns_version, node_local_dns_release = deploy_node_local_dns(
+            [cilium_release],
+            config_node_local_dns.get('version') or None,
+            config_node_local_dns.get('cluster_domain') or "cluster.local",
+            config_node_local_dns.get('cache') or {},
+            k8s_provider
+        )
+
+        versions["node_local_dns"] = module_output(
+            node_local_dns_enabled,
+            node_local_dns_version,
+            {"upstream_service": "kube-system/kube-dns-upstream"}
+        )
+
+        safe_append(depends, node_local_dns_release)
+
+        return node_local_dns_version, node_local_dns_release
+    return None, None
+
+node_local_dns_version, node_local_dns_release = run_node_local_dns()
+
 ##################################################################################
 # Fetch the Cert Manager Version
 # Deploy Cert Manager
+@instrument_module("cert_manager")
 def run_cert_manager():
     if cert_manager_enabled:
         ns_name = "cert-manager"
@@ -139,15 +343,23 @@ def run_cert_manager():
             cert_manager_version,
             kubernetes_distribution,
             depends,
-            k8s_provider
+            k8s_provider,
+            helm_engine=get_helm_engine(config_cert_manager),
+            helm_timeouts=get_helm_timeouts(config_cert_manager),
+            sizing=sizing_cert_manager,
         )
 
-        versions["cert_manager"] = {"enabled": cert_manager_enabled, "version": cert_manager[0]}
+        versions["cert_manager"] = module_output(
+            cert_manager_enabled,
+            cert_manager[0],
+            {
+                "cluster_issuer": "cluster-selfsigned-issuer",
+                "ca_secret": f"{ns_name}/cluster-selfsigned-issuer-ca",
+            }
+        )
         cert_manager_release = cert_manager[1]
         cert_manager_selfsigned_cert = cert_manager[2]
 
-        pulumi.export("cert_manager_selfsigned_cert", cert_manager_selfsigned_cert)
-
         safe_append(depends, cert_manager_release)
 
         return cert_manager, cert_manager_release, cert_manager_selfsigned_cert
@@ -157,6 +369,7 @@ cert_manager, cert_manager_release, cert_manager_selfsigned_cert = run_cert_mana
 
 ##################################################################################
 # Deploy KubeVirt
+@instrument_module("kubevirt")
 def run_kubevirt():
     if kubevirt_enabled:
         ns_name = "kubevirt"
@@ -176,7 +389,7 @@ def run_kubevirt():
             kubernetes_distribution,
         )
 
-        versions["kubevirt"] = {"enabled": kubevirt_enabled, "version": kubevirt[0]}
+        versions["kubevirt"] = module_output(kubevirt_enabled, kubevirt[0])
         kubevirt_operator = kubevirt[1]
 
         safe_append(openunison_depends, kubevirt_operator)
@@ -188,6 +401,7 @@ kubevirt, kubevirt_operator = run_kubevirt()
 
 ##################################################################################
 # Deploy Multus
+@instrument_module("multus")
 def run_multus():
     if multus_enabled:
         ns_name = "multus"
@@ -205,10 +419,15 @@ def run_multus():
             custom_depends,
             multus_version,
             bridge_name,
-            k8s_provider
+            k8s_provider,
+            priority_class=get_priority_class("multus", priority_classes_enabled)
         )
 
-        versions["multus"] = {"enabled": multus_enabled, "version": multus[0]}
+        versions["multus"] = module_output(
+            multus_enabled,
+            multus[0],
+            {"network_attachment_definition": f"default/{bridge_name}"}
+        )
         multus_release = multus[1]
 
         safe_append(depends, multus_release)
@@ -220,6 +439,7 @@ multus, multus_release = run_multus()
 
 ##################################################################################
 # Deploy Cluster Network Addons Operator (CNAO)
+@instrument_module("cnao")
 def run_cnao():
     if cnao_enabled:
         ns_name = "cluster-network-addons"
@@ -236,10 +456,11 @@ def run_cnao():
         cnao = deploy_cnao(
             custom_depends,
             cnao_version,
-            k8s_provider
+            k8s_provider,
+            priority_class=get_priority_class("cnao", priority_classes_enabled)
         )
 
-        versions["cnao"] = {"enabled": cnao_enabled, "version": cnao[0]}
+        versions["cnao"] = module_output(cnao_enabled, cnao[0])
         cnao_release = cnao[1]
 
         safe_append(depends, cnao_release)
@@ -251,6 +472,7 @@ cnao, cnao_release = run_cnao()
 
 ##################################################################################
 # Deploy Hostpath Provisioner
+@instrument_module("hostpath_provisioner")
 def run_hostpath_provisioner():
     if hostpath_provisioner_enabled:
         if not cert_manager_enabled:
@@ -279,9 +501,14 @@ def run_hostpath_provisioner():
             hostpath_default_path,
             hostpath_default_storage_class,
             k8s_provider,
+            priority_class=get_priority_class("hostpath_provisioner", priority_classes_enabled),
         )
 
-        versions["hostpath_provisioner"] = {"enabled": hostpath_provisioner_enabled, "version": hostpath_provisioner[0]}
+        versions["hostpath_provisioner"] = module_output(
+            hostpath_provisioner_enabled,
+            hostpath_provisioner[0],
+            {"storage_class": "ssd"}
+        )
         hostpath_provisioner_release = hostpath_provisioner[1]
 
         safe_append(depends, hostpath_provisioner_release)
@@ -293,6 +520,7 @@ hostpath_provisioner, hostpath_provisioner_release = run_hostpath_provisioner()
 
 ##################################################################################
 # Deploy Containerized Data Importer (CDI)
+@instrument_module("cdi")
 def run_cdi():
     if cdi_enabled:
         ns_name = "cdi"
@@ -301,10 +529,11 @@ def run_cdi():
         cdi = deploy_cdi(
             depends,
             cdi_version,
-            k8s_provider
+            k8s_provider,
+            priority_class=get_priority_class("cdi", priority_classes_enabled)
         )
 
-        versions["cdi"] = {"enabled": cdi_enabled, "version": cdi[0]}
+        versions["cdi"] = module_output(cdi_enabled, cdi[0])
         cdi_release = cdi[1]
 
         safe_append(depends, cdi_release)
@@ -316,6 +545,7 @@ cdi, cdi_release = run_cdi()
 
 ##################################################################################
 # Deploy Prometheus
+@instrument_module("prometheus")
 def run_prometheus():
     if prometheus_enabled:
         ns_name = "monitoring"
@@ -326,10 +556,21 @@ def run_prometheus():
             ns_name,
             prometheus_version,
             k8s_provider,
-            openunison_enabled
+            openunison_enabled,
+            helm_engine=get_helm_engine(config_prometheus),
+            helm_timeouts=get_helm_timeouts(config_prometheus),
+            sizing=sizing_prometheus,
         )
 
-        versions["prometheus"] = {"enabled": prometheus_enabled, "version": prometheus[0],"release":prometheus[1]}
+        versions["prometheus"] = module_output(
+            prometheus_enabled,
+            prometheus[0],
+            {
+                "prometheus": f"http://prometheus.{ns_name}.svc:9090",
+                "alertmanager": f"http://alertmanager.{ns_name}.svc:9093",
+                "grafana": f"http://grafana.{ns_name}.svc",
+            }
+        )
         prometheus_release = prometheus[1]
 
         safe_append(openunison_depends, prometheus_release)
@@ -341,6 +582,7 @@ prometheus, prometheus_release = run_prometheus()
 
 ##################################################################################
 # Deploy Kubernetes Dashboard
+@instrument_module("kubernetes_dashboard")
 def run_kubernetes_dashboard():
     if kubernetes_dashboard_enabled:
         ns_name = "kubernetes-dashboard"
@@ -354,10 +596,13 @@ def run_kubernetes_dashboard():
             ns_name,
             kubernetes_dashboard_version,
             k8s_provider,
-            openunison_enabled
+            openunison_enabled,
+            helm_engine=get_helm_engine(config_kubernetes_dashboard),
+            helm_timeouts=get_helm_timeouts(config_kubernetes_dashboard),
+            sizing=sizing_kubernetes_dashboard,
         )
 
-        versions["kubernetes_dashboard"] = {"enabled": kubernetes_dashboard_enabled, "version": kubernetes_dashboard[0], "release":kubernetes_dashboard[1]}
+        versions["kubernetes_dashboard"] = module_output(kubernetes_dashboard_enabled, kubernetes_dashboard[0])
         kubernetes_dashboard_release = kubernetes_dashboard[1]
 
         safe_append(openunison_depends, kubernetes_dashboard_release)
@@ -369,15 +614,21 @@ kubernetes_dashboard, kubernetes_dashboard_release = run_kubernetes_dashboard()
 
 ##################################################################################
 # Deploy Kubevirt Manager
+@instrument_module("kubevirt_manager")
 def run_kubevirt_manager():
     kubevirt_manager_enabled = config_kubevirt_manager.get("enabled") or False
     if kubevirt_manager_enabled:
         kubevirt_manager = deploy_ui_for_kubevirt(
             "kargo",
             k8s_provider,
+            priority_class=get_priority_class("kubevirt_manager", priority_classes_enabled),
         )
 
-        versions["kubevirt_manager"] = {"enabled": kubevirt_manager_enabled, "version": kubevirt_manager[0]}
+        versions["kubevirt_manager"] = module_output(
+            kubevirt_manager_enabled,
+            kubevirt_manager[0],
+            {"kubevirt_manager": "http://kubevirt-manager.kubevirt-manager.svc:8080"}
+        )
         kubevirt_manager_release = kubevirt_manager[1]
 
         safe_append(openunison_depends, kubevirt_manager_release)
@@ -390,6 +641,7 @@ def run_kubevirt_manager():
 kubevirt_manager, kubevirt_manager_release = run_kubevirt_manager()
 
 ##################################################################################
+@instrument_module("openunison")
 def run_openunison():
     if openunison_enabled:
         ns_name = "openunison"
@@ -408,8 +660,8 @@ def run_openunison():
 
 
         # Assume ingress-nginx for OpenUnison
-        nginx_release, nginx_version = deploy_ingress_nginx(None,"ingress-nginx",k8s_provider)
-        versions["nginx"] = {"enabled": openunison_enabled, "version": nginx_version}
+        nginx_release, nginx_version = deploy_ingress_nginx(None,"ingress-nginx",k8s_provider,helm_engine=get_helm_engine(config_ingress_nginx),helm_timeouts=get_helm_timeouts(config_ingress_nginx),sizing=sizing_ingress_nginx)
+        versions["nginx"] = module_output(openunison_enabled, nginx_version)
 
 
         safe_append(custom_depends,nginx_release)
@@ -429,22 +681,31 @@ def run_openunison():
             openunison_github_client_id,
             openunison_github_client_secret,
             openunison_github_teams,
-            versions
+            versions,
+            kubernetes_dashboard_release,
+            helm_engine=get_helm_engine(config_openunison),
+            helm_timeouts=get_helm_timeouts(config_openunison),
+            sizing=sizing_openunison,
         )
 
-        versions["openunison"] = {"enabled": openunison_enabled, "version": openunison[0]}
+        versions["openunison"] = module_output(
+            openunison_enabled,
+            openunison[0],
+            {app: f"https://{host}" for app, host in get_openunison_hosts(domain_suffix).items()}
+        )
         openunison_release = openunison[1]
 
         safe_append(depends, openunison_release)
 
-        return openunison, openunison_release
+        return openunison, openunison_release, nginx_release
 
-    return None, None
+    return None, None, None
 
-openunison, openunison_release = run_openunison()
+openunison, openunison_release, nginx_release = run_openunison()
 
 ##################################################################################
 # Deploy Rook Ceph
+@instrument_module("ceph")
 def run_rook_ceph():
     deploy_ceph = config.get_bool('ceph.enabled') or False
     if deploy_ceph:
@@ -453,17 +714,279 @@ def run_rook_ceph():
             k8s_provider,
             kubernetes_distribution,
             "kargo",
-            "rook-ceph"
+            "rook-ceph",
+            helm_engine=get_helm_engine(config_ceph),
+            helm_timeouts=get_helm_timeouts(config_ceph),
         )
         return rook_operator
     return None
 
 rook_operator = run_rook_ceph()
 
+##################################################################################
+# The Kargo namespaces, from kube-system and the namespaces of the enabled modules
+kargo_namespaces = get_vpa_namespaces({
+    "cert_manager": cert_manager_enabled,
+    "kubevirt": kubevirt_enabled,
+    "cdi": cdi_enabled,
+    "multus": multus_enabled,
+    "cnao": cnao_enabled,
+    "hostpath_provisioner": hostpath_provisioner_enabled,
+    "prometheus": prometheus_enabled,
+    "kubernetes_dashboard": kubernetes_dashboard_enabled,
+    "kubevirt_manager": kubevirt_manager_enabled,
+    "openunison": openunison_enabled,
+    "ingress_nginx": openunison_enabled,
+    "ceph": rook_operator is not None,
+})
+
+##################################################################################
+# Deploy metrics-server and the Vertical Pod Autoscaler, recording right-sizing
+# recommendations for the workloads of the Kargo namespaces
+@instrument_module("vpa")
+def run_vpa():
+    if vpa_enabled:
+        vpa_namespaces = kargo_namespaces
+
+        vpa_version, vpa_release = deploy_vpa(
+            depends,
+            "vpa",
+            config_vpa.get('version') or None,
+            config_vpa.get('update_mode') or None,
+            vpa_namespaces,
+            kubernetes_distribution,
+            k8s_provider,
+            helm_engine=get_helm_engine(config_vpa),
+            helm_timeouts=get_helm_timeouts(config_vpa),
+        )
+
+        versions["vpa"] = module_output(
+            vpa_enabled,
+            vpa_version,
+            {"namespaces": ",".join(vpa_namespaces)}
+        )
+
+        safe_append(depends, vpa_release)
+
+        return vpa_version, vpa_release
+    return None, None
+
+vpa_version, vpa_release = run_vpa()
+
+##################################################################################
+# Deploy the descheduler, rebalancing pods and live-migratable VMs after node churn
+@instrument_module("descheduler")
+def run_descheduler():
+    if descheduler_enabled:
+        thresholds, target_thresholds = get_descheduler_thresholds(config_descheduler)
+
+        descheduler_version, descheduler_release = deploy_descheduler(
+            depends,
+            config_descheduler.get('version') or None,
+            config_descheduler.get('interval') or None,
+            thresholds,
+            target_thresholds,
+            k8s_provider,
+            helm_engine=get_helm_engine(config_descheduler),
+            helm_timeouts=get_helm_timeouts(config_descheduler),
+        )
+
+        versions["descheduler"] = module_output(descheduler_enabled, descheduler_version)
+
+        safe_append(depends, descheduler_release)
+
+        return descheduler_version, descheduler_release
+    return None, None
+
+descheduler_version, descheduler_release = run_descheduler()
+
+##################################################################################
+# Continuously profile the Kargo namespaces with Pyroscope
+@instrument_module("profiling")
+def run_profiling():
+    if profiling_enabled:
+        ns_name = "profiling"
+        profiling_version, profiling_release = deploy_profiling(
+            depends,
+            ns_name,
+            config_profiling.get('version') or None,
+            kargo_namespaces,
+            prometheus_enabled,
+            k8s_provider,
+            helm_engine=get_helm_engine(config_profiling),
+            helm_timeouts=get_helm_timeouts(config_profiling),
+        )
+
+        versions["profiling"] = module_output(
+            profiling_enabled,
+            profiling_version,
+            {"pyroscope": profiling_module.get_pyroscope_url(ns_name)}
+        )
+
+        safe_append(depends, profiling_release)
+
+        return profiling_version, profiling_release
+    return None, None
+
+profiling_version, profiling_release = run_profiling()
+
+##################################################################################
+# Attribute API server load to the service accounts of each Kargo module, see
+# tools/control_plane_load.py
+@instrument_module("control_plane_accounting")
+def run_control_plane_accounting():
+    if control_plane_accounting_enabled:
+        enabled_modules = {
+            "cilium": cilium_enabled,
+            "multus": multus_enabled,
+            "node_local_dns": node_local_dns_enabled,
+            "cert_manager": cert_manager_enabled,
+            "kubevirt": kubevirt_enabled,
+            "cdi": cdi_enabled,
+            "cnao": cnao_enabled,
+            "hostpath_provisioner": hostpath_provisioner_enabled,
+            "prometheus": prometheus_enabled,
+            "kubernetes_dashboard": kubernetes_dashboard_enabled,
+            "kubevirt_manager": kubevirt_manager_enabled,
+            "openunison": openunison_enabled,
+            "ingress_nginx": openunison_enabled,
+            "ceph": rook_operator is not None,
+            "vpa": vpa_enabled,
+        }
+
+        flow_schemas = deploy_control_plane_accounting(
+            depends,
+            [module for module, enabled in enabled_modules.items() if enabled],
+            k8s_provider
+        )
+
+        versions["control_plane_accounting"] = module_output(
+            control_plane_accounting_enabled,
+            endpoints={"flow_schemas": ",".join(flow_schemas)}
+        )
+
+        return flow_schemas
+    return None
+
+control_plane_accounting_flow_schemas = run_control_plane_accounting()
+
+##################################################################################
+# Benchmark every provisioned StorageClass with fio, on demand
+@instrument_module("storage_benchmark")
+def run_storage_benchmark():
+    if storage_benchmark_enabled:
+        storage_classes = get_benchmark_storage_classes(
+            config_storage_benchmark,
+            ["ssd"] if hostpath_provisioner_enabled else []
+        )
+        if not storage_classes:
+            pulumi.log.warn("Skipping storage_benchmark, no storage classes are provisioned or configured in storage_benchmark.storage_classes")
+            return None
+
+        ns_name = "storage-benchmark"
+        storage_benchmark_results = deploy_storage_benchmark(
+            depends,
+            ns_name,
+            config_storage_benchmark.get('run_id') or "1",
+            storage_classes,
+            config_storage_benchmark.get('image') or None,
+            config_storage_benchmark.get('volume_size') or None,
+            config_storage_benchmark.get('file_size') or None,
+            config_storage_benchmark.get('runtime') or None,
+            k8s_provider
+        )
+
+        versions["storage_benchmark"] = module_output(
+            storage_benchmark_enabled,
+            endpoints={"results": f"{ns_name}/storage-benchmark-results"}
+        )
+
+        return storage_benchmark_results
+    return None
+
+storage_benchmark_results = run_storage_benchmark()
+
+##################################################################################
+# Benchmark the pod network, the Multus bridge and VM NICs with iperf3, on demand
+@instrument_module("network_benchmark")
+def run_network_benchmark():
+    if network_benchmark_enabled:
+        network_benchmark_results, network_benchmark_summary = deploy_network_benchmark(
+            depends,
+            config_network_benchmark.get('run_id') or "1",
+            get_network_benchmark_paths(config_network_benchmark, multus_enabled, kubevirt_enabled),
+            config_multus.get('bridge_name') or "br0",
+            config_network_benchmark.get('bridge_cidr') or None,
+            config_network_benchmark.get('image') or None,
+            config_network_benchmark.get('vm_image') or None,
+            config_network_benchmark.get('duration') or None,
+            config_network_benchmark.get('streams') or None,
+            config_network_benchmark.get('ping_count') or None,
+            k8s_provider
+        )
+
+        versions["network_benchmark"] = module_output(
+            network_benchmark_enabled,
+            endpoints={"results": "network-benchmark/network-benchmark-results", **network_benchmark_summary}
+        )
+
+        return network_benchmark_results
+    return None
+
+network_benchmark_results = run_network_benchmark()
+
+##################################################################################
+# Load test the ingress-nginx and OpenUnison path with k6, on demand
+@instrument_module("ingress_benchmark")
+def run_ingress_benchmark():
+    if ingress_benchmark_enabled:
+        if not openunison_enabled:
+            pulumi.log.warn("Skipping ingress_benchmark, it load tests the OpenUnison hosts and openunison is not enabled")
+            return None
+
+        # Only the hosts of the apps proxied by this stack
+        hosts = get_openunison_hosts(config_openunison.get('dns_suffix') or "kargo.arpa")
+        enabled_apps = {
+            "openunison": True,
+            "api_server": True,
+            "dashboard": kubernetes_dashboard_enabled,
+            "kubevirt_manager": kubevirt_manager_enabled,
+            "prometheus": prometheus_enabled,
+            "alertmanager": prometheus_enabled,
+            "grafana": prometheus_enabled,
+        }
+        apps = config_ingress_benchmark.get('apps') or [app for app, enabled in enabled_apps.items() if enabled]
+        config_ingress_benchmark_auth = config_ingress_benchmark.get('auth') or {}
+
+        ingress_benchmark_results, ingress_benchmark_summary = deploy_ingress_benchmark(
+            depends,
+            config_ingress_benchmark.get('run_id') or "1",
+            {app: hosts[app] for app in apps},
+            nginx_release,
+            config_ingress_benchmark.get('rate') or None,
+            config_ingress_benchmark.get('duration') or None,
+            config_ingress_benchmark.get('vus') or None,
+            pulumi.Output.secret(config_ingress_benchmark_auth['token']) if config_ingress_benchmark_auth.get('token') else None,
+            pulumi.Output.secret(config_ingress_benchmark_auth['cookie']) if config_ingress_benchmark_auth.get('cookie') else None,
+            config_ingress_benchmark.get('image') or None,
+            k8s_provider
+        )
+
+        versions["ingress_benchmark"] = module_output(
+            ingress_benchmark_enabled,
+            endpoints={"results": "ingress-benchmark/ingress-benchmark-results", **ingress_benchmark_summary}
+        )
+
+        return ingress_benchmark_results
+    return None
+
+ingress_benchmark_results = run_ingress_benchmark()
+
 
 
 ##################################################################################
 # Deploy Ubuntu VM
+@instrument_module("ubuntu_vm")
 def run_ubuntu_vm():
     if vm_enabled:
         # Get the SSH Public Key string from Pulumi Config if it exists
@@ -481,7 +1004,8 @@ def run_ubuntu_vm():
             "node_port": 30590,
             "ssh_user": "kc2",
             "ssh_password": "kc2",
-            "ssh_pub_key": ssh_pub_key
+            "ssh_pub_key": ssh_pub_key,
+            "priority_class": get_priority_class("ubuntu_vm", priority_classes_enabled)
         }
 
         # Merge the default values with the existing config_vm values
@@ -494,10 +1018,10 @@ def run_ubuntu_vm():
             depends
         )
 
-        versions["ubuntu_vm"] = {
-            "enabled": vm_enabled,
-            "name": ubuntu_vm.metadata["name"]
-        }
+        versions["ubuntu_vm"] = module_output(
+            vm_enabled,
+            endpoints={"ssh_node_port": str(config_vm_merged["node_port"])}
+        )
 
         safe_append(depends, ubuntu_ssh_service)
 
@@ -509,6 +1033,7 @@ ubuntu_vm, ubuntu_ssh_service = run_ubuntu_vm()
 
 ##################################################################################
 # Deploy Kargo-on-Kargo Development Cluster (Controlplane + Worker VirtualMachinePools)
+@instrument_module("talos_cluster")
 def run_talos_cluster():
     if talos_cluster_enabled:
         # Append the resources to the `depends` list
@@ -526,15 +1051,14 @@ def run_talos_cluster():
             k8s_provider=k8s_provider,
             depends_on=custom_depends,
             parent=kubevirt_operator,
+            priority_class=config_talos.get("priority_class") or get_priority_class("talos_cluster", priority_classes_enabled),
         )
 
-        # Export the Talos configuration and versions
-        versions["talos_cluster"] = {
-            "enabled": talos_cluster_enabled,
-            "running": config_talos.get("running", True),
-            "controlplane": config_talos.get("controlplane", {}),
-            "workers": config_talos.get("workers", {})
-        }
+        # Export the Talos VirtualMachinePool names
+        talos_endpoints = {"controlplane_vm_pool": controlplane_vm_pool.metadata["name"]}
+        if worker_vm_pool:
+            talos_endpoints["workers_vm_pool"] = worker_vm_pool.metadata["name"]
+        versions["talos_cluster"] = module_output(talos_cluster_enabled, endpoints=talos_endpoints)
 
         return controlplane_vm_pool, worker_vm_pool
     else:
@@ -543,5 +1067,53 @@ def run_talos_cluster():
 # Run the Talos cluster deployment
 talos_controlplane_vm_pool, talos_worker_vm_pool = run_talos_cluster()
 
-# Export the component versions
-pulumi.export("versions", versions)
+##################################################################################
+# Judge the update on runtime health: check the SLOs in Prometheus after a soak
+# window, failing or rolling back the updated releases on a breach
+@instrument_module("canary")
+def run_canary():
+    if canary_enabled:
+        if not prometheus_enabled:
+            pulumi.log.warn("Skipping canary, it queries the deployed Prometheus and prometheus is not enabled")
+            return None
+
+        canary_slos = get_canary_slos(config_canary, {
+            "ingress_nginx": openunison_enabled,
+            "kubevirt": kubevirt_enabled,
+            "cilium": cilium_enabled,
+        })
+
+        canary_gate, canary_results = deploy_canary_gate(
+            depends,
+            get_helm_releases(),
+            canary_slos,
+            config_canary.get('soak') or None,
+            config_canary.get('action') or None,
+            str(config_canary.get('require_data')).lower() == "true",
+            config_canary.get('run_id') or "1"
+        )
+
+        versions["canary"] = module_output(
+            canary_enabled,
+            endpoints={
+                "results": canary_results.apply(
+                    lambda rows: ", ".join(f"{row['slo']}={row['verdict']}" for row in rows or [])
+                ),
+            }
+        )
+
+        return canary_gate
+    return None
+
+canary_gate = run_canary()
+
+# Export the compact module outputs, warning when they grow beyond the size budget
+config_outputs = config.get_object("outputs") or {}
+export_module_outputs(
+    "versions",
+    versions,
+    int(config_outputs.get("size_budget") or DEFAULT_OUTPUT_SIZE_BUDGET)
+)
+
+# Write the per-module deploy metrics when KARGO_METRICS_FILE is set, see tools/deploy_history.py
+write_module_metrics(versions)
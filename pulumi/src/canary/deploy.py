@@ -0,0 +1,329 @@
+import json
+import math
+import time
+from typing import List, Optional
+import pulumi
+import pulumi_kubernetes as k8s
+from pulumi.dynamic import CreateResult, DiffResult, ResourceProvider, UpdateResult
+from src.lib.crd_barrier import api_client, kubernetes_access
+from src.lib.helm_release import DEFAULT_HELM_TIMEOUT, duration_seconds, get_helm_revisions, rollback_helm_release
+
+# The Prometheus service created by deploy_prometheus
+PROMETHEUS_NAMESPACE = "monitoring"
+PROMETHEUS_SERVICE = "prometheus:9090"
+
+DEFAULT_SOAK = "5m"
+
+# Actions on an SLO breach, rollback also fails the run
+ACTIONS = ("fail", "rollback")
+DEFAULT_ACTION = "fail"
+
+# Queries use $window for the soak window, e.g. rate(...[$window])
+WINDOW = "$window"
+
+# Default SLOs, each checked when its module is enabled. A query returning several
+# series is judged by its largest value.
+DEFAULT_SLOS = {
+    "apiserver_p99": {
+        "module": "kubernetes",
+        "query": 'histogram_quantile(0.99, sum by (le) (rate(apiserver_request_duration_seconds_bucket{verb!~"WATCH|CONNECT"}[$window])))',
+        "max": 1.0,
+    },
+    "ingress_p99": {
+        "module": "ingress_nginx",
+        "query": "histogram_quantile(0.99, sum by (le) (rate(nginx_ingress_controller_request_duration_seconds_bucket[$window])))",
+        "max": 1.0,
+    },
+    "virt_handler_errors": {
+        "module": "kubevirt",
+        "query": 'sum(increase(kubevirt_rest_client_requests_total{pod=~"virt-handler-.*",code=~"5.."}[$window]))',
+        "max": 5.0,
+    },
+    "cilium_drops": {
+        "module": "cilium",
+        "query": 'sum(rate(cilium_drop_count_total{reason!="Policy denied"}[$window]))',
+        "max": 1.0,
+    },
+}
+
+def get_slos(config: dict, enabled_modules: dict) -> dict:
+    """
+    Returns the SLOs to check, from the defaults of the enabled modules and the canary config.
+
+    Configured SLOs override the query and/or max of a default SLO, add a new SLO
+    with both, or disable an SLO with `enabled: false`.
+
+    Args:
+        config (dict): The canary module configuration.
+        enabled_modules (dict): Whether each module is enabled, keyed by DEFAULT_SLOS module.
+
+    Returns:
+        dict: The query and max of each SLO, keyed by SLO name.
+
+    Raises:
+        ValueError: If an SLO has no query or no numeric max.
+    """
+    slos = {
+        name: {"query": slo["query"], "max": slo["max"]}
+        for name, slo in DEFAULT_SLOS.items()
+        if enabled_modules.get(slo["module"], True)
+    }
+
+    for name, overrides in (config.get("slos") or {}).items():
+        overrides = overrides or {}
+        if str(overrides.get("enabled", True)).lower() == "false":
+            slos.pop(name, None)
+            continue
+        slo = {**DEFAULT_SLOS.get(name, {}), **slos.get(name, {}), **overrides}
+        if not slo.get("query"):
+            raise ValueError(f"Canary SLO '{name}' has no query")
+        try:
+            slos[name] = {"query": str(slo["query"]), "max": float(slo["max"])}
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Canary SLO '{name}' has no numeric max: {slo.get('max')}")
+
+    return slos
+
+def query_prometheus(api, query: str) -> Optional[float]:
+    """
+    Runs an instant query against the Prometheus service, through the API server service proxy.
+
+    Args:
+        api (kubernetes.client.ApiClient): The Kubernetes API client.
+        query (str): The PromQL query.
+
+    Returns:
+        float: The largest value of the result, or None when the result is empty or NaN.
+
+    Raises:
+        RuntimeError: If the query fails.
+    """
+    response = api.call_api(
+        f"/api/v1/namespaces/{PROMETHEUS_NAMESPACE}/services/{PROMETHEUS_SERVICE}/proxy/api/v1/query",
+        "GET",
+        query_params=[("query", query)],
+        auth_settings=["BearerToken"],
+        _preload_content=False,
+        _return_http_data_only=True,
+    )
+    body = json.loads(response.data)
+    if body.get("status") != "success":
+        raise RuntimeError(f"Prometheus query failed: {body.get('error')}: {query}")
+
+    result = body["data"]["result"]
+    if body["data"]["resultType"] == "scalar":
+        result = [{"value": result}]
+    values = [float(sample["value"][1]) for sample in result]
+    values = [value for value in values if not math.isnan(value)]
+    return max(values) if values else None
+
+def evaluate_slos(slos: dict, values: dict) -> list:
+    """
+    Compares the SLO query values with their thresholds.
+
+    Args:
+        slos (dict): The SLOs, see get_slos.
+        values (dict): The query values keyed by SLO name, None without data.
+
+    Returns:
+        list: One row per SLO, with a verdict of ok, breach or "no data".
+    """
+    rows = []
+    for name, slo in sorted(slos.items()):
+        value = values.get(name)
+        if value is None:
+            verdict = "no data"
+        elif value > slo["max"]:
+            verdict = "breach"
+        else:
+            verdict = "ok"
+        rows.append({"slo": name, "value": value, "max": slo["max"], "verdict": verdict})
+    return rows
+
+def run_gate(props: dict, olds: dict = None) -> list:
+    """
+    Soaks, checks the SLOs and, on a breach, fails or rolls back the updated releases.
+
+    Args:
+        props (dict): The gate properties, see CanaryGate.
+        olds (dict): The properties of the previous passing run, or None on the first run.
+
+    Returns:
+        list: The SLO rows, see evaluate_slos.
+
+    Raises:
+        RuntimeError: If an SLO is breached, or has no data when data is required.
+    """
+    soak_seconds = duration_seconds(props["soak"])
+    time.sleep(soak_seconds)
+
+    api = api_client(props.get("kubeconfig"), props.get("context"))
+    window = f"{max(soak_seconds, 60)}s"
+    values = {name: query_prometheus(api, slo["query"].replace(WINDOW, window)) for name, slo in props["slos"].items()}
+    rows = evaluate_slos(props["slos"], values)
+
+    failed = [row for row in rows if row["verdict"] == "breach" or (row["verdict"] == "no data" and props.get("require_data"))]
+    if not failed:
+        return rows
+
+    message = "Canary SLOs failed after a {}s soak: {}".format(
+        soak_seconds,
+        ", ".join(f"{row['slo']}={row['value']} (max {row['max']})" for row in failed)
+    )
+    if props["action"] != "rollback":
+        raise RuntimeError(message)
+    if not olds:
+        raise RuntimeError(f"{message}. Nothing was rolled back, the gate has no previous passing run")
+
+    # Only the releases upgraded since the previous passing run are rolled back
+    previous = {(r["namespace"], r["name"]): r["revision"] for r in olds.get("releases") or []}
+    targets = []
+    pruned = []
+    for release in props["releases"]:
+        revision = previous.get((release["namespace"], release["name"]))
+        if not revision or revision == release["revision"]:
+            continue
+        # The bounded history may have pruned the revision of the passing run
+        kept = get_helm_revisions(release["name"], release["namespace"], props.get("kubeconfig"), props.get("context"))
+        if int(revision) in kept:
+            targets.append((release, int(revision)))
+        else:
+            pruned.append(f"{release['namespace']}/{release['name']}@{int(revision)} (kept: {', '.join(map(str, kept)) or 'none'})")
+
+    rolled_back = []
+    for release, revision in targets:
+        rollback_helm_release(
+            release["name"],
+            release["namespace"],
+            revision,
+            props.get("kubeconfig"),
+            props.get("context"),
+            int(props["rollback_timeout_seconds"])
+        )
+        rolled_back.append(f"{release['namespace']}/{release['name']}@{revision}")
+
+    if pruned:
+        message += f". Not rolled back, the passing revision is no longer in the Helm history: {', '.join(pruned)}"
+    raise RuntimeError(f"{message}. Rolled back: {', '.join(rolled_back) or 'no upgraded releases'}. Run `pulumi refresh` before the next update")
+
+class CanaryGateProvider(ResourceProvider):
+    """Dynamic provider checking the canary SLOs after every release update."""
+
+    def create(self, props):
+        rows = run_gate(props)
+        return CreateResult(id_="canary", outs={**props, "results": rows})
+
+    def diff(self, _id, olds, news):
+        keys = ("releases", "slos", "soak", "action", "require_data", "run_id")
+        changed = any(olds.get(key) != news.get(key) for key in keys)
+        return DiffResult(changes=changed, replaces=[], delete_before_replace=False)
+
+    def update(self, _id, olds, news):
+        rows = run_gate(news, olds)
+        return UpdateResult(outs={**news, "results": rows})
+
+class CanaryGate(pulumi.dynamic.Resource):
+    """
+    Gate resource that passes once the canary SLOs hold over the soak window.
+
+    The gate runs when a Helm release revision or the gate configuration changes.
+    A failed gate keeps its previous state, so the next update checks it again.
+    """
+    results: pulumi.Output[list]
+
+    def __init__(
+            self,
+            name: str,
+            releases: pulumi.Input[list],
+            slos: dict,
+            soak: str,
+            action: str,
+            require_data: bool,
+            run_id: str,
+            kubeconfig: pulumi.Input[str] = None,
+            context: pulumi.Input[str] = None,
+            rollback_timeout_seconds: int = DEFAULT_HELM_TIMEOUT,
+            opts: pulumi.ResourceOptions = None
+        ):
+        super().__init__(
+            CanaryGateProvider(),
+            name,
+            {
+                "releases": releases,
+                "slos": slos,
+                "soak": soak,
+                "action": action,
+                "require_data": require_data,
+                "run_id": run_id,
+                "kubeconfig": kubeconfig,
+                "context": context,
+                "rollback_timeout_seconds": rollback_timeout_seconds,
+                "results": None,
+            },
+            opts
+        )
+
+def _release_revisions(releases: List[k8s.helm.v3.Release]) -> pulumi.Output[list]:
+    return pulumi.Output.all(*[release.status for release in releases]).apply(
+        lambda statuses: [
+            {"name": status.name, "namespace": status.namespace, "revision": int(status.revision)}
+            for status in statuses
+        ]
+    )
+
+def deploy_canary_gate(
+        depends: pulumi.Input[list],
+        releases: list,
+        slos: dict,
+        soak: str,
+        action: str,
+        require_data: bool,
+        run_id: str
+    ):
+    """
+    Deploys the canary gate, the final stage of an update.
+
+    After the releases are updated, the gate waits for the soak window and queries
+    the deployed Prometheus for each SLO over that window. A breach fails the run
+    or, with the rollback action, rolls the releases updated by this run back to
+    their previous revisions before failing it. Only releases of the release Helm
+    engine have revisions to roll back to.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on, including the Prometheus release.
+        releases (list): The Helm releases to gate, see src/lib/helm_release.get_helm_releases.
+        slos (dict): The SLOs to check, see get_slos.
+        soak (str): The soak window, such as "5m".
+        action (str): The action on a breach, one of ACTIONS.
+        require_data (bool): Whether an SLO without data fails the gate.
+        run_id (str): The gate run id, changing it checks the SLOs again.
+
+    Returns:
+        tuple: The CanaryGate and its results.
+
+    Raises:
+        ValueError: If the action or soak window is not valid.
+    """
+    soak = soak or DEFAULT_SOAK
+    duration_seconds(soak)
+    action = action or DEFAULT_ACTION
+    if action not in ACTIONS:
+        raise ValueError(f"Unsupported canary action '{action}', expected one of: {', '.join(ACTIONS)}")
+
+    kubeconfig, context = kubernetes_access()
+    gate = CanaryGate(
+        "canary-gate",
+        _release_revisions([release for release in releases if isinstance(release, k8s.helm.v3.Release)]),
+        slos,
+        soak,
+        action,
+        bool(require_data),
+        str(run_id),
+        kubeconfig=kubeconfig,
+        context=context,
+        opts=pulumi.ResourceOptions(
+            depends_on=depends + releases,
+        )
+    )
+
+    return gate, gate.results
@@ -1,9 +1,11 @@
 import pulumi
-from pulumi_kubernetes import helm, Provider
+from pulumi_kubernetes import Provider
 from src.lib.namespace import create_namespace
 from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
 
-def deploy_rook_operator(name: str, k8s_provider: Provider, kubernetes_distribution: str, project_name: str, namespace: str):
+def deploy_rook_operator(name: str, k8s_provider: Provider, kubernetes_distribution: str, project_name: str, namespace: str, helm_engine: str = "release", helm_timeouts: dict = None):
     """
     Deploy Ceph Operator using the Helm chart.
 
@@ -14,9 +16,11 @@ def deploy_rook_operator(name: str, k8s_provider: Provider, kubernetes_distribut
         project_name (str): The name of the project.
         kubernetes_endpoint_ip_string (str): The IP address of the Kubernetes endpoint.
         namespace (str): The namespace to deploy Rook Ceph into.
+        helm_engine (str): The Helm engine to deploy the chart with (release or chart).
+        helm_timeouts (dict): The Helm release timeouts overriding the module defaults.
 
     Returns:
-        pulumi.helm.v3.Release: The deployed Rook Ceph Helm release.
+        pulumi.helm.v3.Release | pulumi.helm.v4.Chart: The deployed Rook Ceph Helm release.
     """
     namespace = create_namespace("rook-ceph", k8s_provider)
 
@@ -26,17 +30,19 @@ def deploy_rook_operator(name: str, k8s_provider: Provider, kubernetes_distribut
     # Fetch the latest version from the helm chart index
     chart_url = "https://charts.rook.io/master/index.yaml"
     chart_name = "rook-ceph"
-    chart_version = get_latest_helm_chart_version(chart_url, chart_name)
+    chart_version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_url, chart_name))
 
     # Deploy Rook Ceph Operator using the Helm chart
-    release = helm.v3.Release(
+    release = create_helm_release(
         name,
         chart="rook-ceph",
         version=chart_version,
         #values=helm_values,
         values={},
         namespace=namespace,
-        repository_opts={"repo": "https://charts.rook.io/release"},
+        repository="https://charts.rook.io/release",
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(provider=k8s_provider)
     )
 
@@ -2,14 +2,24 @@ import pulumi
 import pulumi_kubernetes as k8s
 from pulumi_kubernetes.apiextensions.CustomResource import CustomResource
 from src.lib.namespace import create_namespace
+from src.lib.crd_barrier import create_crd_barrier
 from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+from src.lib.sizing import ComponentSizing, get_sizing, resources
+
+CHART_NAME = "cert-manager"
+CHART_REPOSITORY = "https://charts.jetstack.io"
 
 def deploy_cert_manager(
         ns_name: str,
         version: str,
         kubernetes_distribution: str,
         depends: pulumi.Resource,
-        k8s_provider: k8s.Provider
+        k8s_provider: k8s.Provider,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None,
+        sizing: ComponentSizing = None
     ):
 
     # Create namespace
@@ -27,14 +37,14 @@ def deploy_cert_manager(
         custom_annotations=ns_annotations
     )
 
-    chart_name = "cert-manager"
+    chart_name = CHART_NAME
     chart_index_path = "index.yaml"
-    chart_url = "https://charts.jetstack.io"
+    chart_url = CHART_REPOSITORY
     chart_index_url = f"{chart_url}/{chart_index_path}"
 
     # Fetch the latest version from the helm chart index
     if version is None:
-        version = get_latest_helm_chart_version(chart_index_url, chart_name)
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_index_url, chart_name))
         version = version.lstrip("v")
         pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
     else:
@@ -42,21 +52,19 @@ def deploy_cert_manager(
         pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
 
     # Deploy cert-manager using the Helm release with updated custom values
-    helm_values = gen_helm_values(kubernetes_distribution)
+    helm_values = gen_helm_values(kubernetes_distribution, sizing)
 
     # Deploy cert-manager using the Helm release with custom values
-    release = k8s.helm.v3.Release(
+    release = create_helm_release(
         chart_name,
-        k8s.helm.v3.ReleaseArgs(
-            chart=chart_name,
-            version=version,
-            namespace=ns_name,
-            skip_await=False,
-            repository_opts= k8s.helm.v3.RepositoryOptsArgs(
-                repo=chart_url
-            ),
-            values=helm_values,
-        ),
+        chart=chart_name,
+        version=version,
+        namespace=ns_name,
+        skip_await=False,
+        repository=chart_url,
+        values=helm_values,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             provider = k8s_provider,
             parent=namespace,
@@ -69,6 +77,17 @@ def deploy_cert_manager(
         )
     )
 
+    # Wait for the cert-manager CRDs to be served before creating resources
+    crd_barrier = create_crd_barrier(
+        "cert-manager-crds",
+        [
+            "clusterissuers.cert-manager.io",
+            "certificates.cert-manager.io",
+        ],
+        depends_on=[release],
+        parent=release
+    )
+
     # Create a self-signed ClusterIssuer resource
     cluster_issuer_root = CustomResource(
         "cluster-selfsigned-issuer-root",
@@ -84,7 +103,7 @@ def deploy_cert_manager(
         opts=pulumi.ResourceOptions(
             provider = k8s_provider,
             parent=release,
-            depends_on=[namespace],
+            depends_on=[namespace, crd_barrier],
             custom_timeouts=pulumi.CustomTimeouts(
                 create="5m",
                 update="10m",
@@ -120,7 +139,7 @@ def deploy_cert_manager(
         opts=pulumi.ResourceOptions(
             provider = k8s_provider,
             parent=cluster_issuer_root,
-            depends_on=[namespace],
+            depends_on=[namespace, crd_barrier],
             custom_timeouts=pulumi.CustomTimeouts(
                 create="5m",
                 update="10m",
@@ -145,7 +164,7 @@ def deploy_cert_manager(
         opts=pulumi.ResourceOptions(
             provider=k8s_provider,
             parent=cluster_issuer_ca_certificate,
-            depends_on=[namespace],
+            depends_on=[namespace, crd_barrier],
             custom_timeouts=pulumi.CustomTimeouts(
                 create="4m",
                 update="4m",
@@ -173,23 +192,32 @@ def deploy_cert_manager(
 
     return version, release, ca_data_tls_crt_b64, ca_secret
 
-def gen_helm_values(kubernetes_distribution: str):
+def gen_helm_values(kubernetes_distribution: str, sizing: ComponentSizing = None):
+    sizing = sizing or get_sizing("cert_manager", {})
+    pdb = {'enabled': sizing['pdb'], 'minAvailable': 1}
 
     # Define custom values for the cert-manager Helm chart
     common_values = {
-        'replicaCount': 1,
+        'replicaCount': sizing['replicas'],
         'installCRDs': True,
-        'resources': {
-            'limits': {
-                'cpu': '500m',
-                'memory': '1024Mi'
-            },
-            'requests': {
-                'cpu': '250m',
-                'memory': '512Mi'
-            }
-        }
+        'resources': resources(sizing),
+        'podDisruptionBudget': pdb,
+        'webhook': {
+            'replicaCount': sizing['replicas'],
+            'resources': resources(sizing),
+            'podDisruptionBudget': pdb,
+        },
+        'cainjector': {
+            'replicaCount': sizing['replicas'],
+            'resources': resources(sizing),
+            'podDisruptionBudget': pdb,
+        },
+        'startupapicheck': {
+            'resources': resources(sizing),
+        },
     }
+    if sizing['priority_class']:
+        common_values['global'] = {'priorityClassName': sizing['priority_class']}
 
     if kubernetes_distribution == 'kind':
         # Kind-specific Helm values
@@ -0,0 +1,410 @@
+import re
+from typing import Optional, TypedDict
+
+# Datapath features of the performance profile, in dependency order
+PERFORMANCE_FEATURES = ("host_routing", "big_tcp_ipv4", "big_tcp_ipv6", "netkit", "bandwidth_manager", "bbr")
+
+# Minimum node kernel version of each feature, see the Cilium system requirements
+KERNEL_REQUIREMENTS = {
+    "big_tcp_ipv4": (6, 3),
+    "big_tcp_ipv6": (5, 19),
+    "netkit": (6, 8),
+    "host_routing": (5, 10),
+    "bandwidth_manager": (5, 1),
+    "bbr": (5, 18),
+}
+
+# Kernel version assumed for Talos nodes when `performance.kernel_version` is not set
+DEFAULT_KERNEL_VERSIONS = {
+    "talos": "6.6",
+}
+
+# Minimum Cilium version of netkit devices
+NETKIT_MIN_VERSION = (1, 16)
+
+# BPF map sizing keys of `performance.bpf` and their Cilium Helm values
+BPF_MAP_VALUES = {
+    "map_dynamic_size_ratio": "mapDynamicSizeRatio",
+    "ct_tcp_max": "ctTcpMax",
+    "ct_any_max": "ctAnyMax",
+    "nat_max": "natMax",
+}
+
+class CiliumPerformance(TypedDict):
+    """
+    Resolved datapath performance profile of Cilium.
+
+    Attributes:
+        kernel_version (str): The minimum node kernel version the features are validated against.
+        big_tcp_ipv4 (bool): Whether to enable IPv4 BIG TCP.
+        big_tcp_ipv6 (bool): Whether to enable IPv6 BIG TCP.
+        netkit (bool): Whether to use netkit instead of veth devices for pods.
+        host_routing (bool): Whether to route in eBPF instead of the host stack.
+        bandwidth_manager (bool): Whether to enable the bandwidth manager.
+        bbr (bool): Whether the bandwidth manager uses BBR congestion control for pods.
+        bpf (dict): The BPF map sizing Helm values.
+    """
+    kernel_version: str
+    big_tcp_ipv4: bool
+    big_tcp_ipv6: bool
+    netkit: bool
+    host_routing: bool
+    bandwidth_manager: bool
+    bbr: bool
+    bpf: dict
+
+def parse_version(version: str) -> tuple:
+    """
+    Parses the major and minor numbers of a kernel or chart version such as "6.6.32-talos".
+
+    Raises:
+        ValueError: If the version is not valid.
+    """
+    match = re.match(r"v?(\d+)\.(\d+)", str(version).strip())
+    if not match:
+        raise ValueError(f"Invalid version '{version}', expected e.g. '6.6'")
+    return int(match.group(1)), int(match.group(2))
+
+def get_performance(config_cilium: dict, kubernetes_distribution: str) -> Optional[CiliumPerformance]:
+    """
+    Resolves the datapath performance profile from the cilium `performance` config key.
+
+    `performance.enabled` turns on every feature of PERFORMANCE_FEATURES supported by
+    `performance.kernel_version`, the oldest kernel of the nodes, which defaults to the
+    kernel of the distribution when known. Features can be set to false, or set to
+    true to fail instead of being skipped when they are not supported. IPv6 BIG TCP
+    is only enabled when set, the Kargo clusters are IPv4 only by default.
+
+    Args:
+        config_cilium (dict): The cilium module configuration.
+        kubernetes_distribution (str): The Kubernetes distribution.
+
+    Returns:
+        CiliumPerformance: The resolved profile, or None when it is not enabled.
+
+    Raises:
+        ValueError: If a feature is not supported by the kernel, the distribution or the Cilium version.
+    """
+    config = (config_cilium or {}).get("performance") or {}
+    if str(config.get("enabled")).lower() != "true":
+        return None
+
+    kernel_version = config.get("kernel_version") or DEFAULT_KERNEL_VERSIONS.get(kubernetes_distribution)
+    if kernel_version is None:
+        raise ValueError(
+            f"cilium.performance.kernel_version is required on {kubernetes_distribution}, set it to the oldest node kernel version"
+        )
+    kernel = parse_version(kernel_version)
+
+    features = {}
+    for feature in PERFORMANCE_FEATURES:
+        unsupported = None
+        if kernel < KERNEL_REQUIREMENTS[feature]:
+            required = ".".join(map(str, KERNEL_REQUIREMENTS[feature]))
+            unsupported = f"kernel {required} or later, the nodes run {kernel_version}"
+        elif feature.startswith("big_tcp") and kubernetes_distribution != "talos":
+            unsupported = f"native routing, which is not used on {kubernetes_distribution}"
+        elif feature in ("big_tcp_ipv4", "big_tcp_ipv6", "netkit") and not features["host_routing"]:
+            unsupported = "cilium.performance.host_routing"
+        elif feature == "netkit" and config_cilium.get("version") and parse_version(config_cilium["version"]) < NETKIT_MIN_VERSION:
+            unsupported = f"Cilium 1.16 or later, the configured version is {config_cilium['version']}"
+        elif feature == "bbr" and not features["bandwidth_manager"]:
+            unsupported = "cilium.performance.bandwidth_manager"
+
+        # Unset features are enabled when supported, IPv6 BIG TCP only on request
+        enabled = config.get(feature)
+        if enabled is None:
+            features[feature] = unsupported is None and feature != "big_tcp_ipv6"
+        elif str(enabled).lower() == "true":
+            if unsupported:
+                raise ValueError(f"cilium.performance.{feature} requires {unsupported}")
+            features[feature] = True
+        else:
+            features[feature] = False
+
+    bpf_config = config.get("bpf") or {}
+    for key in bpf_config:
+        if key not in BPF_MAP_VALUES:
+            raise ValueError(f"Unsupported cilium.performance.bpf key '{key}', expected one of: {', '.join(BPF_MAP_VALUES)}")
+    ratio = bpf_config.get("map_dynamic_size_ratio")
+    if ratio is not None and not 0 < float(ratio) <= 1:
+        raise ValueError(f"cilium.performance.bpf.map_dynamic_size_ratio must be between 0 and 1, got {ratio}")
+    bpf = {
+        BPF_MAP_VALUES[key]: float(value) if key == "map_dynamic_size_ratio" else int(value)
+        for key, value in bpf_config.items()
+    }
+
+    return CiliumPerformance(kernel_version=str(kernel_version), bpf=bpf, **features)
+
+def gen_performance_values(performance: CiliumPerformance) -> dict:
+    """Returns the Cilium Helm values of a performance profile, the `bpf` values are merged by the caller."""
+    values = {"bpf": dict(performance["bpf"])}
+    if performance["big_tcp_ipv4"]:
+        values["enableIPv4BIGTCP"] = True
+    if performance["big_tcp_ipv6"]:
+        values["enableIPv6BIGTCP"] = True
+    if performance["host_routing"]:
+        # eBPF host routing needs eBPF masquerading
+        values["bpf"]["hostLegacyRouting"] = False
+        values["bpf"]["masquerade"] = True
+    if performance["netkit"]:
+        values["bpf"]["datapathMode"] = "netkit"
+    if performance["bandwidth_manager"]:
+        values["bandwidthManager"] = {"enabled": True, "bbr": performance["bbr"]}
+    return values
+
+# Load balancer settings of `load_balancer`, their allowed values and their defaults per distribution
+LOAD_BALANCER_ALGORITHMS = ("maglev", "random")
+LOAD_BALANCER_MODES = ("snat", "dsr", "hybrid")
+DSR_DISPATCHES = ("opt", "geneve")
+ACCELERATIONS = ("disabled", "native", "best-effort")
+DEFAULT_LOAD_BALANCER = {
+    "talos": {"algorithm": "maglev", "mode": "dsr", "dsr_dispatch": "opt", "acceleration": "disabled"},
+    "kind": {"algorithm": "random", "mode": "snat", "dsr_dispatch": "geneve", "acceleration": "disabled"},
+}
+
+# Maglev lookup table sizes supported by Cilium, each table size must be prime
+MAGLEV_TABLE_SIZES = (251, 509, 1021, 2039, 4093, 8191, 16381, 32749, 65521, 131071)
+DEFAULT_MAGLEV_TABLE_SIZE = 16381
+
+# Maglev keeps backend disruption low when the table is this many times larger than the backends
+MAGLEV_BACKEND_RATIO = 100
+
+class CiliumLoadBalancer(TypedDict):
+    """
+    Resolved service load balancing settings of Cilium.
+
+    Attributes:
+        algorithm (str): The backend selection algorithm, one of LOAD_BALANCER_ALGORITHMS.
+        mode (str): The forwarding mode, one of LOAD_BALANCER_MODES. hybrid uses DSR for TCP and SNAT for UDP.
+        dsr_dispatch (str): How DSR requests reach the backend node, one of DSR_DISPATCHES.
+        acceleration (str): The XDP acceleration, one of ACCELERATIONS.
+        maglev_table_size (int): The Maglev lookup table size per service, or None for non-Maglev algorithms.
+    """
+    algorithm: str
+    mode: str
+    dsr_dispatch: str
+    acceleration: str
+    maglev_table_size: Optional[int]
+
+def _choice(config: dict, key: str, choices: tuple, default: str) -> str:
+    value = str(config.get(key) or default).lower()
+    if value not in choices:
+        raise ValueError(f"Unsupported cilium.load_balancer.{key} '{value}', expected one of: {', '.join(choices)}")
+    return value
+
+def get_load_balancer(config_cilium: dict, kubernetes_distribution: str) -> CiliumLoadBalancer:
+    """
+    Resolves the service load balancing settings from the cilium `load_balancer` config key.
+
+    Unset settings default to the DEFAULT_LOAD_BALANCER of the distribution. Talos nodes
+    use native routing, so DSR dispatches with the IP option. Kind clusters use tunnel
+    routing, where DSR and hybrid modes dispatch in Geneve, switching the tunnel to
+    Geneve. The Maglev table size must be one of MAGLEV_TABLE_SIZES and, when
+    `maglev.max_backends` is set, at least MAGLEV_BACKEND_RATIO times that backend count.
+
+    Args:
+        config_cilium (dict): The cilium module configuration.
+        kubernetes_distribution (str): The Kubernetes distribution.
+
+    Returns:
+        CiliumLoadBalancer: The resolved settings.
+
+    Raises:
+        ValueError: If a setting is not valid or not supported on the distribution.
+    """
+    config = (config_cilium or {}).get("load_balancer") or {}
+    defaults = DEFAULT_LOAD_BALANCER.get(kubernetes_distribution)
+    if defaults is None:
+        raise ValueError(f"Unsupported Kubernetes distribution: {kubernetes_distribution}")
+
+    algorithm = _choice(config, "algorithm", LOAD_BALANCER_ALGORITHMS, defaults["algorithm"])
+    mode = _choice(config, "mode", LOAD_BALANCER_MODES, defaults["mode"])
+    dsr_dispatch = _choice(config, "dsr_dispatch", DSR_DISPATCHES, defaults["dsr_dispatch"])
+    acceleration = _choice(config, "acceleration", ACCELERATIONS, defaults["acceleration"])
+
+    # The IP option needs native routing, Geneve dispatch needs a Geneve tunnel
+    if mode != "snat" and kubernetes_distribution == "talos" and dsr_dispatch != "opt":
+        raise ValueError(f"cilium.load_balancer.dsr_dispatch '{dsr_dispatch}' requires tunnel routing, Talos uses native routing with the 'opt' dispatch")
+    if mode != "snat" and kubernetes_distribution == "kind" and dsr_dispatch != "geneve":
+        raise ValueError(f"cilium.load_balancer.dsr_dispatch '{dsr_dispatch}' requires native routing, kind uses tunnel routing with the 'geneve' dispatch")
+    # XDP needs native driver support on the node devices, the veth devices of kind nodes have none
+    if acceleration != "disabled" and kubernetes_distribution == "kind":
+        raise ValueError("cilium.load_balancer.acceleration is not supported on kind, the node devices have no native XDP support")
+
+    maglev = config.get("maglev") or {}
+    maglev_table_size = None
+    if algorithm == "maglev":
+        maglev_table_size = int(maglev.get("table_size") or DEFAULT_MAGLEV_TABLE_SIZE)
+        if maglev_table_size not in MAGLEV_TABLE_SIZES:
+            raise ValueError(
+                f"Unsupported cilium.load_balancer.maglev.table_size {maglev_table_size}, expected one of: {', '.join(map(str, MAGLEV_TABLE_SIZES))}"
+            )
+        max_backends = maglev.get("max_backends")
+        if max_backends and maglev_table_size < MAGLEV_BACKEND_RATIO * int(max_backends):
+            suggested = next((size for size in MAGLEV_TABLE_SIZES if size >= MAGLEV_BACKEND_RATIO * int(max_backends)), None)
+            raise ValueError(
+                f"cilium.load_balancer.maglev.table_size {maglev_table_size} is too small for {max_backends} backends per service, "
+                + (f"use {suggested} or larger" if suggested else f"the largest table size supports {MAGLEV_TABLE_SIZES[-1] // MAGLEV_BACKEND_RATIO} backends")
+            )
+    elif maglev:
+        raise ValueError(f"cilium.load_balancer.maglev requires the maglev algorithm, the algorithm is '{algorithm}'")
+
+    return CiliumLoadBalancer(
+        algorithm=algorithm,
+        mode=mode,
+        dsr_dispatch=dsr_dispatch,
+        acceleration=acceleration,
+        maglev_table_size=maglev_table_size,
+    )
+
+def gen_load_balancer_values(load_balancer: CiliumLoadBalancer) -> dict:
+    """Returns the Cilium Helm values of the load balancing settings."""
+    values = {
+        "loadBalancer": {
+            "algorithm": load_balancer["algorithm"],
+            "mode": load_balancer["mode"],
+            "acceleration": load_balancer["acceleration"],
+        },
+    }
+    if load_balancer["mode"] != "snat":
+        values["loadBalancer"]["dsrDispatch"] = load_balancer["dsr_dispatch"]
+        if load_balancer["dsr_dispatch"] == "geneve":
+            values["tunnelProtocol"] = "geneve"
+    if load_balancer["maglev_table_size"]:
+        values["maglev"] = {"tableSize": load_balancer["maglev_table_size"]}
+    return values
+
+# Monitor aggregation levels, higher levels report fewer events per connection
+MONITOR_AGGREGATION_LEVELS = ("none", "low", "medium", "maximum")
+
+# Hubble metrics, each may carry options, e.g. "dns:query;ignoreAAAA"
+HUBBLE_METRICS = (
+    "dns", "drop", "tcp", "flow", "flows-to-world", "port-distribution",
+    "icmp", "http", "httpV2", "kafka", "policy",
+)
+
+# Event buffer capacities must be one less than a power of two
+MAX_EVENT_BUFFER_CAPACITY = 65535
+
+class CiliumHubble(TypedDict):
+    """
+    Resolved Hubble settings of Cilium.
+
+    Attributes:
+        enabled (bool): Whether Hubble records flows in the agents.
+        relay (bool): Whether Hubble Relay serves the flows of all nodes.
+        ui (bool): Whether the Hubble UI is deployed.
+        event_buffer_capacity (int): The flow ring buffer capacity of each agent, or None for the chart default.
+        event_queue_size (int): The event queue size of each agent, or None for the chart default.
+        monitor_aggregation (str): The monitor aggregation level, or None for the chart default.
+        monitor_interval (str): The aggregation interval of connection events, or None for the chart default.
+        metrics (list): The Hubble metrics to export, or None for none.
+    """
+    enabled: bool
+    relay: bool
+    ui: bool
+    event_buffer_capacity: Optional[int]
+    event_queue_size: Optional[int]
+    monitor_aggregation: Optional[str]
+    monitor_interval: Optional[str]
+    metrics: Optional[list]
+
+def _flag(config: dict, key: str, default: bool) -> bool:
+    return str(config.get(key, default)).lower() == "true"
+
+def get_hubble(config_cilium: dict) -> CiliumHubble:
+    """
+    Resolves the Hubble settings from the cilium `hubble` config key.
+
+    Hubble, Relay and the UI are enabled unless turned off, the UI needs Relay and
+    Relay needs Hubble. The flow buffer, the monitor aggregation and the metrics keep
+    the chart defaults unless set.
+
+    Args:
+        config_cilium (dict): The cilium module configuration.
+
+    Returns:
+        CiliumHubble: The resolved settings.
+
+    Raises:
+        ValueError: If a setting is not valid.
+    """
+    config = (config_cilium or {}).get("hubble") or {}
+
+    enabled = _flag(config, "enabled", True)
+    relay = enabled and _flag(config, "relay", True)
+    ui = relay and _flag(config, "ui", True)
+    if _flag(config, "ui", False) and not ui:
+        raise ValueError("cilium.hubble.ui requires cilium.hubble.enabled and cilium.hubble.relay")
+
+    capacity = config.get("event_buffer_capacity")
+    if capacity is not None:
+        capacity = int(capacity)
+        if not 0 < capacity <= MAX_EVENT_BUFFER_CAPACITY or capacity & (capacity + 1):
+            raise ValueError(
+                f"cilium.hubble.event_buffer_capacity must be one less than a power of two, up to {MAX_EVENT_BUFFER_CAPACITY}, e.g. 4095, got {capacity}"
+            )
+
+    queue_size = config.get("event_queue_size")
+    if queue_size is not None:
+        queue_size = int(queue_size)
+        if queue_size < 0:
+            raise ValueError(f"cilium.hubble.event_queue_size must not be negative, got {queue_size}")
+
+    monitor_aggregation = config.get("monitor_aggregation")
+    if monitor_aggregation is not None:
+        monitor_aggregation = str(monitor_aggregation).lower()
+        if monitor_aggregation not in MONITOR_AGGREGATION_LEVELS:
+            raise ValueError(
+                f"Unsupported cilium.hubble.monitor_aggregation '{monitor_aggregation}', expected one of: {', '.join(MONITOR_AGGREGATION_LEVELS)}"
+            )
+
+    monitor_interval = config.get("monitor_interval")
+    if monitor_interval is not None:
+        monitor_interval = str(monitor_interval)
+        if not re.fullmatch(r"(\d+(ms|s|m))+", monitor_interval):
+            raise ValueError(f"Invalid cilium.hubble.monitor_interval '{monitor_interval}', expected e.g. '5s'")
+
+    metrics = config.get("metrics")
+    if metrics is not None:
+        metrics = [str(metric) for metric in metrics]
+        for metric in metrics:
+            if metric.split(":", 1)[0] not in HUBBLE_METRICS:
+                raise ValueError(f"Unsupported cilium.hubble.metrics '{metric}', expected one of: {', '.join(HUBBLE_METRICS)}")
+        if metrics and not enabled:
+            raise ValueError("cilium.hubble.metrics requires cilium.hubble.enabled")
+
+    return CiliumHubble(
+        enabled=enabled,
+        relay=relay,
+        ui=ui,
+        event_buffer_capacity=capacity,
+        event_queue_size=queue_size,
+        monitor_aggregation=monitor_aggregation,
+        monitor_interval=monitor_interval,
+        metrics=metrics,
+    )
+
+def gen_hubble_values(hubble: CiliumHubble) -> dict:
+    """Returns the Cilium Helm values of the Hubble settings, the `bpf` values are merged by the caller."""
+    values = {
+        "hubble": {
+            "enabled": hubble["enabled"],
+            "relay": {"enabled": hubble["relay"]},
+            "ui": {"enabled": hubble["ui"]},
+        },
+        "bpf": {},
+    }
+    if hubble["event_buffer_capacity"] is not None:
+        values["hubble"]["eventBufferCapacity"] = hubble["event_buffer_capacity"]
+    if hubble["event_queue_size"] is not None:
+        values["hubble"]["eventQueueSize"] = hubble["event_queue_size"]
+    if hubble["metrics"]:
+        values["hubble"]["metrics"] = {"enabled": hubble["metrics"]}
+    # The monitor aggregation also bounds the events the agents generate for Hubble
+    if hubble["monitor_aggregation"] is not None:
+        values["bpf"]["monitorAggregation"] = hubble["monitor_aggregation"]
+    if hubble["monitor_interval"] is not None:
+        values["bpf"]["monitorInterval"] = hubble["monitor_interval"]
+    return values
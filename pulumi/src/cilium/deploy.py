@@ -1,7 +1,15 @@
 import pulumi
 import pulumi_kubernetes as k8s
 from pulumi_kubernetes.apiextensions import CustomResource
+from src.lib.crd_barrier import create_crd_barrier
 from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+from src.lib.sizing import ComponentSizing, get_sizing, resources
+from src.cilium.config import CiliumHubble, CiliumLoadBalancer, CiliumPerformance, gen_hubble_values, gen_load_balancer_values, gen_performance_values, get_hubble, get_load_balancer
+
+CHART_NAME = "cilium"
+CHART_REPOSITORY = "https://helm.cilium.io/"
 
 def deploy_cilium(
         name: str,
@@ -12,32 +20,41 @@ def deploy_cilium(
         namespace: str,
         version: str,
         l2_bridge_name: str,
-        l2announcements: str
+        l2announcements: str,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None,
+        sizing: ComponentSizing = None,
+        performance: CiliumPerformance = None,
+        load_balancer: CiliumLoadBalancer = None,
+        hubble: CiliumHubble = None,
+        local_redirect_policy: bool = False
     ):
 
     # Fetch the latest version of the Cilium Helm chart
-    chart_name = "cilium"
+    chart_name = CHART_NAME
     chart_index_url = "https://raw.githubusercontent.com/cilium/charts/master/index.yaml"
 
     if version is None:
         # Fetch the latest version of the Cilium Helm chart
-        version = get_latest_helm_chart_version(chart_index_url, chart_name)
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_index_url, chart_name))
         pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
     else:
         # Log the version override
         pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
 
     # Determine Helm values based on the Kubernetes distribution
-    helm_values = get_helm_values(kubernetes_distribution, project_name, kubernetes_endpoint_service_address)
+    helm_values = get_helm_values(kubernetes_distribution, project_name, kubernetes_endpoint_service_address, sizing, performance, load_balancer, hubble, local_redirect_policy)
 
     # Deploy Cilium using the Helm chart
-    release = k8s.helm.v3.Release(
+    release = create_helm_release(
         name,
-        chart="cilium",
+        chart=chart_name,
         version=version,
         values=helm_values,
         namespace=namespace,
-        repository_opts={"repo": "https://helm.cilium.io/"},
+        repository=CHART_REPOSITORY,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             provider=k8s_provider,
             custom_timeouts=pulumi.CustomTimeouts(
@@ -48,6 +65,17 @@ def deploy_cilium(
         )
     )
 
+    # The Cilium operator registers its CRDs at startup, wait for them before creating resources
+    crd_barrier = create_crd_barrier(
+        "cilium-crds",
+        [
+            "ciliuml2announcementpolicies.cilium.io",
+            "ciliumloadbalancerippools.cilium.io",
+        ],
+        depends_on=[release],
+        parent=release
+    )
+
     cilium_l2_announcement_policy = CustomResource(
         "cilium_l2_announcement_policy",
         api_version="cilium.io/v2alpha1",
@@ -61,6 +89,7 @@ def deploy_cilium(
         },
         opts=pulumi.ResourceOptions(
             parent=release,
+            depends_on=[crd_barrier],
             provider=k8s_provider,
             custom_timeouts=pulumi.CustomTimeouts(
                 create="8m",
@@ -81,6 +110,7 @@ def deploy_cilium(
         },
         opts=pulumi.ResourceOptions(
             parent=release,
+            depends_on=[crd_barrier],
             provider=k8s_provider,
             custom_timeouts=pulumi.CustomTimeouts(
                 create="8m",
@@ -95,8 +125,23 @@ def deploy_cilium(
 def get_helm_values(
         kubernetes_distribution: str,
         project_name: str,
-        kubernetes_endpoint_service_address: str
+        kubernetes_endpoint_service_address: str,
+        sizing: ComponentSizing = None,
+        performance: CiliumPerformance = None,
+        load_balancer: CiliumLoadBalancer = None,
+        hubble: CiliumHubble = None,
+        local_redirect_policy: bool = False
     ):
+    # The sizing applies to the operator, the agent runs on every node
+    sizing = sizing or get_sizing("cilium", {})
+    load_balancer = load_balancer or get_load_balancer({}, kubernetes_distribution)
+    hubble = hubble or get_hubble({})
+    operator_values = {
+        "replicas": sizing["replicas"],
+        "resources": resources(sizing),
+        "podDisruptionBudget": {"enabled": sizing["pdb"], "maxUnavailable": 1},
+    }
+
     # Common Cilium Helm Chart Values
     common_values = {
         "cluster": {
@@ -112,15 +157,10 @@ def get_helm_values(
         "cluster": {"name": "pulumi"},
         "externalIPs": {"enabled": True},
         "gatewayAPI": {"enabled": False},
-        "hubble": {
-            "enabled": True,
-            "relay": {"enabled": True},
-            "ui": {"enabled": True},
-        },
         "ipam": {"mode": "kubernetes"},
         "nodePort": {"enabled": True},
         "hostPort": {"enabled": True},
-        "operator": {"replicas": 1},
+        "operator": operator_values,
         "serviceAccounts": {
             "cilium": {"name": "cilium"},
             "operator": {"name": "cilium-operator"},
@@ -128,14 +168,14 @@ def get_helm_values(
     }
     # Kind Kubernetes specific Helm values
     if kubernetes_distribution == 'kind':
-        return {
+        helm_values = {
             **common_values,
             "k8sServiceHost": kubernetes_endpoint_service_address,
             "k8sServicePort": 6443,
         }
     elif kubernetes_distribution == 'talos':
         # Talos-specific Helm values per the Talos Cilium Docs
-        return {
+        helm_values = {
             **common_values,
             "cni": {
                 "install": True,
@@ -148,10 +188,6 @@ def get_helm_values(
             "endpointRoutes": {"enabled": True},
             "bpf": {"masquerade": True},
             "localRedirectPolicy": True,
-            "loadBalancer": {
-                "algorithm": "maglev",
-                "mode": "dsr"
-            },
             "cgroup": {
                 "autoMount": {"enabled": False},
                 "hostRoot": "/sys/fs/cgroup",
@@ -170,7 +206,7 @@ def get_helm_values(
             "hostPort": {"enabled": True},
             "rollOutCiliumPods": True,
             "operator": {
-                "replicas": 1,
+                **operator_values,
                 "rollOutPods": True,
             },
             "securityContext": {
@@ -186,17 +222,41 @@ def get_helm_values(
         }
 
     elif kubernetes_distribution == 'kind':
-        return {
+        helm_values = {
             **common_values,
             "k8sServiceHost": kubernetes_endpoint_ip_string,
             "k8sServicePort": 6443,
             "kubeProxyReplacement": "strict",
-            "operator": {"replicas": 1},
+            "operator": operator_values,
             "routingMode": "tunnel",
         }
     else:
         raise ValueError(f"Unsupported Kubernetes distribution: {kubernetes_distribution}")
 
+    # CiliumLocalRedirectPolicy support, used by the node_local_dns module
+    if local_redirect_policy:
+        helm_values["localRedirectPolicy"] = True
+
+    # Service load balancing per distribution, see src/cilium/config.py
+    helm_values = {**helm_values, **gen_load_balancer_values(load_balancer)}
+
+    # Hubble flow visibility and its event rate, see src/cilium/config.py
+    hubble_values = gen_hubble_values(hubble)
+    helm_values = {**helm_values, "hubble": hubble_values["hubble"]}
+    if hubble_values["bpf"]:
+        helm_values["bpf"] = {**helm_values.get("bpf", {}), **hubble_values["bpf"]}
+
+    # The datapath performance profile, see src/cilium/config.py
+    if performance:
+        performance_values = gen_performance_values(performance)
+        helm_values = {
+            **helm_values,
+            **performance_values,
+            "bpf": {**helm_values.get("bpf", {}), **performance_values["bpf"]},
+        }
+
+    return helm_values
+
 # Deploy test loadbalancer service
 def deploy_test_service(
         namespace: str,
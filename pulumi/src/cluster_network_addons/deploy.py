@@ -1,14 +1,18 @@
 import os
-import requests
 import pulumi
 import pulumi_kubernetes as k8s
 from pulumi_kubernetes.apiextensions.CustomResource import CustomResource
 from src.lib.namespace import create_namespace
+from src.lib.crd_barrier import create_crd_barrier
+from src.lib.priority import priority_class_transformation
+from src.lib.helm_chart_versions import get_latest_github_release_version
+from src.lib.version_lock import resolve_latest_version
 
 def deploy_cnao(
         depends,
         version: str,
-        k8s_provider: k8s.Provider
+        k8s_provider: k8s.Provider,
+        priority_class: str = None
     ):
 
     # Create namespace
@@ -32,9 +36,7 @@ def deploy_cnao(
     # Fetch the latest stable version of CDI
     if version is None:
         tag_url = 'https://github.com/kubevirt/cluster-network-addons-operator/releases/latest'
-        tag = requests.get(tag_url, allow_redirects=False).headers.get('location')
-        version = tag.split('/')[-1]
-        version = version.lstrip('v')
+        version = resolve_latest_version("cnao", lambda: get_latest_github_release_version(tag_url))
         pulumi.log.info(f"Setting helm release version to latest: cnao/{version}")
     else:
         # Log the version override
@@ -64,6 +66,7 @@ def deploy_cnao(
             parent=nado_crd_resource,
             depends_on=depends,
             provider=k8s_provider,
+            transformations=[priority_class_transformation(priority_class)],
             custom_timeouts=pulumi.CustomTimeouts(
                 create="8m",
                 update="8m",
@@ -72,6 +75,14 @@ def deploy_cnao(
         )
     )
 
+    # Wait for the NetworkAddonsConfig CRD to be served before creating the resource
+    crd_barrier = create_crd_barrier(
+        "network-addons-config-crds",
+        ["networkaddonsconfigs.networkaddonsoperator.network.kubevirt.io"],
+        depends_on=[nado_crd_resource, nado_operator_resource],
+        parent=nado_crd_resource
+    )
+
     network_addons_config = CustomResource(
         "network-addons-config",
         api_version="networkaddonsoperator.network.kubevirt.io/v1",
@@ -81,7 +92,7 @@ def deploy_cnao(
         },
         opts=pulumi.ResourceOptions(
             parent=namespace,
-            depends_on=depends,
+            depends_on=[crd_barrier],
             provider=k8s_provider,
             custom_timeouts=pulumi.CustomTimeouts(
                 create="8m",
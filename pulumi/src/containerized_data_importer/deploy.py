@@ -1,21 +1,23 @@
-import requests
 import pulumi
 import pulumi_kubernetes as k8s
 from pulumi_kubernetes.apiextensions.CustomResource import CustomResource
 from pulumi_kubernetes.meta.v1 import ObjectMetaArgs
+from src.lib.crd_barrier import create_crd_barrier
+from src.lib.priority import priority_class_transformation
+from src.lib.helm_chart_versions import get_latest_github_release_version
+from src.lib.version_lock import resolve_latest_version
 
 def deploy_cdi(
         depends,
         version: str,
-        k8s_provider: k8s.Provider
+        k8s_provider: k8s.Provider,
+        priority_class: str = None
     ):
 
     # Fetch the latest stable version of CDI
     if version is None:
         tag_url = 'https://github.com/kubevirt/containerized-data-importer/releases/latest'
-        tag = requests.get(tag_url, allow_redirects=False).headers.get('location')
-        version = tag.split('/')[-1]
-        version = version.lstrip('v')
+        version = resolve_latest_version("cdi", lambda: get_latest_github_release_version(tag_url))
         pulumi.log.info(f"Setting helm release version to latest stable: cdi/{version}")
     else:
         # Log the version override
@@ -27,11 +29,48 @@ def deploy_cdi(
         'cdi-operator',
         file=cdi_operator_url,
         opts=pulumi.ResourceOptions(
-            provider=k8s_provider
+            provider=k8s_provider,
+            depends_on=depends,
+            transformations=[priority_class_transformation(priority_class)]
         )
     )
 
-    # Deploy the default CDI custom resource
+    # Wait for the CDI CRD to be served before creating the resource
+    crd_barrier = create_crd_barrier(
+        "cdi-crds",
+        ["cdis.cdi.kubevirt.io"],
+        depends_on=depends + [operator],
+        parent=operator
+    )
+
+    # Deploy the default CDI custom resource, the priority class applies to the CDI components
+    cdi_spec = {
+        "config": {
+            "featureGates": [
+                "HonorWaitForFirstConsumer",
+            ],
+        },
+        "imagePullPolicy": "IfNotPresent",
+        "infra": {
+            "nodeSelector": {
+                "kubernetes.io/os": "linux",
+            },
+            "tolerations": [
+                {
+                    "key": "CriticalAddonsOnly",
+                    "operator": "Exists",
+                },
+            ],
+        },
+        "workload": {
+            "nodeSelector": {
+                "kubernetes.io/os": "linux",
+            },
+        },
+    }
+    if priority_class:
+        cdi_spec["priorityClass"] = priority_class
+
     cdi_resource = CustomResource(
         "cdi",
         api_version="cdi.kubevirt.io/v1beta1",
@@ -40,34 +79,11 @@ def deploy_cdi(
             "name": "cdi",
             "namespace": "cdi",
         },
-        spec={
-            "config": {
-                "featureGates": [
-                    "HonorWaitForFirstConsumer",
-                ],
-            },
-            "imagePullPolicy": "IfNotPresent",
-            "infra": {
-                "nodeSelector": {
-                    "kubernetes.io/os": "linux",
-                },
-                "tolerations": [
-                    {
-                        "key": "CriticalAddonsOnly",
-                        "operator": "Exists",
-                    },
-                ],
-            },
-            "workload": {
-                "nodeSelector": {
-                    "kubernetes.io/os": "linux",
-                },
-            },
-        },
+        spec=cdi_spec,
         opts=pulumi.ResourceOptions(
             provider=k8s_provider,
             parent=operator,
-            depends_on=depends
+            depends_on=[crd_barrier]
         )
     )
 
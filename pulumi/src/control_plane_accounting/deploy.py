@@ -0,0 +1,140 @@
+import pulumi
+import pulumi_kubernetes as k8s
+
+# FlowSchemas are named kargo-<module>, and kargo-<module>-leases for leader election
+FLOW_SCHEMA_PREFIX = "kargo-"
+LEASES_SUFFIX = "-leases"
+
+# Service accounts of each Kargo module, "*" for every service account of a namespace
+MODULE_SERVICE_ACCOUNTS = {
+    "cilium": [("kube-system", "cilium"), ("kube-system", "cilium-operator"), ("kube-system", "hubble-relay")],
+    "multus": [("kube-system", "multus")],
+    "node_local_dns": [("kube-system", "node-local-dns")],
+    "cert_manager": [("cert-manager", "*")],
+    "kubevirt": [("kubevirt", "*")],
+    "cdi": [("cdi", "*")],
+    "cnao": [("cluster-network-addons", "*")],
+    "hostpath_provisioner": [("hostpath-provisioner", "*")],
+    "prometheus": [("monitoring", "*")],
+    "kubernetes_dashboard": [("kubernetes-dashboard", "*")],
+    "kubevirt_manager": [("kubevirt-manager", "*")],
+    "openunison": [("openunison", "*")],
+    "ingress_nginx": [("ingress-nginx", "*")],
+    "ceph": [("rook-ceph", "*")],
+    "vpa": [("vpa", "*")],
+}
+
+# The FlowSchemas keep the priority levels of the default FlowSchemas matching the
+# same requests: kube-system-service-accounts (900) and service-accounts (9000) for
+# all requests, and workload-leader-election (200) for kube-system leader election
+PRECEDENCE = 850
+LEASES_PRECEDENCE = 190
+KUBE_SYSTEM_PRIORITY_LEVEL = "workload-high"
+PRIORITY_LEVEL = "workload-low"
+LEASES_PRIORITY_LEVEL = "leader-election"
+
+def get_flow_schema_module(flow_schema: str) -> str:
+    """Returns the Kargo module of a FlowSchema created by deploy_control_plane_accounting, or None."""
+    if not flow_schema.startswith(FLOW_SCHEMA_PREFIX):
+        return None
+    module = flow_schema[len(FLOW_SCHEMA_PREFIX):].removesuffix(LEASES_SUFFIX).replace("-", "_")
+    return module if module in MODULE_SERVICE_ACCOUNTS else None
+
+def _subjects(service_accounts: list) -> list:
+    return [
+        k8s.flowcontrol.v1.SubjectArgs(
+            kind="ServiceAccount",
+            service_account=k8s.flowcontrol.v1.ServiceAccountSubjectArgs(namespace=namespace, name=name),
+        )
+        for namespace, name in service_accounts
+    ]
+
+def deploy_control_plane_accounting(
+        depends: pulumi.Input[list],
+        modules: list,
+        k8s_provider: k8s.Provider
+    ) -> list:
+    """
+    Deploys one API Priority and Fairness FlowSchema per Kargo module.
+
+    The API server labels its flow control metrics with the FlowSchema each request
+    matched, so matching the service accounts of every module attributes request rate,
+    queueing and latency to the module. Requests keep their default priority levels.
+    The kube-system modules get a second FlowSchema for their leader election
+    requests, e.g. the Cilium L2 announcement leases.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on.
+        modules (list): The enabled Kargo modules, keys of MODULE_SERVICE_ACCOUNTS.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+
+    Returns:
+        list: The FlowSchema names.
+    """
+    opts = pulumi.ResourceOptions(
+        provider=k8s_provider,
+        depends_on=depends,
+        custom_timeouts=pulumi.CustomTimeouts(
+            create="2m",
+            update="2m",
+            delete="2m"
+        )
+    )
+
+    flow_schemas = []
+    for module in modules:
+        service_accounts = MODULE_SERVICE_ACCOUNTS[module]
+        kube_system = all(namespace == "kube-system" for namespace, _ in service_accounts)
+        name = FLOW_SCHEMA_PREFIX + module.replace("_", "-")
+
+        if kube_system:
+            k8s.flowcontrol.v1.FlowSchema(
+                f"flow-schema-{name}{LEASES_SUFFIX}",
+                metadata=k8s.meta.v1.ObjectMetaArgs(name=name + LEASES_SUFFIX),
+                spec=k8s.flowcontrol.v1.FlowSchemaSpecArgs(
+                    matching_precedence=LEASES_PRECEDENCE,
+                    priority_level_configuration=k8s.flowcontrol.v1.PriorityLevelConfigurationReferenceArgs(name=LEASES_PRIORITY_LEVEL),
+                    distinguisher_method=k8s.flowcontrol.v1.FlowDistinguisherMethodArgs(type="ByUser"),
+                    rules=[k8s.flowcontrol.v1.PolicyRulesWithSubjectsArgs(
+                        subjects=_subjects(service_accounts),
+                        resource_rules=[k8s.flowcontrol.v1.ResourcePolicyRuleArgs(
+                            verbs=["get", "create", "update"],
+                            api_groups=["", "coordination.k8s.io"],
+                            resources=["endpoints", "configmaps", "leases"],
+                            namespaces=["*"],
+                        )],
+                    )],
+                ),
+                opts=opts
+            )
+            flow_schemas.append(name + LEASES_SUFFIX)
+
+        k8s.flowcontrol.v1.FlowSchema(
+            f"flow-schema-{name}",
+            metadata=k8s.meta.v1.ObjectMetaArgs(name=name),
+            spec=k8s.flowcontrol.v1.FlowSchemaSpecArgs(
+                matching_precedence=PRECEDENCE,
+                priority_level_configuration=k8s.flowcontrol.v1.PriorityLevelConfigurationReferenceArgs(
+                    name=KUBE_SYSTEM_PRIORITY_LEVEL if kube_system else PRIORITY_LEVEL,
+                ),
+                distinguisher_method=k8s.flowcontrol.v1.FlowDistinguisherMethodArgs(type="ByUser"),
+                rules=[k8s.flowcontrol.v1.PolicyRulesWithSubjectsArgs(
+                    subjects=_subjects(service_accounts),
+                    resource_rules=[k8s.flowcontrol.v1.ResourcePolicyRuleArgs(
+                        verbs=["*"],
+                        api_groups=["*"],
+                        resources=["*"],
+                        cluster_scope=True,
+                        namespaces=["*"],
+                    )],
+                    non_resource_rules=[k8s.flowcontrol.v1.NonResourcePolicyRuleArgs(
+                        verbs=["*"],
+                        non_resource_urls=["*"],
+                    )],
+                )],
+            ),
+            opts=opts
+        )
+        flow_schemas.append(name)
+
+    return flow_schemas
@@ -0,0 +1,147 @@
+import pulumi
+import pulumi_kubernetes as k8s
+from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+
+CHART_NAME = "descheduler"
+CHART_REPOSITORY = "https://kubernetes-sigs.github.io/descheduler"
+
+# LowNodeUtilization thresholds, in percent of node allocatable. Nodes below all
+# thresholds are underutilized, pods are evicted from nodes above any target threshold.
+DEFAULT_THRESHOLDS = {"cpu": 20, "memory": 20, "pods": 20}
+DEFAULT_TARGET_THRESHOLDS = {"cpu": 50, "memory": 50, "pods": 50}
+DEFAULT_INTERVAL = "5m"
+
+def get_thresholds(config_descheduler: dict) -> tuple:
+    """
+    Resolves the LowNodeUtilization thresholds from the descheduler module config.
+
+    Args:
+        config_descheduler (dict): The descheduler module configuration object.
+
+    Returns:
+        tuple: The thresholds and the target thresholds.
+
+    Raises:
+        ValueError: If a threshold is not below its target threshold.
+    """
+    thresholds = {**DEFAULT_THRESHOLDS, **(config_descheduler.get("thresholds") or {})}
+    target_thresholds = {**DEFAULT_TARGET_THRESHOLDS, **(config_descheduler.get("target_thresholds") or {})}
+    for resource, threshold in thresholds.items():
+        if resource in target_thresholds and int(threshold) >= int(target_thresholds[resource]):
+            raise ValueError(
+                f"descheduler threshold for {resource} ({threshold}) must be below its target threshold ({target_thresholds[resource]})"
+            )
+    return thresholds, target_thresholds
+
+def deploy_descheduler(
+        depends: pulumi.Input[list],
+        version: str,
+        interval: str,
+        thresholds: dict,
+        target_thresholds: dict,
+        k8s_provider: k8s.Provider,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None
+    ):
+    """
+    Deploys the descheduler with the LowNodeUtilization and RemoveDuplicates policies.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on.
+        version (str): The descheduler chart version, or None for the latest.
+        interval (str): The descheduling interval, such as "5m".
+        thresholds (dict): The LowNodeUtilization thresholds, see get_thresholds.
+        target_thresholds (dict): The LowNodeUtilization target thresholds.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+        helm_engine (str): The Helm engine, see src/lib/helm_release.get_helm_engine.
+        helm_timeouts (dict): Helm release timeout overrides.
+
+    Returns:
+        tuple: The chart version and the descheduler release.
+    """
+    chart_name = CHART_NAME
+    chart_url = CHART_REPOSITORY
+    chart_index_url = f"{chart_url}/index.yaml"
+
+    # Fetch the latest version from the helm chart index
+    if version is None:
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_index_url, chart_name))
+        version = version.lstrip("v")
+        pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
+    else:
+        pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
+
+    release = create_helm_release(
+        chart_name,
+        chart=chart_name,
+        version=version,
+        namespace="kube-system",
+        skip_await=False,
+        repository=chart_url,
+        values=gen_helm_values(interval, thresholds, target_thresholds),
+        engine=helm_engine,
+        timeouts=helm_timeouts,
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            depends_on=depends,
+            custom_timeouts=pulumi.CustomTimeouts(
+                create="5m",
+                update="5m",
+                delete="2m"
+            )
+        )
+    )
+
+    return version, release
+
+def gen_helm_values(interval: str, thresholds: dict, target_thresholds: dict) -> dict:
+    """
+    Generates the descheduler Helm values.
+
+    KubeVirt annotates the virt-launcher pods of live-migratable VMIs as evictable
+    despite their local storage, and its eviction webhook turns their eviction into
+    a live migration. The descheduler waits for those background evictions instead
+    of counting the denied eviction as a failure. The launcher pods of VMIs that
+    cannot migrate keep the local storage protection, so they are never restarted.
+    """
+    return {
+        "kind": "Deployment",
+        "deschedulingInterval": interval or DEFAULT_INTERVAL,
+        "cmdOptions": {
+            "feature-gates": "EvictionsInBackground=true",
+        },
+        "deschedulerPolicyAPIVersion": "descheduler/v1alpha2",
+        "deschedulerPolicy": {
+            "profiles": [{
+                "name": "kargo",
+                "pluginConfig": [
+                    {
+                        "name": "DefaultEvictor",
+                        "args": {
+                            "evictLocalStoragePods": False,
+                            "evictSystemCriticalPods": False,
+                            "ignorePvcPods": False,
+                            "nodeFit": True,
+                        },
+                    },
+                    {
+                        "name": "LowNodeUtilization",
+                        "args": {
+                            "thresholds": thresholds,
+                            "targetThresholds": target_thresholds,
+                        },
+                    },
+                    {
+                        "name": "RemoveDuplicates",
+                    },
+                ],
+                "plugins": {
+                    "balance": {
+                        "enabled": ["LowNodeUtilization", "RemoveDuplicates"],
+                    },
+                },
+            }],
+        },
+    }
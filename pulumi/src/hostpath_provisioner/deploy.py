@@ -1,4 +1,3 @@
-import requests
 import pulumi
 from pulumi import ResourceOptions
 import pulumi_kubernetes as k8s
@@ -6,6 +5,10 @@ from pulumi_kubernetes.apiextensions import CustomResource
 from pulumi_kubernetes.meta.v1 import ObjectMetaArgs
 from pulumi_kubernetes.storage.v1 import StorageClass
 from src.lib.namespace import create_namespace
+from src.lib.crd_barrier import create_crd_barrier
+from src.lib.priority import priority_class_transformation
+from src.lib.helm_chart_versions import get_latest_github_release_version
+from src.lib.version_lock import resolve_latest_version
 
 def deploy(
         depends: pulumi.Output[list],
@@ -14,14 +17,13 @@ def deploy(
         hostpath: str,
         default: bool,
         k8s_provider: k8s.Provider,
+        priority_class: str = None,
     ):
 
     # If version is not supplied, fetch the latest stable version
     if version is None:
         tag_url = 'https://github.com/kubevirt/hostpath-provisioner-operator/releases/latest'
-        tag = requests.get(tag_url, allow_redirects=False).headers.get('location')
-        version = tag.split('/')[-1] if tag else '0.17.0'
-        version = version.lstrip('v')
+        version = resolve_latest_version("hostpath-provisioner", lambda: get_latest_github_release_version(tag_url, default='0.17.0'))
         pulumi.log.info(f"Setting helm release version to latest stable: hostpath-provisioner/{version}")
     else:
         pulumi.log.info(f"Using helm release version: hostpath-provisioner/{version}")
@@ -73,7 +75,7 @@ def deploy(
             parent=namespace,
             depends_on=depends,
             provider=k8s_provider,
-            transformations=[add_namespace],
+            transformations=[add_namespace, priority_class_transformation(priority_class)],
             custom_timeouts=pulumi.CustomTimeouts(
                 create="1m",
                 update="1m",
@@ -91,7 +93,7 @@ def deploy(
             parent=webhook,
             depends_on=depends,
             provider=k8s_provider,
-            transformations=[add_namespace],
+            transformations=[add_namespace, priority_class_transformation(priority_class)],
             custom_timeouts=pulumi.CustomTimeouts(
                 create="8m",
                 update="8m",
@@ -100,21 +102,12 @@ def deploy(
         )
     )
 
-    # Ensure the CRDs are created before the HostPathProvisioner resource
-    # TODO: solve for the case where child resources are created before parent exists
-    crd = k8s.apiextensions.v1.CustomResourceDefinition.get(
-        "hostpathprovisioners",
-        id="hostpathprovisioners.hostpathprovisioner.kubevirt.io",
-        opts=ResourceOptions(
-            parent=operator,
-            depends_on=depends,
-            provider=k8s_provider,
-            custom_timeouts=pulumi.CustomTimeouts(
-                create="9m",
-                update="9m",
-                delete="2m"
-            )
-        )
+    # Wait for the HostPathProvisioner CRD to be served before creating the resource
+    crd_barrier = create_crd_barrier(
+        "hostpath-provisioner-crds",
+        ["hostpathprovisioners.hostpathprovisioner.kubevirt.io"],
+        depends_on=[operator],
+        parent=operator
     )
 
     # Create a HostPathProvisioner resource
@@ -140,7 +133,7 @@ def deploy(
         },
         opts=pulumi.ResourceOptions(
             parent=operator,
-            depends_on=crd,
+            depends_on=[crd_barrier],
             provider=k8s_provider,
             ignore_changes=["status"],
             custom_timeouts=pulumi.CustomTimeouts(
@@ -0,0 +1,250 @@
+import json
+import pulumi
+import pulumi_kubernetes as k8s
+from src.lib.namespace import create_namespace
+from src.lib.helm_release import get_release_name
+from src.lib.benchmark import RESULT_MARKER, run_benchmark_job
+from src.ingress_nginx.deploy import CHART_NAME as INGRESS_NGINX_CHART_NAME
+
+DEFAULT_IMAGE = "docker.io/grafana/k6:0.54.0"
+DEFAULT_RATE = 20
+DEFAULT_DURATION = "1m"
+DEFAULT_VUS = 50
+
+# Request paths of the OpenUnison apps, other apps are requested at /
+APP_PATHS = {
+    "api_server": "/api",
+}
+
+SCENARIOS = ("unauthenticated", "authenticated")
+
+SUMMARY_THRESHOLDS = {
+    "http_req_duration": "max>=0",
+    "http_reqs": "count>=0",
+    "http_req_failed": "rate>=0",
+}
+
+def get_ingress_service(ingress_release) -> pulumi.Output[str]:
+    """Returns the cluster DNS name of the ingress-nginx controller service of a release."""
+    def service(release_name):
+        # The chart fullname is the release name when it contains the chart name
+        fullname = release_name if INGRESS_NGINX_CHART_NAME in release_name else f"{release_name}-{INGRESS_NGINX_CHART_NAME}"
+        return f"{fullname}-controller.ingress-nginx.svc"
+    return get_release_name(ingress_release).apply(service)
+
+def gen_k6_script(targets: dict, rate: int, duration: str, vus: int, authenticated: bool) -> str:
+    """
+    Generates the k6 script, printing one result per scenario.
+
+    Requests go to the ingress controller service with the Host header of each
+    OpenUnison host, so the hosts need no DNS records inside the cluster.
+    Unauthenticated requests expect the login redirects of OpenUnison, while
+    authenticated requests carry the configured bearer token or session cookie and
+    expect success responses.
+
+    Args:
+        targets (dict): The URL paths to request, keyed by host.
+        rate (int): The request rate of each scenario, per second.
+        duration (str): The duration of each scenario, such as "1m".
+        vus (int): The virtual users preallocated for each scenario.
+        authenticated (bool): Whether to run the authenticated scenario.
+
+    Returns:
+        str: The k6 script.
+    """
+    scenarios = [scenario for scenario in SCENARIOS if authenticated or scenario == "unauthenticated"]
+    options = {
+        "insecureSkipTLSVerify": True,
+        "summaryTrendStats": ["med", "p(95)", "p(99)", "max"],
+        "scenarios": {
+            scenario: {
+                "executor": "constant-arrival-rate",
+                "exec": scenario,
+                "rate": int(rate),
+                "timeUnit": "1s",
+                "duration": duration,
+                "preAllocatedVUs": int(vus),
+            } for scenario in scenarios
+        },
+        # Thresholds that always pass, so the summary holds the metrics of each scenario
+        "thresholds": {
+            f"{metric}{{scenario:{scenario}}}": [threshold]
+            for scenario in scenarios for metric, threshold in SUMMARY_THRESHOLDS.items()
+        },
+    }
+
+    return f"""import http from 'k6/http';
+
+export const options = {json.dumps(options, indent=2)};
+
+const INGRESS = `https://${{__ENV.INGRESS_SERVICE}}`;
+const TARGETS = Object.entries({json.dumps(targets)});
+const AUTH_HEADERS = {{}};
+if (__ENV.TOKEN) AUTH_HEADERS['Authorization'] = `Bearer ${{__ENV.TOKEN}}`;
+if (__ENV.COOKIE) AUTH_HEADERS['Cookie'] = __ENV.COOKIE;
+
+function request(headers, expected) {{
+  const [host, path] = TARGETS[Math.floor(Math.random() * TARGETS.length)];
+  http.get(`${{INGRESS}}${{path}}`, {{
+    headers: Object.assign({{ Host: host }}, headers),
+    redirects: 0,
+    responseCallback: expected,
+    tags: {{ name: host }},
+  }});
+}}
+
+export function unauthenticated() {{
+  request({{}}, http.expectedStatuses({{ min: 200, max: 399 }}));
+}}
+
+export function authenticated() {{
+  request(AUTH_HEADERS, http.expectedStatuses({{ min: 200, max: 299 }}));
+}}
+
+export function handleSummary(data) {{
+  const lines = Object.keys(options.scenarios).map((scenario) => {{
+    const metric = (name) => (data.metrics[`${{name}}{{scenario:${{scenario}}}}`] || {{ values: {{}} }}).values;
+    const duration = metric('http_req_duration');
+    const result = {{
+      requests: metric('http_reqs').count || 0,
+      throughput_rps: metric('http_reqs').rate || 0,
+      error_rate: metric('http_req_failed').rate || 0,
+      latency_ms: {{ p50: duration.med, p95: duration['p(95)'], p99: duration['p(99)'], max: duration.max }},
+    }};
+    return `{RESULT_MARKER} ${{scenario}} ${{JSON.stringify(result)}}`;
+  }});
+  return {{ stdout: lines.join('\\n') + '\\n' }};
+}}
+"""
+
+def summarize(result: dict) -> str:
+    """Formats the result of a scenario as a compact stack output."""
+    if not result:
+        return "no result"
+    return f"{result['throughput_rps']:.1f} req/s, {result['error_rate']:.2%} errors, p99 {result['latency_ms']['p99']:.1f} ms"
+
+def deploy_ingress_benchmark(
+        depends: pulumi.Input[list],
+        run_id: str,
+        hosts: dict,
+        ingress_release,
+        rate: int,
+        duration: str,
+        vus: int,
+        token: pulumi.Input[str],
+        cookie: pulumi.Input[str],
+        image: str,
+        k8s_provider: k8s.Provider
+    ):
+    """
+    Runs a k6 load test against the OpenUnison hosts through ingress-nginx.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on, including OpenUnison.
+        run_id (str): The benchmark run id, changing it runs the load test again.
+        hosts (dict): The hosts to request, keyed by app, see src/openunison/deploy.get_openunison_hosts.
+        ingress_release: The ingress-nginx release.
+        rate (int): The request rate of each scenario per second, or None for DEFAULT_RATE.
+        duration (str): The duration of each scenario, or None for DEFAULT_DURATION.
+        vus (int): The virtual users preallocated for each scenario, or None for DEFAULT_VUS.
+        token (pulumi.Input[str]): The bearer token of the authenticated scenario, or None.
+        cookie (pulumi.Input[str]): The OpenUnison session cookie of the authenticated scenario, or None.
+        image (str): The k6 image, or None for DEFAULT_IMAGE.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+
+    Returns:
+        tuple: The results ConfigMap, and a compact summary per scenario.
+    """
+    ns_name = "ingress-benchmark"
+    authenticated = bool(token or cookie)
+    if not authenticated:
+        pulumi.log.info("ingress_benchmark: no token or cookie configured, only running the unauthenticated scenario")
+
+    namespace = create_namespace(
+        None,
+        ns_name,
+        False,
+        False,
+        k8s_provider,
+        custom_labels={},
+        custom_annotations={}
+    )
+    opts = pulumi.ResourceOptions(
+        provider=k8s_provider,
+        parent=namespace,
+        depends_on=depends + [namespace],
+    )
+
+    targets = {host: APP_PATHS.get(app, "/") for app, host in hosts.items()}
+    script = k8s.core.v1.ConfigMap(
+        "ingress-benchmark-script",
+        metadata=k8s.meta.v1.ObjectMetaArgs(name="ingress-benchmark-script", namespace=ns_name),
+        data={"load.js": gen_k6_script(
+            targets,
+            rate or DEFAULT_RATE,
+            duration or DEFAULT_DURATION,
+            vus or DEFAULT_VUS,
+            authenticated
+        )},
+        opts=opts
+    )
+
+    auth = k8s.core.v1.Secret(
+        "ingress-benchmark-auth",
+        metadata=k8s.meta.v1.ObjectMetaArgs(name="ingress-benchmark-auth", namespace=ns_name),
+        string_data={"token": token or "", "cookie": cookie or ""},
+        opts=opts
+    )
+
+    def secret_env(name, key):
+        return k8s.core.v1.EnvVarArgs(
+            name=name,
+            value_from=k8s.core.v1.EnvVarSourceArgs(
+                secret_key_ref=k8s.core.v1.SecretKeySelectorArgs(name="ingress-benchmark-auth", key=key),
+            ),
+        )
+
+    _, benchmark_results = run_benchmark_job(
+        "ingress-benchmark",
+        ns_name,
+        run_id,
+        k8s.core.v1.PodSpecArgs(
+            restart_policy="Never",
+            containers=[k8s.core.v1.ContainerArgs(
+                name="k6",
+                image=image or DEFAULT_IMAGE,
+                args=["run", "--quiet", "/scripts/load.js"],
+                env=[
+                    k8s.core.v1.EnvVarArgs(name="INGRESS_SERVICE", value=get_ingress_service(ingress_release)),
+                    secret_env("TOKEN", "token"),
+                    secret_env("COOKIE", "cookie"),
+                ],
+                resources=k8s.core.v1.ResourceRequirementsArgs(requests={"cpu": "1", "memory": "256Mi"}),
+                volume_mounts=[k8s.core.v1.VolumeMountArgs(name="scripts", mount_path="/scripts")],
+            )],
+            volumes=[k8s.core.v1.VolumeArgs(
+                name="scripts",
+                config_map=k8s.core.v1.ConfigMapVolumeSourceArgs(name="ingress-benchmark-script"),
+            )],
+        ),
+        k8s_provider,
+        depends_on=[script, auth],
+        parent=namespace,
+    )
+
+    config_map = k8s.core.v1.ConfigMap(
+        "ingress-benchmark-results",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="ingress-benchmark-results",
+            namespace=ns_name,
+            labels={"ccio.v1/benchmark-run": str(run_id)},
+        ),
+        data={"results.json": benchmark_results.results.apply(lambda r: json.dumps(r, indent=2, sort_keys=True))},
+        opts=pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(depends_on=[benchmark_results]))
+    )
+
+    summary = {
+        scenario: benchmark_results.results.apply(lambda r, scenario=scenario: summarize((r or {}).get(scenario)))
+        for scenario in SCENARIOS if authenticated or scenario == "unauthenticated"
+    }
+    return config_map, summary
@@ -8,11 +8,20 @@ from pulumi_kubernetes.meta.v1 import ObjectMetaArgs
 from pulumi_kubernetes.storage.v1 import StorageClass
 from src.lib.namespace import create_namespace
 from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+from src.lib.sizing import ComponentSizing, get_sizing, resources
+
+CHART_NAME = "ingress-nginx"
+CHART_REPOSITORY = "https://kubernetes.github.io/ingress-nginx"
 
 def deploy_ingress_nginx(
         version: str,
         ns_name: str,
         k8s_provider: k8s.Provider,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None,
+        sizing: ComponentSizing = None
     ):
 
     # Create namespace
@@ -34,6 +43,49 @@ def deploy_ingress_nginx(
         custom_annotations=ns_annotations
     )
 
+    helm_values = gen_helm_values(sizing)
+
+    chart_name = CHART_NAME
+    chart_index_path = "index.yaml"
+    chart_url = CHART_REPOSITORY
+    chart_index_url = f"{chart_url}/{chart_index_path}"
+
+    # Fetch the latest version from the helm chart index
+    if version is None:
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_index_url, chart_name))
+        version = version.lstrip("v")
+        pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
+    else:
+        # Log the version override
+        pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
+
+    # Deploy the nginx chart
+    release = create_helm_release(
+        chart_name,
+        chart=chart_name,
+        version=version,
+        namespace=ns_name,
+        skip_await=False,
+        repository=chart_url,
+        values=helm_values,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
+        opts=pulumi.ResourceOptions(
+            provider = k8s_provider,
+            parent=namespace,
+            depends_on=[namespace],
+            custom_timeouts=pulumi.CustomTimeouts(
+                create="8m",
+                update="4m",
+                delete="4m"
+            )
+        )
+    )
+
+    return release, version
+
+def gen_helm_values(sizing: ComponentSizing = None):
+    sizing = sizing or get_sizing("ingress_nginx", {})
     helm_values = {
 
     }
@@ -62,43 +114,12 @@ def deploy_ingress_nginx(
             }
         }
 
-    chart_name = "ingress-nginx"
-    chart_index_path = "index.yaml"
-    chart_url = "https://kubernetes.github.io/ingress-nginx"
-    chart_index_url = f"{chart_url}/{chart_index_path}"
-
-    # Fetch the latest version from the helm chart index
-    if version is None:
-        version = get_latest_helm_chart_version(chart_index_url, chart_name)
-        version = version.lstrip("v")
-        pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
-    else:
-        # Log the version override
-        pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
+    # The chart creates a PodDisruptionBudget by itself when running more than one replica
+    controller = helm_values.setdefault("controller", {})
+    controller["replicaCount"] = sizing["replicas"]
+    controller["resources"] = resources(sizing)
+    controller["minAvailable"] = 1
+    if sizing["priority_class"]:
+        controller["priorityClassName"] = sizing["priority_class"]
 
-    # Deploy the nginx chart
-    release = k8s.helm.v3.Release(
-        chart_name,
-        k8s.helm.v3.ReleaseArgs(
-            chart=chart_name,
-            version=version,
-            namespace=ns_name,
-            skip_await=False,
-            repository_opts= k8s.helm.v3.RepositoryOptsArgs(
-                repo=chart_url
-            ),
-            values=helm_values,
-        ),
-        opts=pulumi.ResourceOptions(
-            provider = k8s_provider,
-            parent=namespace,
-            depends_on=[namespace],
-            custom_timeouts=pulumi.CustomTimeouts(
-                create="8m",
-                update="4m",
-                delete="4m"
-            )
-        )
-    )
-
-    return release, version
+    return helm_values
@@ -2,8 +2,14 @@ import pulumi
 import pulumi_kubernetes as k8s
 from src.lib.namespace import create_namespace
 from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+from src.lib.sizing import ComponentSizing, get_sizing, resources
 import json
 
+CHART_NAME = "kubernetes-dashboard"
+CHART_REPOSITORY = "https://kubernetes.github.io/dashboard"
+
 def sanitize_name(name: str) -> str:
     """Ensure the name complies with DNS-1035 and RFC 1123."""
     name = name.strip('-')
@@ -16,7 +22,10 @@ def deploy_kubernetes_dashboard(
         ns_name: str,
         version: str,
         k8s_provider: k8s.Provider,
-        openunison_enabled: bool
+        openunison_enabled: bool,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None,
+        sizing: ComponentSizing = None
     ):
 
     # Create namespace
@@ -37,34 +46,32 @@ def deploy_kubernetes_dashboard(
     )
 
     # Fetch the latest version from the helm chart index
-    chart_name = "kubernetes-dashboard"
+    chart_name = CHART_NAME
     chart_index_path = "index.yaml"
-    chart_url = "https://kubernetes.github.io/dashboard"
+    chart_url = CHART_REPOSITORY
     chart_index_url = f"{chart_url}/{chart_index_path}"
 
     # Fetch the latest version from the helm chart index if version is not set
     if version is None:
-        version = get_latest_helm_chart_version(chart_index_url, chart_name)
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_index_url, chart_name))
         pulumi.log.info(f"Setting helm release version to latest stable: {chart_name}/{version}")
     else:
         # Log the version override
         pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
 
 
-    helm_values = gen_helm_values(openunison_enabled)
+    helm_values = gen_helm_values(openunison_enabled, sizing)
 
-    release = k8s.helm.v3.Release(
+    release = create_helm_release(
             "kubernetes-dashboard",
-            k8s.helm.v3.ReleaseArgs(
-                chart=chart_name,
-                version=version,
-                namespace=ns_name,
-                skip_await=False,
-                repository_opts= k8s.helm.v3.RepositoryOptsArgs(
-                    repo=chart_url
-                ),
-                values=helm_values
-            ),
+            chart=chart_name,
+            version=version,
+            namespace=ns_name,
+            skip_await=False,
+            repository=chart_url,
+            values=helm_values,
+            engine=helm_engine,
+            timeouts=helm_timeouts,
             opts=pulumi.ResourceOptions(
                 provider = k8s_provider,
                 parent=namespace,
@@ -80,9 +87,10 @@ def deploy_kubernetes_dashboard(
 
     return version, release
 
-def gen_helm_values(openunison_enabled: bool):
+def gen_helm_values(openunison_enabled: bool, sizing: ComponentSizing = None):
+    sizing = sizing or get_sizing("kubernetes_dashboard", {})
     if openunison_enabled:
-        return {
+        helm_values = {
             "nginx": {
                 "enabled": False
             },
@@ -196,4 +204,13 @@ def gen_helm_values(openunison_enabled: bool):
             }
             }
     else:
-        return {}
+        helm_values = {}
+
+    # Size the api and web deployments, auth is only used without OpenUnison
+    for component in ("api", "web"):
+        component_values = helm_values.setdefault(component, {})
+        component_values.setdefault("scaling", {})["replicas"] = sizing["replicas"]
+        component_values.setdefault("containers", {})["resources"] = resources(sizing)
+    if sizing["priority_class"]:
+        helm_values.setdefault("app", {})["priorityClassName"] = sizing["priority_class"]
+    return helm_values
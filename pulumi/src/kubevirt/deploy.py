@@ -7,6 +7,9 @@ import pulumi_kubernetes as k8s
 from pulumi_kubernetes.apiextensions.CustomResource import CustomResource
 from pulumi_kubernetes.meta.v1 import ObjectMetaArgs
 from src.lib.namespace import create_namespace
+from src.lib.crd_barrier import create_crd_barrier
+from src.lib.version_lock import resolve_latest_version
+from src.lib.instrumentation import record_upstream_bytes
 
 def deploy_kubevirt(
         depends,
@@ -40,8 +43,7 @@ def deploy_kubevirt(
     # Fetch the latest stable version of KubeVirt
     if version is None:
         kubevirt_stable_version_url = 'https://storage.googleapis.com/kubevirt-prow/release/kubevirt/kubevirt/stable.txt'
-        version = requests.get(kubevirt_stable_version_url).text.strip()
-        version = version.lstrip("v")
+        version = resolve_latest_version("kubevirt", lambda: requests.get(kubevirt_stable_version_url).text.strip().lstrip("v"))
         pulumi.log.info(f"Setting version to latest stable: kubevirt/{version}")
     else:
         # Log the version override
@@ -50,6 +52,7 @@ def deploy_kubevirt(
     # Download the KubeVirt operator YAML
     kubevirt_operator_url = f'https://github.com/kubevirt/kubevirt/releases/download/v{version}/kubevirt-operator.yaml'
     response = requests.get(kubevirt_operator_url)
+    record_upstream_bytes(kubevirt_operator_url, len(response.content))
     kubevirt_yaml = yaml.safe_load_all(response.text)
 
     # Edit the YAML in memory to remove the Namespace and adjust other resources
@@ -120,6 +123,14 @@ def deploy_kubevirt(
         }
     }
 
+    # Wait for the KubeVirt CRD to be served before creating the resource
+    crd_barrier = create_crd_barrier(
+        "kubevirt-crds",
+        ["kubevirts.kubevirt.io"],
+        depends_on=depends + [operator],
+        parent=operator
+    )
+
     # Create the KubeVirt custom resource
     kubevirt = CustomResource(
         "kubevirt",
@@ -133,7 +144,7 @@ def deploy_kubevirt(
         opts=pulumi.ResourceOptions(
             provider=k8s_provider,
             parent=operator,
-            depends_on=depends
+            depends_on=[crd_barrier]
         )
     )
 
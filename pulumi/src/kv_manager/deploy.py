@@ -6,14 +6,21 @@ from kubernetes import config, dynamic
 from kubernetes import client as k8s_client
 from kubernetes.dynamic.exceptions import ResourceNotFoundError
 from kubernetes.client import api_client
+from src.lib.priority import priority_class_transformation
 
 
 
-def deploy_ui_for_kubevirt(name: str, k8s_provider: Provider):
+def deploy_ui_for_kubevirt(name: str, k8s_provider: Provider, priority_class: str = None):
     # Initialize Pulumi configuration
     pconfig = pulumi.Config()
 
     # There's no helm chart for kubevirt-manager so <christopher walken shrug>
     kubevirt_manager_manifest_url = 'https://raw.githubusercontent.com/kubevirt-manager/kubevirt-manager/main/kubernetes/bundled.yaml'
-    k8s_yaml = k8s.yaml.ConfigFile("kubevirt-manager", file=kubevirt_manager_manifest_url)
+    k8s_yaml = k8s.yaml.ConfigFile(
+        "kubevirt-manager",
+        file=kubevirt_manager_manifest_url,
+        opts=pulumi.ResourceOptions(
+            transformations=[priority_class_transformation(priority_class)]
+        )
+    )
     return "1.4.1", k8s_yaml
@@ -0,0 +1,348 @@
+import json
+import time
+from typing import List, Optional
+import pulumi
+import pulumi_kubernetes as k8s
+from pulumi.dynamic import CreateResult, DiffResult, ResourceProvider
+from src.lib.crd_barrier import api_client, kubernetes_access
+
+# Benchmark containers print one result per line as "<marker> <key> <compact json>"
+RESULT_MARKER = "KARGO_BENCHMARK_RESULT"
+
+# Default time to wait for a benchmark Job to complete, in seconds
+DEFAULT_BENCHMARK_TIMEOUT = 1800
+
+# Interval between Job status polls, in seconds
+POLL_INTERVAL = 5
+
+# Time a benchmark pod may stay unschedulable before the Job is failed, in seconds
+UNSCHEDULABLE_TIMEOUT = 120
+
+def parse_results(logs: str) -> dict:
+    """
+    Parses the benchmark results printed by a benchmark container.
+
+    Args:
+        logs (str): The container logs.
+
+    Returns:
+        dict: The results, keyed by result key. Later results replace earlier ones.
+    """
+    results = {}
+    for line in (logs or "").splitlines():
+        parts = line.strip().split(" ", 2)
+        if len(parts) == 3 and parts[0] == RESULT_MARKER:
+            results[parts[1]] = json.loads(parts[2])
+    return results
+
+def collect_job_results(
+        name: str,
+        namespace: str,
+        kubeconfig: Optional[str],
+        context: Optional[str],
+        timeout_seconds: int
+    ) -> dict:
+    """
+    Waits for a benchmark Job to complete and collects the results from its pod logs.
+
+    Args:
+        name (str): The Job name.
+        namespace (str): The Job namespace.
+        kubeconfig (str): The kubeconfig path or content, or None for the default kubeconfig.
+        context (str): The kubeconfig context, or None for the current context.
+        timeout_seconds (int): The time to wait before failing.
+
+    Returns:
+        dict: The results of all Job pods, see parse_results.
+
+    Raises:
+        RuntimeError: If the Job fails or its pod stays unschedulable, e.g. an anti-affinity
+            rule on a single-node cluster.
+        TimeoutError: If the Job does not complete within the timeout.
+    """
+    from kubernetes import client
+
+    api = api_client(kubeconfig, context)
+    batch_api = client.BatchV1Api(api)
+    core_api = client.CoreV1Api(api)
+
+    def pod_logs() -> str:
+        pods = core_api.list_namespaced_pod(namespace, label_selector=f"job-name={name}")
+        return "\n".join(core_api.read_namespaced_pod_log(pod.metadata.name, namespace) for pod in pods.items)
+
+    def unschedulable() -> Optional[str]:
+        pods = core_api.list_namespaced_pod(namespace, label_selector=f"job-name={name}")
+        for pod in pods.items:
+            for condition in (pod.status and pod.status.conditions) or []:
+                if condition.type == "PodScheduled" and condition.status == "False" and condition.reason == "Unschedulable":
+                    return condition.message
+        return None
+
+    deadline = time.monotonic() + timeout_seconds
+    unschedulable_since = None
+    while time.monotonic() < deadline:
+        status = batch_api.read_namespaced_job_status(name, namespace).status
+        if status.succeeded:
+            return parse_results(pod_logs())
+        if status.failed:
+            tail = "\n".join(pod_logs().splitlines()[-20:])
+            raise RuntimeError(f"Benchmark Job {namespace}/{name} failed:\n{tail}")
+        # Gives autoscalers and evictions a chance before failing on an unschedulable pod
+        message = unschedulable()
+        if message is None:
+            unschedulable_since = None
+        elif unschedulable_since is None:
+            unschedulable_since = time.monotonic()
+        elif time.monotonic() - unschedulable_since > UNSCHEDULABLE_TIMEOUT:
+            raise RuntimeError(
+                f"Benchmark Job {namespace}/{name} pod could not be scheduled for {UNSCHEDULABLE_TIMEOUT}s: {message}"
+            )
+        time.sleep(POLL_INTERVAL)
+
+    raise TimeoutError(f"Benchmark Job {namespace}/{name} did not complete after {timeout_seconds}s")
+
+def collect_pod_results(
+        namespace: str,
+        selector: str,
+        container: str,
+        keys: List[str],
+        kubeconfig: Optional[str],
+        context: Optional[str],
+        timeout_seconds: int
+    ) -> dict:
+    """
+    Waits for long-running pods to print a set of benchmark results, e.g. VM serial consoles.
+
+    Args:
+        namespace (str): The pod namespace.
+        selector (str): The pod label selector.
+        container (str): The container to read the logs of.
+        keys (List[str]): The result keys to wait for.
+        kubeconfig (str): The kubeconfig path or content, or None for the default kubeconfig.
+        context (str): The kubeconfig context, or None for the current context.
+        timeout_seconds (int): The time to wait before failing.
+
+    Returns:
+        dict: The results of all matching pods, see parse_results.
+
+    Raises:
+        TimeoutError: If a result is missing after the timeout.
+    """
+    from kubernetes import client
+    from kubernetes.client.rest import ApiException
+
+    core_api = client.CoreV1Api(api_client(kubeconfig, context))
+    deadline = time.monotonic() + timeout_seconds
+    results = {}
+    while time.monotonic() < deadline:
+        for pod in core_api.list_namespaced_pod(namespace, label_selector=selector).items:
+            try:
+                results.update(parse_results(core_api.read_namespaced_pod_log(pod.metadata.name, namespace, container=container)))
+            except ApiException as e:
+                # The container is not started yet
+                if e.status != 400:
+                    raise
+        if all(key in results for key in keys):
+            return results
+        time.sleep(POLL_INTERVAL)
+
+    missing = ", ".join(key for key in keys if key not in results)
+    raise TimeoutError(f"Benchmark results missing from {namespace}/{selector} after {timeout_seconds}s: {missing}")
+
+class BenchmarkResultsProvider(ResourceProvider):
+    """Dynamic provider collecting the results of a benchmark Job or of long-running pods."""
+
+    def create(self, props):
+        if props.get("job"):
+            results = collect_job_results(
+                props["job"],
+                props["namespace"],
+                props.get("kubeconfig"),
+                props.get("context"),
+                int(props["timeout_seconds"])
+            )
+            id_ = f"{props['namespace']}/{props['job']}"
+        else:
+            results = collect_pod_results(
+                props["namespace"],
+                props["selector"],
+                props["container"],
+                props["keys"],
+                props.get("kubeconfig"),
+                props.get("context"),
+                int(props["timeout_seconds"])
+            )
+            id_ = f"{props['namespace']}/{props['selector']}/{props['run_id']}"
+        return CreateResult(id_=id_, outs={**props, "results": results})
+
+    def diff(self, _id, olds, news):
+        # A new Job or run is a new benchmark run, so its results replace the previous ones
+        replaces = [key for key in ("job", "namespace", "selector", "container", "run_id") if olds.get(key) != news.get(key)]
+        return DiffResult(changes=bool(replaces), replaces=replaces, delete_before_replace=False)
+
+class BenchmarkResults(pulumi.dynamic.Resource):
+    """
+    Resource holding the results of a completed benchmark Job.
+
+    The results are read from the Job pod logs once, when the Job is created, and
+    stay in the stack state until the next run replaces the Job. Without a Job, the
+    results are read from the selected pods of the run instead.
+    """
+    results: pulumi.Output[dict]
+
+    def __init__(
+            self,
+            name: str,
+            job: pulumi.Input[str],
+            namespace: str,
+            kubeconfig: pulumi.Input[str] = None,
+            context: pulumi.Input[str] = None,
+            timeout_seconds: int = DEFAULT_BENCHMARK_TIMEOUT,
+            selector: str = None,
+            container: str = None,
+            keys: List[str] = None,
+            run_id: str = None,
+            opts: pulumi.ResourceOptions = None
+        ):
+        super().__init__(
+            BenchmarkResultsProvider(),
+            name,
+            {
+                "job": job,
+                "namespace": namespace,
+                "selector": selector,
+                "container": container,
+                "keys": keys,
+                "run_id": run_id,
+                "kubeconfig": kubeconfig,
+                "context": context,
+                "timeout_seconds": timeout_seconds,
+                "results": None,
+            },
+            opts
+        )
+
+def run_benchmark_job(
+        name: str,
+        namespace: str,
+        run_id: str,
+        pod_spec: k8s.core.v1.PodSpecArgs,
+        k8s_provider: k8s.Provider,
+        depends_on: pulumi.Input[list] = None,
+        parent: pulumi.Resource = None,
+        timeout_seconds: int = DEFAULT_BENCHMARK_TIMEOUT,
+        pod_annotations: dict = None
+    ):
+    """
+    Runs a benchmark Job and collects its results.
+
+    The Job runs its pod once, with no retries. Changing the run id replaces the Job,
+    which runs the benchmark again. Benchmarks that must not overlap should depend on
+    the results of the previous benchmark.
+
+    Args:
+        name (str): The benchmark name, used for the Job and results resource names.
+        namespace (str): The Job namespace.
+        run_id (str): The benchmark run id.
+        pod_spec (k8s.core.v1.PodSpecArgs): The benchmark pod spec, printing results as described by parse_results.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+        depends_on (pulumi.Input[list]): The resources to depend on.
+        parent (pulumi.Resource): The parent resource.
+        timeout_seconds (int): The time to wait for the Job before failing.
+        pod_annotations (dict): Extra pod annotations, e.g. Multus network attachments.
+
+    Returns:
+        tuple: The Job and its BenchmarkResults.
+    """
+    labels = {
+        "ccio.v1/app": "kargo",
+        "ccio.v1/benchmark": name,
+    }
+
+    # The Job is auto-named, so a new run is created before the previous one is deleted
+    job = k8s.batch.v1.Job(
+        name,
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            namespace=namespace,
+            labels=labels,
+            annotations={"pulumi.com/skipAwait": "true"},
+        ),
+        spec=k8s.batch.v1.JobSpecArgs(
+            backoff_limit=0,
+            template=k8s.core.v1.PodTemplateSpecArgs(
+                metadata=k8s.meta.v1.ObjectMetaArgs(
+                    labels=labels,
+                    annotations={**(pod_annotations or {}), "ccio.v1/benchmark-run": str(run_id)},
+                ),
+                spec=pod_spec,
+            ),
+        ),
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            parent=parent,
+            depends_on=depends_on,
+        )
+    )
+
+    kubeconfig, context = kubernetes_access()
+    results = BenchmarkResults(
+        f"{name}-results",
+        job.metadata.name,
+        namespace,
+        kubeconfig=kubeconfig,
+        context=context,
+        timeout_seconds=timeout_seconds,
+        opts=pulumi.ResourceOptions(
+            parent=job,
+            depends_on=[job],
+        )
+    )
+
+    return job, results
+
+def collect_vm_results(
+        name: str,
+        namespace: str,
+        vmi_name: str,
+        run_id: str,
+        keys: List[str],
+        depends_on: pulumi.Input[list] = None,
+        parent: pulumi.Resource = None,
+        timeout_seconds: int = DEFAULT_BENCHMARK_TIMEOUT
+    ) -> BenchmarkResults:
+    """
+    Collects the benchmark results a VirtualMachineInstance prints to its serial console.
+
+    The guest writes result lines to /dev/ttyS0, which KubeVirt logs from the
+    guest-console-log container of the virt-launcher pod.
+
+    Args:
+        name (str): The results resource name.
+        namespace (str): The VMI namespace.
+        vmi_name (str): The VMI name.
+        run_id (str): The benchmark run id, the VMI must be recreated for each run.
+        keys (List[str]): The result keys to wait for.
+        depends_on (pulumi.Input[list]): The resources to depend on, including the VMI.
+        parent (pulumi.Resource): The parent resource.
+        timeout_seconds (int): The time to wait for the results before failing.
+
+    Returns:
+        BenchmarkResults: The collected results.
+    """
+    kubeconfig, context = kubernetes_access()
+    return BenchmarkResults(
+        name,
+        None,
+        namespace,
+        kubeconfig=kubeconfig,
+        context=context,
+        timeout_seconds=timeout_seconds,
+        selector=f"vm.kubevirt.io/name={vmi_name}",
+        container="guest-console-log",
+        keys=keys,
+        run_id=str(run_id),
+        opts=pulumi.ResourceOptions(
+            parent=parent,
+            depends_on=depends_on,
+        )
+    )
@@ -0,0 +1,221 @@
+import os
+import threading
+from typing import List, Optional
+import pulumi
+from pulumi.dynamic import CreateResult, DiffResult, ResourceProvider, UpdateResult
+
+# Default time to wait for CRDs to become Established, in seconds
+DEFAULT_CRD_TIMEOUT = 600
+
+def api_client(kubeconfig: Optional[str], context: Optional[str]):
+    """Returns a Kubernetes API client for a kubeconfig path or content, see kubernetes_access."""
+    import yaml
+    from kubernetes import config
+
+    if kubeconfig and os.path.isfile(kubeconfig):
+        return config.new_client_from_config(config_file=kubeconfig, context=context)
+    if kubeconfig:
+        return config.new_client_from_config_dict(yaml.safe_load(kubeconfig), context=context)
+    return config.new_client_from_config(context=context)
+
+def _is_established(crd) -> bool:
+    conditions = (crd.status.conditions if crd.status else None) or []
+    return any(c.type == "Established" and c.status == "True" for c in conditions)
+
+# Watch requests are renewed after this many seconds, resuming from the last seen version
+WATCH_RENEW_SECONDS = 300
+
+class _CrdWatcher:
+    """
+    Established CRDs of a cluster, kept current by one list and watch per process.
+
+    The barriers of a run are created by the same dynamic provider process, so they
+    share a watcher instead of each listing and watching the CRDs on their own.
+    """
+
+    def __init__(self, kubeconfig: Optional[str], context: Optional[str]):
+        self.kubeconfig = kubeconfig
+        self.context = context
+        self.established = set()
+        self.error = None
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        from kubernetes import client, watch
+        from kubernetes.client.rest import ApiException
+
+        try:
+            api = client.ApiextensionsV1Api(api_client(self.kubeconfig, self.context))
+            resource_version = None
+            while True:
+                if resource_version is None:
+                    listing = api.list_custom_resource_definition()
+                    with self.condition:
+                        self.established = {crd.metadata.name for crd in listing.items if _is_established(crd)}
+                        self.condition.notify_all()
+                    resource_version = listing.metadata.resource_version
+
+                # The API server may close the watch early, resume from the last seen version
+                try:
+                    for event in watch.Watch().stream(
+                            api.list_custom_resource_definition,
+                            resource_version=resource_version,
+                            timeout_seconds=WATCH_RENEW_SECONDS):
+                        crd = event["object"]
+                        resource_version = crd.metadata.resource_version
+                        with self.condition:
+                            if event["type"] != "DELETED" and _is_established(crd):
+                                self.established.add(crd.metadata.name)
+                            else:
+                                self.established.discard(crd.metadata.name)
+                            self.condition.notify_all()
+                except ApiException as e:
+                    if e.status != 410:
+                        raise
+                    # The resource version expired, list again
+                    resource_version = None
+        except Exception as e:
+            with self.condition:
+                self.error = e
+                self.condition.notify_all()
+
+    def wait(self, crds: List[str], timeout_seconds: int) -> set:
+        """Waits for CRDs to become Established, returning the pending CRDs on timeout."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.error or set(crds) <= self.established, timeout_seconds)
+            if self.error:
+                raise self.error
+            return set(crds) - self.established
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+def _get_watcher(kubeconfig: Optional[str], context: Optional[str]) -> _CrdWatcher:
+    with _watchers_lock:
+        watcher = _watchers.get((kubeconfig, context))
+        if watcher is None or not watcher.thread.is_alive():
+            # A failed watcher is replaced, so the next barrier of the run retries
+            watcher = _watchers[(kubeconfig, context)] = _CrdWatcher(kubeconfig, context)
+        return watcher
+
+def wait_for_crds(crds: List[str], kubeconfig: Optional[str], context: Optional[str], timeout_seconds: int) -> List[str]:
+    """
+    Waits for CustomResourceDefinitions to become Established, using the shared watch.
+
+    The CRDs are listed once per run, and the watch continues from the resource
+    version of that list, so CRDs are seen the moment the API server starts serving
+    them. Every barrier of the run waits on the same watch.
+
+    Args:
+        crds (List[str]): The CRD names, e.g. "kubevirts.kubevirt.io".
+        kubeconfig (str): The kubeconfig path or content, or None for the default kubeconfig.
+        context (str): The kubeconfig context, or None for the current context.
+        timeout_seconds (int): The time to wait before failing.
+
+    Returns:
+        List[str]: The established CRD names.
+
+    Raises:
+        TimeoutError: If any CRD is not Established within the timeout.
+    """
+    pending = _get_watcher(kubeconfig, context).wait(crds, timeout_seconds)
+    if pending:
+        raise TimeoutError(f"CRDs not Established after {timeout_seconds}s: {', '.join(sorted(pending))}")
+    return sorted(crds)
+
+class CrdReadinessProvider(ResourceProvider):
+    """Dynamic provider waiting for CRDs to become Established."""
+
+    def create(self, props):
+        established = wait_for_crds(props["crds"], props.get("kubeconfig"), props.get("context"), int(props["timeout_seconds"]))
+        return CreateResult(id_="-".join(established)[:253], outs={**props, "established": established})
+
+    def diff(self, _id, olds, news):
+        changed = sorted(olds.get("crds") or []) != sorted(news.get("crds") or [])
+        return DiffResult(changes=changed, replaces=[], delete_before_replace=False)
+
+    def update(self, _id, olds, news):
+        established = wait_for_crds(news["crds"], news.get("kubeconfig"), news.get("context"), int(news["timeout_seconds"]))
+        return UpdateResult(outs={**news, "established": established})
+
+class CrdReadinessBarrier(pulumi.dynamic.Resource):
+    """
+    Barrier resource that completes once a set of CRDs is Established.
+
+    Custom resources depend on the barrier instead of on blind retries or on
+    `CustomResourceDefinition.get`, so they are applied as soon as their schema is served.
+    """
+    crds: pulumi.Output[list]
+    established: pulumi.Output[list]
+
+    def __init__(
+            self,
+            name: str,
+            crds: List[str],
+            kubeconfig: pulumi.Input[str] = None,
+            context: pulumi.Input[str] = None,
+            timeout_seconds: int = DEFAULT_CRD_TIMEOUT,
+            opts: pulumi.ResourceOptions = None
+        ):
+        super().__init__(
+            CrdReadinessProvider(),
+            name,
+            {
+                "crds": sorted(crds),
+                "kubeconfig": kubeconfig,
+                "context": context,
+                "timeout_seconds": timeout_seconds,
+                "established": None,
+            },
+            opts
+        )
+
+def kubernetes_access():
+    """
+    Returns the kubeconfig and context of the stack Kubernetes provider.
+
+    Dynamic providers talk to the cluster directly, with the same kubeconfig and context
+    as the provider. Kubeconfig paths are made absolute and kubeconfig content is secret.
+    """
+    kubernetes_config = pulumi.Config().get_object("kubernetes") or {}
+    kubeconfig = kubernetes_config.get("kubeconfig") or os.environ.get("KUBECONFIG")
+    if kubeconfig and os.path.isfile(kubeconfig):
+        kubeconfig = os.path.abspath(kubeconfig)
+    elif kubeconfig:
+        kubeconfig = pulumi.Output.secret(kubeconfig)
+    return kubeconfig, kubernetes_config.get("context")
+
+def create_crd_barrier(
+        name: str,
+        crds: List[str],
+        depends_on: pulumi.Input[list] = None,
+        parent: pulumi.Resource = None,
+        timeout_seconds: int = DEFAULT_CRD_TIMEOUT
+    ) -> CrdReadinessBarrier:
+    """
+    Creates a barrier that waits for CRDs to become Established.
+
+    Args:
+        name (str): The barrier resource name.
+        crds (List[str]): The CRD names to wait for.
+        depends_on (pulumi.Input[list]): The resources installing the CRDs, e.g. an operator.
+        parent (pulumi.Resource): The parent resource.
+        timeout_seconds (int): The time to wait before failing.
+
+    Returns:
+        CrdReadinessBarrier: The barrier, for custom resources to depend on.
+    """
+    kubeconfig, context = kubernetes_access()
+    return CrdReadinessBarrier(
+        name,
+        crds,
+        kubeconfig=kubeconfig,
+        context=context,
+        timeout_seconds=timeout_seconds,
+        opts=pulumi.ResourceOptions(
+            parent=parent,
+            depends_on=depends_on,
+        )
+    )
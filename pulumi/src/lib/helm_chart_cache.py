@@ -0,0 +1,63 @@
+import hashlib
+import logging
+import os
+import requests
+from urllib.parse import urljoin
+from packaging.version import parse as parse_version, InvalidVersion
+from src.lib.helm_chart_versions import fetch_helm_chart_index
+from src.lib.instrumentation import record_upstream_bytes
+
+# Downloaded chart archives, relative to the program directory
+CHART_CACHE_DIR = os.path.join(".cache", "helm")
+
+def _same_version(a: str, b: str) -> bool:
+    try:
+        return parse_version(str(a).lstrip("v")) == parse_version(str(b).lstrip("v"))
+    except InvalidVersion:
+        return str(a).lstrip("v") == str(b).lstrip("v")
+
+def get_chart_archive(repository: str, chart: str, version: str) -> str:
+    """
+    Returns the path of a chart archive in the local chart cache, downloading it once.
+
+    The archive URL and digest are taken from the repository index.
+
+    Args:
+        repository (str): The chart repository URL.
+        chart (str): The chart name.
+        version (str): The chart version.
+
+    Returns:
+        str: The path of the cached `.tgz` archive.
+
+    Raises:
+        requests.RequestException: If the index or archive cannot be downloaded.
+        ValueError: If the chart version is not in the repository or its digest does not match.
+    """
+    archive_path = os.path.join(CHART_CACHE_DIR, f"{chart}-{str(version).lstrip('v')}.tgz")
+    if os.path.exists(archive_path):
+        return archive_path
+
+    repository = repository.rstrip("/")
+    index = fetch_helm_chart_index(f"{repository}/index.yaml")
+    entries = (index.get("entries") or {}).get(chart) or []
+    entry = next((e for e in entries if _same_version(e.get("version"), version)), None)
+    if entry is None or not entry.get("urls"):
+        raise ValueError(f"Chart {chart}/{version} not found in repository {repository}")
+
+    url = urljoin(f"{repository}/", entry["urls"][0])
+    logging.info(f"Fetching URL: {url}")
+    response = requests.get(url)
+    response.raise_for_status()
+    record_upstream_bytes(url, len(response.content))
+
+    digest = entry.get("digest")
+    if digest and hashlib.sha256(response.content).hexdigest() != digest:
+        raise ValueError(f"Digest mismatch for chart archive {url}")
+
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    temp_path = f"{archive_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(response.content)
+    os.replace(temp_path, archive_path)
+    return archive_path
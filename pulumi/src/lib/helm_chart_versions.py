@@ -2,6 +2,7 @@ import requests
 import logging
 import yaml
 from packaging.version import parse as parse_version, InvalidVersion, Version
+from src.lib.instrumentation import record_upstream_bytes
 
 # Set up basic logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,6 +16,25 @@ def is_stable_version(version_str):
     except InvalidVersion:
         return False
 
+def fetch_helm_chart_index(url):
+    """
+    Fetches and parses a Helm chart repository index.
+
+    Args:
+        url (str): The URL of the Helm chart repository index.
+
+    Returns:
+        dict: The parsed index.
+
+    Raises:
+        requests.RequestException: If an error occurs during the HTTP request.
+    """
+    logging.info(f"Fetching URL: {url}")
+    response = requests.get(url)
+    response.raise_for_status()
+    record_upstream_bytes(url, len(response.content))
+    return yaml.safe_load(response.content)
+
 def get_latest_helm_chart_version(url, chart_name):
     """
     Fetches the latest stable version of a Helm chart from a given URL.
@@ -31,12 +51,8 @@ def get_latest_helm_chart_version(url, chart_name):
 
     """
     try:
-        logging.info(f"Fetching URL: {url}")
-        response = requests.get(url)
-        response.raise_for_status()
-
         # Parse the YAML content
-        index = yaml.safe_load(response.content)
+        index = fetch_helm_chart_index(url)
         if chart_name in index['entries']:
             chart_versions = index['entries'][chart_name]
             # Filter out non-stable versions and sort
@@ -54,6 +70,24 @@ def get_latest_helm_chart_version(url, chart_name):
         logging.error(f"Error fetching data: {e}")
         return f"Error fetching data: {e}"
 
+def get_latest_github_release_version(url, default=None):
+    """
+    Fetches the latest release version of a GitHub project from its releases/latest redirect.
+
+    Args:
+        url (str): The GitHub `releases/latest` URL of the project.
+        default (str): The version to return if the redirect is missing.
+
+    Returns:
+        str: The latest release version without a leading 'v', or the default.
+    """
+    logging.info(f"Fetching URL: {url}")
+    response = requests.get(url, allow_redirects=False)
+    record_upstream_bytes(url, len(response.content))
+    tag = response.headers.get('location')
+    version = tag.split('/')[-1] if tag else default
+    return version.lstrip('v') if version else version
+
 ## Example usage
 #url = "https://raw.githubusercontent.com/cilium/charts/master/index.yaml"
 #chart = "cilium"
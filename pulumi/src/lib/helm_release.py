@@ -0,0 +1,287 @@
+import json
+import os
+import re
+import subprocess
+import tempfile
+import pulumi
+import pulumi_kubernetes as k8s
+
+# Supported Helm engines:
+# - release: server-side `helm upgrade` via k8s.helm.v3.Release (opaque to the engine)
+# - chart: client-side rendered k8s.helm.v4.Chart (every object is diffed and applied individually)
+HELM_ENGINES = ("release", "chart")
+DEFAULT_HELM_ENGINE = "release"
+
+# Release revisions kept by Helm, each revision is stored as a Secret in the release namespace
+DEFAULT_MAX_HISTORY = 3
+
+# Helm's own default wait timeout, used when a release has no custom timeouts
+DEFAULT_HELM_TIMEOUT = 300
+
+# Time left to Helm for an atomic rollback before the Pulumi operation times out
+ROLLBACK_MARGIN = 60
+
+TIMEOUT_OPERATIONS = ("create", "update", "delete")
+
+# Releases created by create_helm_release, see get_helm_releases
+_releases = []
+
+def get_helm_engine(module_config: dict) -> str:
+    """
+    Returns the Helm engine selected for a module via its `helm_engine` config key.
+
+    Args:
+        module_config (dict): The module configuration object.
+
+    Returns:
+        str: One of HELM_ENGINES.
+
+    Raises:
+        ValueError: If the configured engine is not supported.
+    """
+    engine = str(module_config.get("helm_engine") or DEFAULT_HELM_ENGINE).lower()
+    if engine not in HELM_ENGINES:
+        raise ValueError(f"Unsupported helm_engine '{engine}', expected one of: {', '.join(HELM_ENGINES)}")
+    return engine
+
+def duration_seconds(duration: str) -> int:
+    """
+    Converts a Pulumi custom timeout duration such as "8m" or "1h30m" to seconds.
+
+    Raises:
+        ValueError: If the duration is not valid.
+    """
+    duration = str(duration).strip()
+    parts = re.findall(r"(\d+(?:\.\d+)?)(h|m|s)", duration)
+    if not parts or "".join(value + unit for value, unit in parts) != duration:
+        raise ValueError(f"Invalid timeout duration '{duration}', expected e.g. '30s', '8m' or '1h30m'")
+    return int(sum(float(value) * {"h": 3600, "m": 60, "s": 1}[unit] for value, unit in parts))
+
+def get_helm_timeouts(module_config: dict) -> dict:
+    """
+    Returns the Helm release timeouts configured for a module via its `timeouts` config key.
+
+    Args:
+        module_config (dict): The module configuration object.
+
+    Returns:
+        dict: The create, update and/or delete durations, or None to use the module defaults.
+
+    Raises:
+        ValueError: If an operation or duration is not valid.
+    """
+    timeouts = module_config.get("timeouts")
+    if not timeouts:
+        return None
+    if not isinstance(timeouts, dict):
+        raise ValueError(f"Invalid timeouts '{timeouts}', expected a mapping of {', '.join(TIMEOUT_OPERATIONS)} to durations")
+    for operation, duration in timeouts.items():
+        if operation not in TIMEOUT_OPERATIONS:
+            raise ValueError(f"Unsupported timeout operation '{operation}', expected one of: {', '.join(TIMEOUT_OPERATIONS)}")
+        duration_seconds(duration)
+    return timeouts
+
+def _merge_timeouts(defaults: pulumi.CustomTimeouts, overrides: dict) -> pulumi.CustomTimeouts:
+    if not overrides:
+        return defaults
+    return pulumi.CustomTimeouts(
+        create=overrides.get("create", defaults.create if defaults else None),
+        update=overrides.get("update", defaults.update if defaults else None),
+        delete=overrides.get("delete", defaults.delete if defaults else None),
+    )
+
+def _helm_timeout(custom_timeouts: pulumi.CustomTimeouts) -> int:
+    # Helm must give up and roll back before Pulumi abandons the operation
+    durations = [duration_seconds(d) for d in (custom_timeouts.create, custom_timeouts.update) if d] if custom_timeouts else []
+    if not durations:
+        return DEFAULT_HELM_TIMEOUT
+    return max(min(durations) - ROLLBACK_MARGIN, ROLLBACK_MARGIN)
+
+def create_helm_release(
+        name: str,
+        chart: str,
+        version: str,
+        namespace: str,
+        values: pulumi.Input[dict],
+        opts: pulumi.ResourceOptions,
+        repository: str = None,
+        engine: str = DEFAULT_HELM_ENGINE,
+        skip_await: bool = False,
+        wait_for_jobs: bool = False,
+        timeouts: dict = None,
+        max_history: int = DEFAULT_MAX_HISTORY,
+    ):
+    """
+    Deploys a Helm chart with the selected engine.
+
+    The chart, version and repository are passed to Helm as given, so the release
+    inputs are the same on every machine and run. Releases keep a bounded history
+    and, unless awaiting is skipped, are atomic: a failed install or upgrade is
+    rolled back by Helm, with the Helm timeout set just below the Pulumi custom
+    timeouts so the rollback completes within the operation.
+
+    Args:
+        name (str): The Pulumi resource name, also used as the release name for the chart engine.
+        chart (str): The chart name, or a local chart path.
+        version (str): The chart version, or None for local charts.
+        namespace (str): The namespace to deploy the release into.
+        values (pulumi.Input[dict]): The Helm values.
+        opts (pulumi.ResourceOptions): Resource options for the release.
+        repository (str): The chart repository URL, or None for local charts.
+        engine (str): The Helm engine, one of HELM_ENGINES.
+        skip_await (bool): Skip waiting for the rendered resources to become ready.
+        wait_for_jobs (bool): Wait for chart Jobs to complete (release engine only).
+        timeouts (dict): Create, update and delete durations overriding the custom timeouts in opts.
+        max_history (int): The number of release revisions to keep (release engine only).
+
+    Returns:
+        k8s.helm.v3.Release | k8s.helm.v4.Chart: The deployed release or chart component.
+    """
+    custom_timeouts = _merge_timeouts(opts.custom_timeouts if opts else None, timeouts)
+    opts = pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(custom_timeouts=custom_timeouts))
+
+    if engine == "release":
+        release = k8s.helm.v3.Release(
+            name,
+            k8s.helm.v3.ReleaseArgs(
+                chart=chart,
+                version=version,
+                namespace=namespace,
+                values=values,
+                skip_await=skip_await,
+                wait_for_jobs=wait_for_jobs,
+                atomic=not skip_await,
+                cleanup_on_fail=True,
+                max_history=max_history,
+                timeout=_helm_timeout(custom_timeouts),
+                repository_opts=k8s.helm.v3.RepositoryOptsArgs(repo=repository) if repository else None,
+            ),
+            opts=opts
+        )
+    elif engine == "chart":
+        release = k8s.helm.v4.Chart(
+            name,
+            k8s.helm.v4.ChartArgs(
+                chart=chart,
+                name=name,
+                version=version,
+                namespace=namespace,
+                values=values,
+                skip_await=skip_await,
+                repository_opts=k8s.helm.v4.RepositoryOptsArgs(repo=repository) if repository else None,
+            ),
+            opts=opts
+        )
+        # The v4 Chart has no release name output, the release is named by ChartArgs.name
+        release.release_name = pulumi.Output.from_input(name)
+    else:
+        raise ValueError(f"Unsupported helm_engine '{engine}', expected one of: {', '.join(HELM_ENGINES)}")
+
+    _releases.append(release)
+    return release
+
+def get_helm_releases() -> list:
+    """
+    Returns the releases created by create_helm_release so far, in creation order.
+
+    Stages running after the modules, such as post-deploy gates, use this to depend
+    on every release of the stack.
+
+    Returns:
+        list: The k8s.helm.v3.Release and k8s.helm.v4.Chart resources.
+    """
+    return list(_releases)
+
+def reset_helm_releases():
+    """Forgets the created releases, for programs evaluated more than once per process."""
+    _releases.clear()
+
+def get_release_name(release) -> pulumi.Output[str]:
+    """
+    Returns the Helm release name of a resource created by create_helm_release.
+
+    The v3 Release auto-names the release, while the v4 Chart uses the name recorded
+    by create_helm_release.
+
+    Args:
+        release (k8s.helm.v3.Release | k8s.helm.v4.Chart): The release or chart component.
+
+    Returns:
+        pulumi.Output[str]: The Helm release name.
+    """
+    if isinstance(release, k8s.helm.v3.Release):
+        return release.name
+    return release.release_name
+
+def _run_helm(args: list, kubeconfig: str = None, context: str = None) -> subprocess.CompletedProcess:
+    # Runs the helm CLI against the cluster of a kubeconfig path or content
+    command = ["helm"] + args
+    if context:
+        command += ["--kube-context", context]
+
+    with tempfile.NamedTemporaryFile("w", suffix=".yaml") as kubeconfig_file:
+        if kubeconfig and not os.path.isfile(kubeconfig):
+            # Kubeconfig content, the helm CLI only reads files
+            kubeconfig_file.write(kubeconfig)
+            kubeconfig_file.flush()
+            kubeconfig = kubeconfig_file.name
+        if kubeconfig:
+            command += ["--kubeconfig", kubeconfig]
+        return subprocess.run(command, capture_output=True, text=True)
+
+def get_helm_revisions(name: str, namespace: str, kubeconfig: str = None, context: str = None) -> list:
+    """
+    Returns the revisions Helm still keeps of a release, oldest first.
+
+    Args:
+        name (str): The Helm release name.
+        namespace (str): The release namespace.
+        kubeconfig (str): The kubeconfig path or content, or None for the default kubeconfig.
+        context (str): The kubeconfig context, or None for the current context.
+
+    Returns:
+        list: The revision numbers.
+
+    Raises:
+        RuntimeError: If the history cannot be read.
+    """
+    result = _run_helm(["history", name, "--namespace", namespace, "--output", "json"], kubeconfig, context)
+    if result.returncode != 0:
+        raise RuntimeError(f"Reading the history of Helm release {namespace}/{name} failed: {result.stderr.strip()}")
+    return sorted(int(entry["revision"]) for entry in json.loads(result.stdout or "[]"))
+
+def rollback_helm_release(
+        name: str,
+        namespace: str,
+        revision: int,
+        kubeconfig: str = None,
+        context: str = None,
+        timeout_seconds: int = DEFAULT_HELM_TIMEOUT
+    ):
+    """
+    Rolls a release of the release engine back to a previous revision with the helm CLI.
+
+    The rollback waits for the rolled back resources, and like create_helm_release keeps
+    a bounded history. Pulumi records the new revision on the next refresh.
+
+    Args:
+        name (str): The Helm release name.
+        namespace (str): The release namespace.
+        revision (int): The revision to roll back to, see get_helm_revisions.
+        kubeconfig (str): The kubeconfig path or content, or None for the default kubeconfig.
+        context (str): The kubeconfig context, or None for the current context.
+        timeout_seconds (int): The time Helm waits for the rolled back resources.
+
+    Raises:
+        RuntimeError: If the rollback fails.
+    """
+    result = _run_helm([
+        "rollback", name, str(revision),
+        "--namespace", namespace,
+        "--wait",
+        "--cleanup-on-fail",
+        "--history-max", str(DEFAULT_MAX_HISTORY),
+        "--timeout", f"{timeout_seconds}s",
+    ], kubeconfig, context)
+    if result.returncode != 0:
+        raise RuntimeError(f"Rollback of Helm release {namespace}/{name} to revision {revision} failed: {result.stderr.strip()}")
@@ -0,0 +1,220 @@
+import io
+import json
+import os
+import tarfile
+from typing import List, TypedDict
+import pulumi
+import requests
+import yaml
+from jsonschema.validators import validator_for
+from src.lib.helm_chart_cache import get_chart_archive
+from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+
+class _Unknown:
+    """Placeholder for values only known at deploy time, such as outputs of other resources."""
+    def __repr__(self):
+        return "<unknown>"
+
+# Use in place of values that are not known before deployment, they are not validated
+UNKNOWN = _Unknown()
+
+class HelmValuesCheck(TypedDict):
+    """
+    Helm values to validate against a chart values schema.
+
+    Attributes:
+        module (str): The Kargo module deploying the chart.
+        chart (str): The chart name, or a local chart directory.
+        repository (str): The chart repository URL, or None for local charts.
+        version (str): The chart version, or None for the latest locked version.
+        values (dict): The generated Helm values.
+    """
+    module: str
+    chart: str
+    repository: str
+    version: str
+    values: dict
+
+def helm_values_check(module: str, chart: str, repository: str, version: str, values: dict) -> HelmValuesCheck:
+    """Builds a Helm values check, see validate_helm_values."""
+    return HelmValuesCheck(module=module, chart=chart, repository=repository, version=version, values=values)
+
+def _strip_unknowns(value):
+    # Outputs cannot be resolved before deployment, treat them as unknown
+    if isinstance(value, pulumi.Output):
+        return UNKNOWN
+    if isinstance(value, dict):
+        return {k: _strip_unknowns(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_strip_unknowns(v) for v in value]
+    return value
+
+def _contains_unknown(value) -> bool:
+    if value is UNKNOWN:
+        return True
+    if isinstance(value, dict):
+        return any(_contains_unknown(v) for v in value.values())
+    if isinstance(value, list):
+        return any(_contains_unknown(v) for v in value)
+    return False
+
+def coalesce_values(defaults: dict, overrides: dict) -> dict:
+    """Merges user values over chart defaults like Helm does, a null value removes the key."""
+    merged = dict(defaults or {})
+    for key, value in (overrides or {}).items():
+        if value is None:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = coalesce_values(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+def _archive_files(data: bytes) -> dict:
+    files = {}
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as archive:
+        for member in archive.getmembers():
+            if member.isfile():
+                files[member.name] = archive.extractfile(member).read()
+    return files
+
+def _directory_files(path: str) -> dict:
+    files = {}
+    root = os.path.dirname(os.path.normpath(path))
+    for directory, _, names in os.walk(path):
+        for name in names:
+            full_path = os.path.join(directory, name)
+            with open(full_path, "rb") as f:
+                files[os.path.relpath(full_path, root).replace(os.sep, "/")] = f.read()
+    return files
+
+def load_chart(files: dict) -> dict:
+    """
+    Loads the metadata, default values, values schema and subcharts of a chart.
+
+    Args:
+        files (dict): The chart files keyed by path, rooted at the chart directory name.
+
+    Returns:
+        dict: The chart name, values, schema (or None), dependencies and subcharts by name.
+    """
+    root = min((path.split("/")[0] for path in files), key=len)
+    chart_yaml = yaml.safe_load(files.get(f"{root}/Chart.yaml", b"")) or {}
+    schema = files.get(f"{root}/values.schema.json")
+
+    subcharts = {}
+    charts_prefix = f"{root}/charts/"
+    nested = {}
+    for path, data in files.items():
+        if not path.startswith(charts_prefix):
+            continue
+        relative = path[len(charts_prefix):]
+        if "/" not in relative and relative.endswith(".tgz"):
+            subchart = load_chart(_archive_files(data))
+            subcharts[subchart["name"]] = subchart
+        elif "/" in relative:
+            nested.setdefault(relative.split("/")[0], {})[relative] = data
+    for subchart_files in nested.values():
+        subchart = load_chart(subchart_files)
+        subcharts[subchart["name"]] = subchart
+
+    return {
+        "name": chart_yaml.get("name", root),
+        "values": yaml.safe_load(files.get(f"{root}/values.yaml", b"")) or {},
+        "schema": json.loads(schema) if schema else None,
+        "dependencies": chart_yaml.get("dependencies") or [],
+        "subcharts": subcharts,
+    }
+
+def _condition_enabled(values: dict, condition: str) -> bool:
+    # The first condition path that resolves to a boolean wins, like in Helm
+    for path in (condition or "").split(","):
+        value = values
+        for key in path.strip().split("."):
+            value = value.get(key) if isinstance(value, dict) else None
+        if isinstance(value, bool):
+            return value
+    return True
+
+def validate_chart_values(chart: dict, values: dict, path: str = "") -> List[str]:
+    """
+    Validates values against a chart values schema and the schemas of its enabled subcharts.
+
+    Values are merged over the chart defaults first, and errors caused by unknown
+    values are ignored.
+
+    Args:
+        chart (dict): The chart, see load_chart.
+        values (dict): The user supplied values.
+        path (str): The values path of the chart, for subcharts.
+
+    Returns:
+        List[str]: The validation errors.
+    """
+    merged = coalesce_values(chart["values"], values)
+    errors = []
+
+    if chart["schema"]:
+        validator = validator_for(chart["schema"])(chart["schema"])
+        for error in validator.iter_errors(merged):
+            if _contains_unknown(error.instance):
+                continue
+            location = ".".join(str(p) for p in [path, *error.absolute_path] if p != "") or "<root>"
+            errors.append(f"{location}: {error.message}")
+
+    for dependency in chart["dependencies"]:
+        subchart = chart["subcharts"].get(dependency.get("name"))
+        key = dependency.get("alias") or dependency.get("name")
+        if subchart is None or not _condition_enabled(merged, dependency.get("condition")):
+            continue
+        subchart_values = merged.get(key) or {}
+        if "global" in merged:
+            subchart_values = {**subchart_values, "global": coalesce_values(subchart_values.get("global") or {}, merged["global"])}
+        errors.extend(validate_chart_values(subchart, subchart_values, f"{path}.{key}" if path else key))
+    return errors
+
+def resolve_chart_version(chart: str, repository: str, version: str = None) -> str:
+    """Returns the configured chart version, or the latest version as locked for the stack."""
+    if version:
+        return str(version).lstrip("v")
+    index_url = f"{repository.rstrip('/')}/index.yaml"
+    return str(resolve_latest_version(chart, lambda: get_latest_helm_chart_version(index_url, chart))).lstrip("v")
+
+def validate_helm_values(checks: List[HelmValuesCheck]):
+    """
+    Validates the generated Helm values of all modules against their chart values schemas.
+
+    Chart archives come from the local chart cache, so only the first run downloads
+    them. Charts that cannot be downloaded or have no values schema are skipped with
+    a warning. All errors are collected before failing, so every module is reported
+    in one pass.
+
+    Args:
+        checks (List[HelmValuesCheck]): The values to validate.
+
+    Raises:
+        ValueError: If the values of any module do not match the chart values schema.
+    """
+    failures = []
+    for check in checks:
+        chart_label = f"{check['module']}: {check['chart']}"
+        try:
+            if check["repository"]:
+                version = resolve_chart_version(check["chart"], check["repository"], check["version"])
+                chart_label = f"{chart_label}@{version}"
+                with open(get_chart_archive(check["repository"], check["chart"], version), "rb") as f:
+                    chart = load_chart(_archive_files(f.read()))
+            else:
+                chart = load_chart(_directory_files(check["chart"]))
+        except (requests.RequestException, ValueError, OSError, tarfile.TarError) as e:
+            pulumi.log.warn(f"Skipping Helm values validation of {chart_label}: {e}")
+            continue
+
+        errors = validate_chart_values(chart, _strip_unknowns(check["values"]))
+        failures.extend(f"{chart_label}: {error}" for error in errors)
+
+    if failures:
+        message = "Helm values do not match the chart values schema:\n  " + "\n  ".join(failures)
+        pulumi.log.error(message)
+        raise ValueError(message)
@@ -0,0 +1,79 @@
+import functools
+import json
+import os
+import threading
+import time
+import pulumi
+
+# The program writes its per-module metrics to this file when the variable is set,
+# see tools/deploy_history.py for how they are recorded.
+METRICS_FILE_ENV = "KARGO_METRICS_FILE"
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_current = threading.local()
+
+def _module_metrics(module: str) -> dict:
+    with _metrics_lock:
+        return _metrics.setdefault(module, {"program_seconds": 0.0, "upstream_bytes": 0, "upstream_requests": 0})
+
+def instrument_module(module: str):
+    """
+    Decorator recording the program time and upstream traffic of a Kargo module.
+
+    Args:
+        module (str): The module name, matching the module config key.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            previous = getattr(_current, "module", None)
+            _current.module = module
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _module_metrics(module)["program_seconds"] += time.perf_counter() - start
+                _current.module = previous
+        return wrapper
+    return decorator
+
+def reset_module_metrics():
+    """Clears the recorded module metrics, for programs evaluated more than once per process."""
+    with _metrics_lock:
+        _metrics.clear()
+
+def record_upstream_bytes(url: str, size: int):
+    """Attributes an upstream download to the module currently being deployed."""
+    metrics = _module_metrics(getattr(_current, "module", None) or "kargo")
+    with _metrics_lock:
+        metrics["upstream_bytes"] += size
+        metrics["upstream_requests"] += 1
+
+def write_module_metrics(versions: dict):
+    """
+    Writes the per-module metrics and resolved versions to the metrics file.
+
+    Does nothing unless KARGO_METRICS_FILE is set or during previews.
+
+    Args:
+        versions (dict): The module outputs, see src/lib/outputs.ModuleOutput.
+    """
+    path = os.environ.get(METRICS_FILE_ENV)
+    if not path or pulumi.runtime.is_dry_run():
+        return
+
+    def write(resolved_versions):
+        with open(path, "w") as f:
+            json.dump({
+                "stack": pulumi.get_stack(),
+                "project": pulumi.get_project(),
+                "versions": resolved_versions,
+                "modules": _metrics,
+            }, f, indent=2, sort_keys=True)
+
+    pulumi.Output.from_input({
+        module: output.get("version")
+        for module, output in versions.items()
+        if output.get("enabled")
+    }).apply(write)
@@ -0,0 +1,69 @@
+import json
+from typing import Dict, Optional, TypedDict
+import pulumi
+
+# Default size budget for the exported module outputs, in bytes of serialized JSON
+DEFAULT_OUTPUT_SIZE_BUDGET = 8192
+
+class ModuleOutput(TypedDict, total=False):
+    """
+    Compact stack output schema exported for every Kargo module.
+
+    Attributes:
+        enabled (bool): Whether the module is enabled.
+        version (str): The deployed module version.
+        endpoints (Dict[str, str]): Key in-cluster endpoints or object references of the module.
+    """
+    enabled: bool
+    version: Optional[str]
+    endpoints: Dict[str, pulumi.Input[str]]
+
+def module_output(
+        enabled: bool,
+        version: pulumi.Input[str] = None,
+        endpoints: Dict[str, pulumi.Input[str]] = None
+    ) -> ModuleOutput:
+    """
+    Builds the compact stack output of a module.
+
+    Only plain values and string outputs belong in module outputs; never embed
+    resource objects, rendered values or certificates.
+
+    Args:
+        enabled (bool): Whether the module is enabled.
+        version (pulumi.Input[str]): The deployed module version.
+        endpoints (Dict[str, pulumi.Input[str]]): Key endpoints of the module.
+
+    Returns:
+        ModuleOutput: The module output.
+    """
+    output = ModuleOutput(enabled=enabled, version=version)
+    if endpoints:
+        output["endpoints"] = endpoints
+    return output
+
+def export_module_outputs(name: str, outputs: Dict[str, ModuleOutput], size_budget: int = DEFAULT_OUTPUT_SIZE_BUDGET):
+    """
+    Exports the module outputs and warns when their serialized size exceeds the budget.
+
+    Args:
+        name (str): The stack output name.
+        outputs (Dict[str, ModuleOutput]): The module outputs keyed by module name.
+        size_budget (int): The size budget in bytes of serialized JSON.
+    """
+    def check_size(resolved):
+        size = len(json.dumps(resolved, sort_keys=True, default=str))
+        if size > size_budget:
+            largest = sorted(
+                ((len(json.dumps(value, default=str)), key) for key, value in resolved.items()),
+                reverse=True
+            )[:3]
+            offenders = ", ".join(f"{key} ({module_size} bytes)" for module_size, key in largest)
+            pulumi.log.warn(
+                f"Stack output '{name}' is {size} bytes, over the {size_budget} byte budget (outputs.size_budget). "
+                f"Largest modules: {offenders}"
+            )
+        return size
+
+    pulumi.Output.from_input(outputs).apply(check_size)
+    pulumi.export(name, outputs)
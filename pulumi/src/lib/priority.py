@@ -0,0 +1,88 @@
+import pulumi
+
+# Kargo PriorityClasses, see src/priority_classes/deploy.py
+PRIORITY_CLASS_CRITICAL = "kargo-platform-critical"
+PRIORITY_CLASS_PLATFORM = "kargo-platform"
+PRIORITY_CLASS_TENANT_VM = "kargo-tenant-vm"
+
+# PriorityClass of the workloads of each Kargo module.
+# Cilium and KubeVirt are not listed, their agents and controllers already run with
+# the higher system-*-critical and kubevirt-cluster-critical classes.
+COMPONENT_PRIORITY_CLASSES = {
+    "cert_manager": PRIORITY_CLASS_CRITICAL,
+    "multus": PRIORITY_CLASS_CRITICAL,
+    "cnao": PRIORITY_CLASS_CRITICAL,
+    "hostpath_provisioner": PRIORITY_CLASS_CRITICAL,
+    "cdi": PRIORITY_CLASS_PLATFORM,
+    "prometheus": PRIORITY_CLASS_PLATFORM,
+    "ingress_nginx": PRIORITY_CLASS_PLATFORM,
+    "kubevirt_manager": PRIORITY_CLASS_PLATFORM,
+    "kubernetes_dashboard": PRIORITY_CLASS_PLATFORM,
+    "openunison": PRIORITY_CLASS_PLATFORM,
+    "ubuntu_vm": PRIORITY_CLASS_TENANT_VM,
+    "talos_cluster": PRIORITY_CLASS_TENANT_VM,
+}
+
+# Workload kinds with a pod template at spec.template
+POD_TEMPLATE_KINDS = ("Deployment", "DaemonSet", "StatefulSet", "ReplicaSet", "Job")
+
+# Resources of critical manifest containers that set neither requests nor limits
+CRITICAL_DEFAULT_RESOURCES = {"cpu": "100m", "memory": "128Mi"}
+
+def get_priority_class(component: str, priority_classes_enabled: bool) -> str:
+    """
+    Returns the PriorityClass name of a component's workloads.
+
+    Args:
+        component (str): The Kargo module name.
+        priority_classes_enabled (bool): Whether the priority_classes module is enabled.
+
+    Returns:
+        str: The PriorityClass name, or None to keep the workload defaults.
+    """
+    if not priority_classes_enabled:
+        return None
+    return COMPONENT_PRIORITY_CLASSES.get(component)
+
+def guaranteed_resources(resources: dict) -> dict:
+    """
+    Returns container resources with equal cpu and memory requests and limits, for the Guaranteed QoS class.
+
+    Upstream limits are kept and the requests raised to them, so containers are not
+    given less memory than upstream allows. Without limits the requests become the
+    limits, and missing quantities come from CRITICAL_DEFAULT_RESOURCES.
+
+    Args:
+        resources (dict): The container resources, or None.
+
+    Returns:
+        dict: The resources.
+    """
+    resources = dict(resources or {})
+    requests = dict(resources.get("requests") or {})
+    limits = dict(resources.get("limits") or {})
+    for name, default in CRITICAL_DEFAULT_RESOURCES.items():
+        requests[name] = limits[name] = limits.get(name) or requests.get(name) or default
+    return {**resources, "requests": requests, "limits": limits}
+
+def priority_class_transformation(priority_class: str):
+    """
+    Returns a resource transformation setting the PriorityClass of manifest workloads.
+
+    Workloads that already set a priorityClassName upstream are left unchanged. The
+    containers of critical workloads also get Guaranteed resources, see guaranteed_resources.
+
+    Args:
+        priority_class (str): The PriorityClass name, or None for a no-op transformation.
+    """
+    def transform(args):
+        obj = args.props
+        if priority_class and obj.get("kind") in POD_TEMPLATE_KINDS:
+            pod_spec = ((obj.get("spec") or {}).get("template") or {}).get("spec")
+            if isinstance(pod_spec, dict) and not pod_spec.get("priorityClassName"):
+                pod_spec["priorityClassName"] = priority_class
+            if isinstance(pod_spec, dict) and priority_class == PRIORITY_CLASS_CRITICAL:
+                for container in (pod_spec.get("initContainers") or []) + (pod_spec.get("containers") or []):
+                    container["resources"] = guaranteed_resources(container.get("resources"))
+        return pulumi.ResourceTransformationResult(props=obj, opts=args.opts)
+    return transform
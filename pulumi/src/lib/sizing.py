@@ -0,0 +1,104 @@
+import re
+from typing import TypedDict
+from src.lib.priority import PRIORITY_CLASS_CRITICAL
+
+# Named sizing profiles, from a single homelab node to a multi-node production site.
+# Requests are scaled from each component's small profile requests.
+SIZING_PROFILES = {
+    "small": {"replicas": 1, "scale": 1, "pdb": False},
+    "medium": {"replicas": 2, "scale": 2, "pdb": True},
+    "large": {"replicas": 3, "scale": 4, "pdb": True},
+}
+DEFAULT_SIZING_PROFILE = "small"
+
+# Resource requests of one replica of each sized component in the small profile
+COMPONENT_REQUESTS = {
+    "cilium": {"cpu": "100m", "memory": "128Mi"},
+    "cert_manager": {"cpu": "250m", "memory": "512Mi"},
+    "prometheus": {"cpu": "500m", "memory": "2Gi"},
+    "kubernetes_dashboard": {"cpu": "100m", "memory": "200Mi"},
+    "ingress_nginx": {"cpu": "100m", "memory": "90Mi"},
+    "openunison": {"cpu": "250m", "memory": "1Gi"},
+}
+
+# Limits are set to this multiple of the requests unless overridden
+LIMIT_RATIO = 2
+
+class ComponentSizing(TypedDict):
+    """
+    Resolved sizing of a platform component.
+
+    Attributes:
+        profile (str): The sizing profile name.
+        replicas (int): The number of replicas.
+        requests (dict): The cpu and memory requests of one replica.
+        limits (dict): The cpu and memory limits of one replica.
+        pdb (bool): Whether to create a PodDisruptionBudget.
+        priority_class (str): The PriorityClass name, or None for the chart default.
+    """
+    profile: str
+    replicas: int
+    requests: dict
+    limits: dict
+    pdb: bool
+    priority_class: str
+
+def scale_quantity(quantity: str, factor: float) -> str:
+    """
+    Scales a Kubernetes resource quantity such as "250m" or "2Gi".
+
+    Raises:
+        ValueError: If the quantity is not valid.
+    """
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([A-Za-z]*)", str(quantity).strip())
+    if not match:
+        raise ValueError(f"Invalid resource quantity '{quantity}'")
+    value = float(match.group(1)) * factor
+    return f"{int(value) if value.is_integer() else round(value, 3)}{match.group(2)}"
+
+def get_sizing(component: str, module_config: dict, default_profile: str = None, priority_class: str = None) -> ComponentSizing:
+    """
+    Resolves the sizing of a component from the stack profile and the module `sizing` config key.
+
+    The module `sizing` object may set its own `profile`, and override `replicas`,
+    `requests`, `limits` and `pdb`. A PodDisruptionBudget is only created with more
+    than one replica. Critical components get limits equal to their requests, for the
+    Guaranteed QoS class.
+
+    Args:
+        component (str): The component name, components without COMPONENT_REQUESTS only get replicas.
+        module_config (dict): The module configuration object.
+        default_profile (str): The stack wide profile, see the `sizing.profile` config key.
+        priority_class (str): The component PriorityClass, see src/lib/priority.get_priority_class.
+
+    Returns:
+        ComponentSizing: The resolved sizing.
+
+    Raises:
+        ValueError: If the profile or a quantity is not valid.
+    """
+    overrides = (module_config or {}).get("sizing") or {}
+    profile = str(overrides.get("profile") or default_profile or DEFAULT_SIZING_PROFILE).lower()
+    if profile not in SIZING_PROFILES:
+        raise ValueError(f"Unsupported sizing profile '{profile}', expected one of: {', '.join(SIZING_PROFILES)}")
+    base = SIZING_PROFILES[profile]
+
+    requests = {k: scale_quantity(v, base["scale"]) for k, v in COMPONENT_REQUESTS.get(component, {}).items()}
+    requests.update(overrides.get("requests") or {})
+    limit_ratio = 1 if priority_class == PRIORITY_CLASS_CRITICAL else LIMIT_RATIO
+    limits = {k: scale_quantity(v, limit_ratio) for k, v in requests.items()}
+    limits.update(overrides.get("limits") or {})
+    replicas = int(overrides.get("replicas", base["replicas"]))
+
+    return ComponentSizing(
+        profile=profile,
+        replicas=replicas,
+        requests=requests,
+        limits=limits,
+        pdb=bool(overrides.get("pdb", base["pdb"])) and replicas > 1,
+        priority_class=priority_class,
+    )
+
+def resources(sizing: ComponentSizing) -> dict:
+    """Returns the container resources of a sized component, as used by most charts."""
+    return {"requests": dict(sizing["requests"]), "limits": dict(sizing["limits"])}
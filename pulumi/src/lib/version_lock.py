@@ -0,0 +1,71 @@
+import os
+import yaml
+import pulumi
+from src.lib.helm_chart_versions import is_stable_version
+
+# Resolved "latest" versions are pinned per stack so that repeated runs do not
+# float to a newer upstream release between two `pulumi up` invocations.
+LOCKFILE_DIR = "stacks"
+
+_lock = None
+
+def get_lockfile_path() -> str:
+    """Returns the version lockfile path for the current stack."""
+    return os.path.join(LOCKFILE_DIR, f"{pulumi.get_stack()}.versions.lock.yaml")
+
+def _get_lock_config() -> dict:
+    return pulumi.Config().get_object("version_lock") or {}
+
+def _load_lock() -> dict:
+    global _lock
+    if _lock is None:
+        _lock = {}
+        lockfile_path = get_lockfile_path()
+        if os.path.exists(lockfile_path):
+            with open(lockfile_path, "r") as f:
+                _lock = yaml.safe_load(f) or {}
+    return _lock
+
+def reload_version_lock():
+    """Drops the in-memory lockfile so the next lookup reads it from disk again."""
+    global _lock
+    _lock = None
+
+def _write_lock(lock: dict):
+    with open(get_lockfile_path(), "w") as f:
+        f.write("# Generated by Kargo: resolved component versions for this stack.\n")
+        f.write("# Delete an entry (or set version_lock.update=true) to re-resolve the latest version.\n")
+        yaml.safe_dump(lock, f, default_flow_style=False, sort_keys=True)
+
+def resolve_latest_version(component: str, resolver) -> str:
+    """
+    Resolves the latest version of a component, pinned in the stack version lockfile.
+
+    The first successful upstream lookup is recorded in the lockfile, and later runs
+    reuse the recorded version instead of querying upstream again. Previews leave the
+    lockfile untouched, the version is recorded by the next update.
+
+    Args:
+        component (str): The component name used as the lockfile key.
+        resolver (callable): Zero argument callable returning the latest upstream version.
+
+    Returns:
+        str: The locked or freshly resolved version.
+    """
+    lock_config = _get_lock_config()
+    if str(lock_config.get("enabled", True)).lower() != "true":
+        return resolver()
+
+    lock = _load_lock()
+    update = str(lock_config.get("update", False)).lower() == "true"
+    if component in lock and not update:
+        return lock[component]
+
+    version = resolver()
+    if not version or not is_stable_version(str(version).lstrip("v")):
+        pulumi.log.warn(f"Not locking unresolved version for {component}: {version}")
+    elif not pulumi.runtime.is_dry_run():
+        lock[component] = version
+        _write_lock(lock)
+
+    return version
@@ -1,5 +1,7 @@
 import pulumi
 import pulumi_kubernetes as k8s
+from src.lib.crd_barrier import create_crd_barrier
+from src.lib.priority import priority_class_transformation
 
 def transform_host_path(args):
 
@@ -37,7 +39,8 @@ def deploy_multus(
         depends: pulumi.Input[list],
         version: str,
         bridge_name: str,
-        k8s_provider: k8s.Provider
+        k8s_provider: k8s.Provider,
+        priority_class: str = None
     ):
 
     resource_name = f"k8snetworkplumbingwg-multus-daemonset-thick"
@@ -49,7 +52,7 @@ def deploy_multus(
         opts=pulumi.ResourceOptions(
             provider=k8s_provider,
             depends_on=depends,
-            transformations=[transform_host_path],
+            transformations=[transform_host_path, priority_class_transformation(priority_class)],
             custom_timeouts=pulumi.CustomTimeouts(
                 create="8m",
                 update="8m",
@@ -58,8 +61,16 @@ def deploy_multus(
         )
     )
 
+    # Wait for the NetworkAttachmentDefinition CRD to be served before creating the resource
+    crd_barrier = create_crd_barrier(
+        "multus-crds",
+        ["network-attachment-definitions.k8s.cni.cncf.io"],
+        depends_on=[multus],
+        parent=multus
+    )
+
     # Pulumi Kubernetes resource for NetworkAttachmentDefinition
-    network_attachment_definition = k8s.apiextensions.CustomResource(
+    k8s.apiextensions.CustomResource(
         "kargo-net-attach-def",
         api_version="k8s.cni.cncf.io/v1",
         kind="NetworkAttachmentDefinition",
@@ -85,7 +96,7 @@ def deploy_multus(
             }}''')
         },
         opts=pulumi.ResourceOptions(
-            depends_on=multus,
+            depends_on=[crd_barrier],
             provider=k8s_provider,
             custom_timeouts=pulumi.CustomTimeouts(
                 create="5m",
@@ -94,7 +105,4 @@ def deploy_multus(
         )
     ))
 
-    # Export the name of the resource
-    pulumi.export('network_attachment_definition', network_attachment_definition.metadata['name'])
-
     return "master", multus
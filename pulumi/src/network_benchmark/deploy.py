@@ -0,0 +1,391 @@
+import ipaddress
+import json
+import pulumi
+import pulumi_kubernetes as k8s
+from pulumi_kubernetes.apiextensions import CustomResource
+from src.lib.namespace import create_namespace
+from src.lib.crd_barrier import create_crd_barrier
+from src.lib.benchmark import RESULT_MARKER, run_benchmark_job, collect_vm_results
+
+DEFAULT_IMAGE = "docker.io/library/alpine:3.20"
+DEFAULT_VM_IMAGE = "quay.io/containerdisks/fedora:40"
+DEFAULT_DURATION = 10
+DEFAULT_STREAMS = 4
+DEFAULT_PING_COUNT = 1000
+
+# RFC 2544 benchmarking range, addresses on the bridge never collide with the LAN
+DEFAULT_BRIDGE_CIDR = "198.18.0.0/24"
+
+# Benchmarked network paths
+PATHS = ("pod_same_node", "pod_cross_node", "pod_bridge", "vm_bridge")
+
+SERVER_LABELS = {"ccio.v1/app": "kargo", "ccio.v1/benchmark": "network-benchmark-server"}
+
+def get_paths(config_network_benchmark: dict, multus_enabled: bool, kubevirt_enabled: bool) -> list:
+    """
+    Resolves the network paths to benchmark.
+
+    The bridge paths need Multus, and the VM path also needs KubeVirt. The pod_cross_node
+    path needs two schedulable nodes, its benchmark fails fast on single-node clusters.
+
+    Args:
+        config_network_benchmark (dict): The network_benchmark module configuration object.
+        multus_enabled (bool): Whether the multus module is enabled.
+        kubevirt_enabled (bool): Whether the kubevirt module is enabled.
+
+    Returns:
+        list: The path names, see PATHS.
+
+    Raises:
+        ValueError: If a path is not valid or its modules are not enabled.
+    """
+    available = ["pod_same_node", "pod_cross_node"]
+    if multus_enabled:
+        available.append("pod_bridge")
+        if kubevirt_enabled:
+            available.append("vm_bridge")
+
+    paths = config_network_benchmark.get("paths") or available
+    for path in paths:
+        if path not in PATHS:
+            raise ValueError(f"Unsupported network benchmark path '{path}', expected one of: {', '.join(PATHS)}")
+        if path not in available:
+            raise ValueError(f"Network benchmark path '{path}' requires multus{' and kubevirt' if path == 'vm_bridge' else ''} to be enabled")
+    return paths
+
+def gen_client_script(key: str, server: str, duration: int, streams: int, ping_count: int, install: str) -> str:
+    """
+    Generates the client benchmark script, printing one result for a network path.
+
+    The result holds the TCP throughput in Gbps, the received rate of small UDP
+    packets, and the ICMP round trip latency percentiles in ms.
+
+    Args:
+        key (str): The result key, the path name.
+        server (str): The iperf3 server address.
+        duration (int): The duration of each iperf3 test, in seconds.
+        streams (int): The number of parallel TCP streams.
+        ping_count (int): The number of latency probes.
+        install (str): The command installing iperf3, jq and ping.
+
+    Returns:
+        str: The shell script.
+    """
+    percentiles = (
+        "function q(p,  i) { i = int(NR * p + 0.5); if (i < 1) i = 1; return t[i] } "
+        "{ t[NR] = $1 } "
+        'END { printf "{\\"p50\\": %s, \\"p99\\": %s, \\"max\\": %s}", q(0.50), q(0.99), t[NR] }'
+    )
+    return "\n".join([
+        "set -euo pipefail",
+        install,
+        f'until iperf3 -c {server} -t 1 >/dev/null 2>&1; do sleep 2; done',
+        f"tcp=$(iperf3 -c {server} -t {duration} -P {streams} -J | jq '.end.sum_received.bits_per_second / 1000000000')",
+        f"udp=$(iperf3 -c {server} -u -b 0 -l 64 -t {duration} -J | jq '(.end.sum.packets - .end.sum.lost_packets) / .end.sum.seconds')",
+        f"latency=$(ping -c {ping_count} -i 0.01 {server} | sed -n 's/.*time=\\([0-9.]*\\).*/\\1/p' | sort -n | awk '{percentiles}')",
+        'result=$(jq -cn --argjson tcp "$tcp" --argjson udp "$udp" --argjson latency "$latency" '
+        "'{throughput_gbps: $tcp, udp_packets_per_second: $udp, latency_ms: $latency}')",
+        f'echo "{RESULT_MARKER} {key} $result"',
+    ]) + "\n"
+
+def summarize(results: dict) -> str:
+    """Formats the result of a network path as a compact stack output."""
+    if not results:
+        return "no result"
+    return f"{results['throughput_gbps']:.2f} Gbps, {results['udp_packets_per_second']:.0f} pps, p99 {results['latency_ms']['p99']} ms"
+
+def _multus_networks(nad: str, address: str) -> str:
+    return json.dumps([{"name": nad, "ips": [address]}])
+
+def _gen_vmi(name: str, bridge_name: str, address: str, image: str, user_data: str, opts: pulumi.ResourceOptions) -> CustomResource:
+    # The pod network is only used by the guest to install packages
+    return CustomResource(
+        name,
+        api_version="kubevirt.io/v1",
+        kind="VirtualMachineInstance",
+        metadata={
+            "name": name,
+            "namespace": "network-benchmark",
+            "labels": {"ccio.v1/app": "kargo", "ccio.v1/benchmark": name},
+        },
+        spec={
+            "domain": {
+                "cpu": {"cores": 2},
+                "resources": {"requests": {"memory": "2Gi"}},
+                "devices": {
+                    "logSerialConsole": True,
+                    "disks": [
+                        {"name": "containerdisk", "disk": {"bus": "virtio"}},
+                        {"name": "cloudinit", "disk": {"bus": "virtio"}},
+                    ],
+                    "interfaces": [
+                        {"name": "default", "masquerade": {}, "macAddress": "02:00:00:00:00:01"},
+                        {"name": "bridge", "bridge": {}, "macAddress": "02:00:00:00:00:02"},
+                    ],
+                },
+            },
+            "networks": [
+                {"name": "default", "pod": {}},
+                {"name": "bridge", "multus": {"networkName": f"default/{bridge_name}"}},
+            ],
+            "volumes": [
+                {"name": "containerdisk", "containerDisk": {"image": image}},
+                {"name": "cloudinit", "cloudInitNoCloud": {
+                    "userData": user_data,
+                    "networkData": json.dumps({
+                        "version": 2,
+                        "ethernets": {
+                            "pod": {"match": {"macaddress": "02:00:00:00:00:01"}, "dhcp4": True},
+                            "bridge": {"match": {"macaddress": "02:00:00:00:00:02"}, "addresses": [address]},
+                        },
+                    }),
+                }},
+            ],
+        },
+        opts=opts
+    )
+
+def deploy_network_benchmark(
+        depends: pulumi.Input[list],
+        run_id: str,
+        paths: list,
+        bridge_name: str,
+        bridge_cidr: str,
+        image: str,
+        vm_image: str,
+        duration: int,
+        streams: int,
+        ping_count: int,
+        k8s_provider: k8s.Provider
+    ):
+    """
+    Runs iperf3 and ping between pods and VMs over the pod network and the Multus bridge.
+
+    A single iperf3 server pod serves the pod paths, on the pod network and on a
+    static address on the bridge. The VM path runs between two throwaway VMIs
+    attached to the Kargo bridge NetworkAttachmentDefinition. The paths run one at a time.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on, including Cilium, Multus and KubeVirt.
+        run_id (str): The benchmark run id, changing it runs the benchmarks again.
+        paths (list): The network paths to benchmark, see get_paths.
+        bridge_name (str): The Multus bridge and NetworkAttachmentDefinition name.
+        bridge_cidr (str): The subnet of the benchmark addresses on the bridge, or None for DEFAULT_BRIDGE_CIDR.
+        image (str): The pod image, or None for DEFAULT_IMAGE. iperf3 is installed with apk.
+        vm_image (str): The VM container disk, or None for DEFAULT_VM_IMAGE. iperf3 is installed with dnf.
+        duration (int): The duration of each iperf3 test in seconds, or None for DEFAULT_DURATION.
+        streams (int): The number of parallel TCP streams, or None for DEFAULT_STREAMS.
+        ping_count (int): The number of latency probes, or None for DEFAULT_PING_COUNT.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+
+    Returns:
+        tuple: The results ConfigMap, and a compact summary per path.
+    """
+    ns_name = "network-benchmark"
+    image = image or DEFAULT_IMAGE
+    vm_image = vm_image or DEFAULT_VM_IMAGE
+    duration = int(duration or DEFAULT_DURATION)
+    streams = int(streams or DEFAULT_STREAMS)
+    ping_count = int(ping_count or DEFAULT_PING_COUNT)
+    network = ipaddress.ip_network(bridge_cidr or DEFAULT_BRIDGE_CIDR)
+    hosts = list(network.hosts())
+    prefix = f"/{network.prefixlen}"
+
+    namespace = create_namespace(
+        None,
+        ns_name,
+        False,
+        False,
+        k8s_provider,
+        custom_labels={},
+        custom_annotations={}
+    )
+    opts = pulumi.ResourceOptions(
+        provider=k8s_provider,
+        parent=namespace,
+        depends_on=depends + [namespace],
+    )
+
+    bridge_paths = [path for path in paths if path in ("pod_bridge", "vm_bridge")]
+    crd_barrier = None
+    if bridge_paths:
+        crd_barrier = create_crd_barrier(
+            "network-benchmark-crds",
+            ["network-attachment-definitions.k8s.cni.cncf.io"]
+            + (["virtualmachineinstances.kubevirt.io"] if "vm_bridge" in paths else []),
+            depends_on=depends,
+            parent=namespace
+        )
+
+    server_annotations = {}
+    previous = [namespace]
+    if "pod_bridge" in paths:
+        # The Kargo bridge attachment has no IPAM, the benchmark pods use static addresses on it,
+        # passed from the networks annotation to the static IPAM through the ips capability
+        nad = CustomResource(
+            "network-benchmark-bridge",
+            api_version="k8s.cni.cncf.io/v1",
+            kind="NetworkAttachmentDefinition",
+            metadata={"name": "network-benchmark-bridge", "namespace": ns_name},
+            spec={"config": json.dumps({
+                "cniVersion": "0.3.1",
+                "name": "network-benchmark-bridge",
+                "plugins": [
+                    {"type": "bridge", "bridge": bridge_name, "capabilities": {"ips": True}, "ipam": {"type": "static"}},
+                ],
+            })},
+            opts=pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(depends_on=[namespace, crd_barrier]))
+        )
+        server_annotations["k8s.v1.cni.cncf.io/networks"] = _multus_networks("network-benchmark-bridge", f"{hosts[0]}{prefix}")
+        previous = [nad]
+
+    server = k8s.apps.v1.Deployment(
+        "network-benchmark-server",
+        metadata=k8s.meta.v1.ObjectMetaArgs(name="network-benchmark-server", namespace=ns_name, labels=SERVER_LABELS),
+        spec=k8s.apps.v1.DeploymentSpecArgs(
+            replicas=1,
+            selector=k8s.meta.v1.LabelSelectorArgs(match_labels=SERVER_LABELS),
+            template=k8s.core.v1.PodTemplateSpecArgs(
+                metadata=k8s.meta.v1.ObjectMetaArgs(labels=SERVER_LABELS, annotations=server_annotations),
+                spec=k8s.core.v1.PodSpecArgs(
+                    containers=[k8s.core.v1.ContainerArgs(
+                        name="iperf3",
+                        image=image,
+                        command=["/bin/sh", "-c", "apk add --no-cache iperf3 >/dev/null && exec iperf3 -s"],
+                        ports=[k8s.core.v1.ContainerPortArgs(name="iperf3", container_port=5201)],
+                        resources=k8s.core.v1.ResourceRequirementsArgs(requests={"cpu": "1", "memory": "128Mi"}),
+                    )],
+                ),
+            ),
+        ),
+        opts=pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(depends_on=previous))
+    )
+
+    # Headless, so clients resolve the server pod address and bypass service load balancing
+    k8s.core.v1.Service(
+        "network-benchmark-server-service",
+        metadata=k8s.meta.v1.ObjectMetaArgs(name="network-benchmark-server", namespace=ns_name),
+        spec=k8s.core.v1.ServiceSpecArgs(
+            cluster_ip="None",
+            selector=SERVER_LABELS,
+            ports=[k8s.core.v1.ServicePortArgs(name="iperf3", port=5201)],
+        ),
+        opts=opts
+    )
+
+    install = "apk add --no-cache iperf3 iputils jq >/dev/null"
+    server_term = k8s.core.v1.PodAffinityTermArgs(
+        topology_key="kubernetes.io/hostname",
+        label_selector=k8s.meta.v1.LabelSelectorArgs(match_labels=SERVER_LABELS),
+    )
+    clients = {
+        "pod_same_node": (
+            "network-benchmark-server",
+            k8s.core.v1.AffinityArgs(pod_affinity=k8s.core.v1.PodAffinityArgs(
+                required_during_scheduling_ignored_during_execution=[server_term],
+            )),
+            {},
+        ),
+        "pod_cross_node": (
+            "network-benchmark-server",
+            k8s.core.v1.AffinityArgs(pod_anti_affinity=k8s.core.v1.PodAntiAffinityArgs(
+                required_during_scheduling_ignored_during_execution=[server_term],
+            )),
+            {},
+        ),
+        "pod_bridge": (
+            str(hosts[0]),
+            None,
+            {"k8s.v1.cni.cncf.io/networks": _multus_networks("network-benchmark-bridge", f"{hosts[1]}{prefix}")},
+        ),
+    }
+
+    results = {}
+    previous = [server]
+    for path in paths:
+        name = f"network-benchmark-{path.replace('_', '-')}"
+        if path in clients:
+            target, affinity, annotations = clients[path]
+            _, benchmark_results = run_benchmark_job(
+                name,
+                ns_name,
+                run_id,
+                k8s.core.v1.PodSpecArgs(
+                    restart_policy="Never",
+                    affinity=affinity,
+                    containers=[k8s.core.v1.ContainerArgs(
+                        name="client",
+                        image=image,
+                        command=["/bin/sh", "-c", gen_client_script(path, target, duration, streams, ping_count, install)],
+                        resources=k8s.core.v1.ResourceRequirementsArgs(requests={"cpu": "1", "memory": "128Mi"}),
+                    )],
+                ),
+                k8s_provider,
+                depends_on=previous,
+                parent=server,
+                pod_annotations=annotations,
+            )
+        else:
+            vm_opts = pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(
+                depends_on=previous + [crd_barrier],
+                # VMI specs are immutable, each run recreates the VMs
+                replace_on_changes=["spec"],
+                delete_before_replace=True,
+            ))
+            vm_server = _gen_vmi(
+                "network-benchmark-vm-server",
+                bridge_name,
+                f"{hosts[10]}{prefix}",
+                vm_image,
+                gen_vm_user_data(run_id, "iperf3 -s -D"),
+                vm_opts
+            )
+            vm_client = _gen_vmi(
+                "network-benchmark-vm-client",
+                bridge_name,
+                f"{hosts[11]}{prefix}",
+                vm_image,
+                gen_vm_user_data(
+                    run_id,
+                    "sh /root/network-benchmark.sh > /dev/ttyS0 2>&1",
+                    gen_client_script(path, str(hosts[10]), duration, streams, ping_count, "true")
+                ),
+                pulumi.ResourceOptions.merge(vm_opts, pulumi.ResourceOptions(depends_on=previous + [crd_barrier, vm_server]))
+            )
+            benchmark_results = collect_vm_results(
+                f"{name}-results",
+                ns_name,
+                "network-benchmark-vm-client",
+                run_id,
+                [path],
+                depends_on=[vm_client],
+                parent=vm_client,
+            )
+
+        results[path] = benchmark_results.results.apply(lambda r, path=path: (r or {}).get(path))
+        previous = [benchmark_results]
+
+    config_map = k8s.core.v1.ConfigMap(
+        "network-benchmark-results",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="network-benchmark-results",
+            namespace=ns_name,
+            labels={"ccio.v1/benchmark-run": str(run_id)},
+        ),
+        data={f"{path}.json": result.apply(lambda r: json.dumps(r, indent=2, sort_keys=True)) for path, result in results.items()},
+        opts=pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(depends_on=previous))
+    )
+
+    return config_map, {path: result.apply(summarize) for path, result in results.items()}
+
+def gen_vm_user_data(run_id: str, command: str, script: str = None) -> str:
+    """Generates the cloud-init user data of a benchmark VM, installing iperf3 and running a command."""
+    user_data = {
+        "packages": ["iperf3", "iputils", "jq"],
+        "runcmd": [["sh", "-c", command]],
+        # Changes the VMI spec for each run, so the VMs are recreated
+        "bootcmd": [["sh", "-c", f"echo {run_id} > /run/network-benchmark-run"]],
+    }
+    if script:
+        user_data["write_files"] = [{"path": "/root/network-benchmark.sh", "permissions": "0755", "content": script}]
+    return "#cloud-config\n" + json.dumps(user_data, indent=2)
@@ -0,0 +1,255 @@
+import pulumi
+import pulumi_kubernetes as k8s
+from pulumi_kubernetes.apiextensions import CustomResource
+from src.lib.crd_barrier import create_crd_barrier
+
+# k8s-dns-node-cache image tag, override with node_local_dns.version
+DEFAULT_VERSION = "1.23.1"
+
+# Default cache capacity (entries) and maximum TTL (seconds) for the cluster domain
+DEFAULT_CACHE = {
+    "success": 9984,
+    "success_ttl": 30,
+    "denial": 9984,
+    "denial_ttl": 5,
+}
+
+def gen_corefile(cluster_domain: str, cache: dict) -> str:
+    """
+    Generates the node-local-dns Corefile.
+
+    The cache binds to all pod addresses, since Cilium redirects kube-dns traffic to
+    the local pod instead of node-local-dns intercepting it with iptables.
+    __PILLAR__CLUSTER__DNS__ and __PILLAR__UPSTREAM__SERVERS__ are substituted by
+    node-cache at startup.
+
+    Args:
+        cluster_domain (str): The cluster DNS domain.
+        cache (dict): The cache capacity and TTLs, see DEFAULT_CACHE.
+
+    Returns:
+        str: The Corefile.
+    """
+    cluster_zone = f"""
+    cache {{
+        success {cache['success']} {cache['success_ttl']}
+        denial {cache['denial']} {cache['denial_ttl']}
+    }}
+    reload
+    loop
+    bind 0.0.0.0
+    forward . __PILLAR__CLUSTER__DNS__ {{
+        force_tcp
+    }}
+    prometheus :9253
+"""
+    zones = [
+        f"{cluster_domain}:53 {{\n    errors{cluster_zone}    health\n}}",
+        f"in-addr.arpa:53 {{\n    errors{cluster_zone}}}",
+        f"ip6.arpa:53 {{\n    errors{cluster_zone}}}",
+        f""".:53 {{
+    errors
+    cache {cache['success_ttl']}
+    reload
+    loop
+    bind 0.0.0.0
+    forward . __PILLAR__UPSTREAM__SERVERS__
+    prometheus :9253
+}}""",
+    ]
+    return "\n".join(zones) + "\n"
+
+def deploy_node_local_dns(
+        depends: pulumi.Input[list],
+        version: str,
+        cluster_domain: str,
+        cache: dict,
+        k8s_provider: k8s.Provider
+    ):
+    """
+    Deploys NodeLocal DNSCache with a Cilium local redirect policy for kube-dns.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on, including the Cilium release.
+        version (str): The k8s-dns-node-cache image tag, or None for DEFAULT_VERSION.
+        cluster_domain (str): The cluster DNS domain.
+        cache (dict): Cache overrides, see DEFAULT_CACHE.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+
+    Returns:
+        tuple: The image version and the node-local-dns DaemonSet.
+    """
+    ns_name = "kube-system"
+    version = version or DEFAULT_VERSION
+    cache = {**DEFAULT_CACHE, **(cache or {})}
+    pulumi.log.info(f"Using node-local-dns version: k8s-dns-node-cache/{version}")
+
+    labels = {"k8s-app": "node-local-dns"}
+    opts = pulumi.ResourceOptions(
+        provider=k8s_provider,
+        depends_on=depends,
+        custom_timeouts=pulumi.CustomTimeouts(
+            create="5m",
+            update="5m",
+            delete="2m"
+        )
+    )
+
+    service_account = k8s.core.v1.ServiceAccount(
+        "node-local-dns-service-account",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="node-local-dns",
+            namespace=ns_name,
+        ),
+        opts=opts
+    )
+
+    # Upstream service for cache misses, so they bypass the redirect policy on kube-dns
+    upstream_service = k8s.core.v1.Service(
+        "node-local-dns-kube-dns-upstream",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="kube-dns-upstream",
+            namespace=ns_name,
+            labels={"k8s-app": "kube-dns"},
+        ),
+        spec=k8s.core.v1.ServiceSpecArgs(
+            selector={"k8s-app": "kube-dns"},
+            ports=[
+                k8s.core.v1.ServicePortArgs(name="dns", port=53, protocol="UDP", target_port=53),
+                k8s.core.v1.ServicePortArgs(name="dns-tcp", port=53, protocol="TCP", target_port=53),
+            ],
+        ),
+        opts=opts
+    )
+
+    config_map = k8s.core.v1.ConfigMap(
+        "node-local-dns-config",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="node-local-dns",
+            namespace=ns_name,
+        ),
+        data={"Corefile": gen_corefile(cluster_domain, cache)},
+        opts=opts
+    )
+
+    daemonset = k8s.apps.v1.DaemonSet(
+        "node-local-dns",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="node-local-dns",
+            namespace=ns_name,
+            labels=labels,
+        ),
+        spec=k8s.apps.v1.DaemonSetSpecArgs(
+            selector=k8s.meta.v1.LabelSelectorArgs(match_labels=labels),
+            update_strategy=k8s.apps.v1.DaemonSetUpdateStrategyArgs(
+                rolling_update=k8s.apps.v1.RollingUpdateDaemonSetArgs(max_unavailable="10%"),
+            ),
+            template=k8s.core.v1.PodTemplateSpecArgs(
+                metadata=k8s.meta.v1.ObjectMetaArgs(
+                    labels=labels,
+                    annotations={
+                        "prometheus.io/port": "9253",
+                        "prometheus.io/scrape": "true",
+                    },
+                ),
+                spec=k8s.core.v1.PodSpecArgs(
+                    priority_class_name="system-node-critical",
+                    service_account_name="node-local-dns",
+                    dns_policy="Default",
+                    tolerations=[k8s.core.v1.TolerationArgs(operator="Exists")],
+                    containers=[k8s.core.v1.ContainerArgs(
+                        name="node-cache",
+                        image=f"registry.k8s.io/dns/k8s-dns-node-cache:{version}",
+                        args=[
+                            "-localip", "169.254.20.10",
+                            "-conf", "/etc/Corefile",
+                            "-upstreamsvc", "kube-dns-upstream",
+                            "-skipteardown=true",
+                            "-setupinterface=false",
+                            "-setupiptables=false",
+                        ],
+                        ports=[
+                            k8s.core.v1.ContainerPortArgs(name="dns", container_port=53, protocol="UDP"),
+                            k8s.core.v1.ContainerPortArgs(name="dns-tcp", container_port=53, protocol="TCP"),
+                            k8s.core.v1.ContainerPortArgs(name="metrics", container_port=9253, protocol="TCP"),
+                        ],
+                        resources=k8s.core.v1.ResourceRequirementsArgs(
+                            requests={"cpu": "25m", "memory": "5Mi"},
+                        ),
+                        liveness_probe=k8s.core.v1.ProbeArgs(
+                            http_get=k8s.core.v1.HTTPGetActionArgs(path="/health", port=8080),
+                            initial_delay_seconds=60,
+                            timeout_seconds=5,
+                        ),
+                        volume_mounts=[
+                            k8s.core.v1.VolumeMountArgs(name="config-volume", mount_path="/etc/coredns"),
+                            k8s.core.v1.VolumeMountArgs(name="kube-dns-config", mount_path="/etc/kube-dns"),
+                        ],
+                    )],
+                    volumes=[
+                        k8s.core.v1.VolumeArgs(
+                            name="kube-dns-config",
+                            config_map=k8s.core.v1.ConfigMapVolumeSourceArgs(name="kube-dns", optional=True),
+                        ),
+                        k8s.core.v1.VolumeArgs(
+                            name="config-volume",
+                            config_map=k8s.core.v1.ConfigMapVolumeSourceArgs(
+                                name="node-local-dns",
+                                items=[k8s.core.v1.KeyToPathArgs(key="Corefile", path="Corefile.base")],
+                            ),
+                        ),
+                    ],
+                ),
+            ),
+        ),
+        opts=pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(
+            depends_on=[service_account, upstream_service, config_map],
+        ))
+    )
+
+    # Cilium registers the policy CRD when localRedirectPolicy is enabled in its values
+    crd_barrier = create_crd_barrier(
+        "node-local-dns-crds",
+        ["ciliumlocalredirectpolicies.cilium.io"],
+        depends_on=depends,
+    )
+
+    # Redirect kube-dns traffic to the node-local-dns pod on the same node
+    CustomResource(
+        "node-local-dns-redirect-policy",
+        api_version="cilium.io/v2",
+        kind="CiliumLocalRedirectPolicy",
+        metadata={
+            "name": "nodelocaldns",
+            "namespace": ns_name,
+        },
+        spec={
+            "redirectFrontend": {
+                "serviceMatcher": {
+                    "serviceName": "kube-dns",
+                    "namespace": ns_name,
+                },
+            },
+            "redirectBackend": {
+                "localEndpointSelector": {
+                    "matchLabels": labels,
+                },
+                "toPorts": [
+                    {"port": "53", "name": "dns", "protocol": "UDP"},
+                    {"port": "53", "name": "dns-tcp", "protocol": "TCP"},
+                ],
+            },
+        },
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            parent=daemonset,
+            depends_on=[daemonset, crd_barrier],
+            custom_timeouts=pulumi.CustomTimeouts(
+                create="2m",
+                update="2m",
+                delete="2m"
+            )
+        )
+    )
+
+    return version, daemonset
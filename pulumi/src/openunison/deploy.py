@@ -1,12 +1,21 @@
 import json
 import os
 import base64
-import secrets
 import pulumi
 import pulumi_kubernetes as k8s
+import pulumi_random as random
 from pulumi_kubernetes.apiextensions import CustomResource
 from src.lib.namespace import create_namespace
+from src.lib.crd_barrier import create_crd_barrier
 from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release, get_release_name
+from src.lib.sizing import ComponentSizing, get_sizing, resources
+
+CHART_REPOSITORY = "https://nexus.tremolo.io/repository/helm"
+
+# The OpenUnison charts deployed from CHART_REPOSITORY, all sharing the same values
+CHART_NAMES = ("openunison-operator", "orchestra", "orchestra-login-portal", "orchestra-kube-oidc-proxy")
 
 def sanitize_name(name: str) -> str:
     """Ensure the name complies with DNS-1035 and RFC 1123."""
@@ -15,109 +24,62 @@ def sanitize_name(name: str) -> str:
         raise ValueError("Invalid name: resulting sanitized name is empty")
     return name
 
-def deploy_openunison(
-        depends,
-        ns_name: str,
-        version: str,
-        k8s_provider: k8s.Provider,
+def get_openunison_hosts(domain_suffix: str) -> dict:
+    """Returns the external hostnames served through OpenUnison, keyed by app."""
+    # if running inside of Github Spaces, we'll set the hosts based on the github space name
+    # if it's standalone, we'll configure based on the suffix
+    if os.getenv("GITHUB_USER"):
+        codespace_name = os.getenv("CODESPACE_NAME")
+        return {
+            "openunison": codespace_name + '-10443.app.github.dev',
+            "dashboard": codespace_name + '-11443.app.github.dev',
+            "api_server": codespace_name + '-12443.app.github.dev',
+            "kubevirt_manager": codespace_name + '-13443.app.github.dev',
+            "prometheus": codespace_name + '-14443.app.github.dev',
+            "alertmanager": codespace_name + '-15443.app.github.dev',
+            "grafana": codespace_name + '-16443.app.github.dev',
+        }
+
+    return {
+        "openunison": f"k8sou.{domain_suffix}",
+        "dashboard": f"k8sdb.{domain_suffix}",
+        "api_server": f"k8sapi.{domain_suffix}",
+        "kubevirt_manager": f"kubevirt-manager.{domain_suffix}",
+        "prometheus": f"prometheus.{domain_suffix}",
+        "alertmanager": f"alertmanager.{domain_suffix}",
+        "grafana": f"grafana.{domain_suffix}",
+    }
+
+def get_github_groups(ou_github_teams: str) -> list:
+    """Returns the sanitized group names of the comma separated GitHub teams."""
+    groups = []
+    for team in ou_github_teams.split(','):
+        team = team.strip()
+        if team.endswith('/'):
+            team = team[:-1]
+
+        groups.append(sanitize_name(team))
+    return groups
+
+def gen_helm_values(
         domain_suffix: str,
-        cluster_issuer: str,
         cert_manager_selfsigned_cert: str,
         ou_github_client_id: str,
-        ou_github_client_secret: str,
         ou_github_teams: str,
-        enabled
+        enabled,
+        sizing: ComponentSizing = None
     ):
-    kubernetes_dashboard_release = enabled["kubernetes_dashboard"]["release"]
-    ns_retain = True
-    ns_protect = False
-    ns_annotations = {}
-    ns_labels = {
-        "kubernetes.io/metadata.name": ns_name
-    }
-    namespace = create_namespace(
-        None,
-        ns_name,
-        ns_retain,
-        ns_protect,
-        k8s_provider,
-        ns_labels,
-        ns_annotations
-    )
-
-    ou_certificate = CustomResource(
-        "ou-tls-certificate",
-        api_version="cert-manager.io/v1",
-        kind="Certificate",
-        metadata=k8s.meta.v1.ObjectMetaArgs(
-            name="ou-tls-certificate",
-            namespace=ns_name,
-        ),
-        spec={
-            "secretName": "ou-tls-certificate",
-            "commonName": domain_suffix,
-            "isCA": False,
-            "dnsNames": [
-                domain_suffix,
-                f"*.{domain_suffix}"
-            ],
-            "issuerRef": {
-                "name": cluster_issuer,
-                "kind": "ClusterIssuer",
-                "group": "cert-manager.io",
-            },
-            "privateKey": {
-                "algorithm": "RSA",
-                "encoding": "PKCS1",
-                "size": 2048,
-            },
-            "usages": [
-                "server auth",
-                "client auth"
-            ]
-        },
-        opts=pulumi.ResourceOptions(
-            provider=k8s_provider,
-            parent=namespace,
-            depends_on=depends,
-            custom_timeouts=pulumi.CustomTimeouts(
-                create="5m",
-                update="10m",
-                delete="10m"
-            )
-        )
-    )
-    depends.append(ou_certificate)
-
-    ou_host = ""
-    k8sdb_host = ""
-    api_server_host = ""
-    kubevirt_manager_host = ""
-    prometheus_host = ""
-    alertmanager_host = ""
-    grafana_host = ""
-
+    sizing = sizing or get_sizing("openunison", {})
     running_in_gh_spaces = os.getenv("GITHUB_USER") or None
 
-    # if running inside of Github Spaces, we'll set the hosts based on the github space name
-    # if it's standalone, we'll configure based on the suffix
-    if running_in_gh_spaces:
-        ou_host = os.getenv("CODESPACE_NAME") + '-10443.app.github.dev'
-        k8sdb_host = os.getenv("CODESPACE_NAME") + '-11443.app.github.dev'
-        api_server_host = os.getenv("CODESPACE_NAME") + '-12443.app.github.dev'
-        kubevirt_manager_host = os.getenv("CODESPACE_NAME") + '-13443.app.github.dev'
-        prometheus_host = os.getenv("CODESPACE_NAME") + '-14443.app.github.dev'
-        alertmanager_host = os.getenv("CODESPACE_NAME") + '-15443.app.github.dev'
-        grafana_host = os.getenv("CODESPACE_NAME") + '-16443.app.github.dev'
-    else:
-        ou_host = f"k8sou.{domain_suffix}"
-        k8sdb_host = f"k8sdb.{domain_suffix}"
-        api_server_host = f"k8sapi.{domain_suffix}"
-        kubevirt_manager_host = f"kubevirt-manager.{domain_suffix}"
-        prometheus_host = f"prometheus.{domain_suffix}"
-        alertmanager_host = f"alertmanager.{domain_suffix}"
-        grafana_host = f"grafana.{domain_suffix}"
-
+    hosts = get_openunison_hosts(domain_suffix)
+    ou_host = hosts["openunison"]
+    k8sdb_host = hosts["dashboard"]
+    api_server_host = hosts["api_server"]
+    kubevirt_manager_host = hosts["kubevirt_manager"]
+    prometheus_host = hosts["prometheus"]
+    alertmanager_host = hosts["alertmanager"]
+    grafana_host = hosts["grafana"]
 
     ou_helm_values = {
         "enable_wait_for_job": True,
@@ -194,7 +156,9 @@ def deploy_openunison(
             "node_selectors": []
         },
         "openunison": {
-        "replicas": 1,
+        "replicas": sizing["replicas"],
+        "resources": resources(sizing),
+        "pdb": {"enabled": sizing["pdb"], "min_available": 1},
         "non_secret_data": {
             "K8S_DB_SSO": "oidc",
             "PROMETHEUS_SERVICE_ACCOUNT": "system:serviceaccount:monitoring:prometheus-k8s",
@@ -207,6 +171,9 @@ def deploy_openunison(
         }
     }
 
+    if sizing["priority_class"]:
+        ou_helm_values["openunison"]["priority_class_name"] = sizing["priority_class"]
+
     if not running_in_gh_spaces:
         ou_helm_values["trusted_certs"].append(
             {
@@ -215,24 +182,7 @@ def deploy_openunison(
             }
         )
 
-    # now that OpenUnison is deployed, we'll make ClusterAdmins of all the groups specified in openunison.github.teams
-    github_teams = ou_github_teams.split(',')
-    subjects = []
-    az_groups = []
-    for team in github_teams:
-        team = team.strip()
-        if team.endswith('/'):
-            team = team[:-1]
-
-        team = sanitize_name(team)
-
-        subject = k8s.rbac.v1.SubjectArgs(
-            kind="Group",
-            api_group="rbac.authorization.k8s.io",
-            name=team
-        )
-        subjects.append(subject)
-        az_groups.append(team)
+    az_groups = get_github_groups(ou_github_teams)
 
     # Retrieve encoded icon assets
     from src.openunison.encoded_assets import return_encoded_assets
@@ -302,10 +252,119 @@ def deploy_openunison(
             }
         )
 
-    ou_helm_values["dashboard"]["service_name"] = kubernetes_dashboard_release.name.apply(lambda name: sanitize_name(name))
-    ou_helm_values["dashboard"]["auth_service_name"] = kubernetes_dashboard_release.name.apply(lambda name: sanitize_name(name + '-auth'))
-    ou_helm_values["dashboard"]["api_service_name"] = kubernetes_dashboard_release.name.apply(lambda name: sanitize_name(name + '-api'))
-    ou_helm_values["dashboard"]["web_service_name"] = kubernetes_dashboard_release.name.apply(lambda name: sanitize_name(name + '-web'))
+    return ou_helm_values
+
+def deploy_openunison(
+        depends,
+        ns_name: str,
+        version: str,
+        k8s_provider: k8s.Provider,
+        domain_suffix: str,
+        cluster_issuer: str,
+        cert_manager_selfsigned_cert: str,
+        ou_github_client_id: str,
+        ou_github_client_secret: str,
+        ou_github_teams: str,
+        enabled,
+        kubernetes_dashboard_release,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None,
+        sizing: ComponentSizing = None
+    ):
+    ns_retain = True
+    ns_protect = False
+    ns_annotations = {}
+    ns_labels = {
+        "kubernetes.io/metadata.name": ns_name
+    }
+    namespace = create_namespace(
+        None,
+        ns_name,
+        ns_retain,
+        ns_protect,
+        k8s_provider,
+        ns_labels,
+        ns_annotations
+    )
+
+    # Wait for the cert-manager Certificate CRD to be served before requesting the certificate
+    crd_barrier = create_crd_barrier(
+        "openunison-crds",
+        ["certificates.cert-manager.io"],
+        depends_on=depends,
+        parent=namespace
+    )
+
+    ou_certificate = CustomResource(
+        "ou-tls-certificate",
+        api_version="cert-manager.io/v1",
+        kind="Certificate",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="ou-tls-certificate",
+            namespace=ns_name,
+        ),
+        spec={
+            "secretName": "ou-tls-certificate",
+            "commonName": domain_suffix,
+            "isCA": False,
+            "dnsNames": [
+                domain_suffix,
+                f"*.{domain_suffix}"
+            ],
+            "issuerRef": {
+                "name": cluster_issuer,
+                "kind": "ClusterIssuer",
+                "group": "cert-manager.io",
+            },
+            "privateKey": {
+                "algorithm": "RSA",
+                "encoding": "PKCS1",
+                "size": 2048,
+            },
+            "usages": [
+                "server auth",
+                "client auth"
+            ]
+        },
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            parent=namespace,
+            depends_on=depends + [crd_barrier],
+            custom_timeouts=pulumi.CustomTimeouts(
+                create="5m",
+                update="10m",
+                delete="10m"
+            )
+        )
+    )
+    depends.append(ou_certificate)
+
+    running_in_gh_spaces = os.getenv("GITHUB_USER") or None
+
+    ou_helm_values = gen_helm_values(
+        domain_suffix,
+        cert_manager_selfsigned_cert,
+        ou_github_client_id,
+        ou_github_teams,
+        enabled,
+        sizing
+    )
+
+    # now that OpenUnison is deployed, we'll make ClusterAdmins of all the groups specified in openunison.github.teams
+    subjects = [
+        k8s.rbac.v1.SubjectArgs(
+            kind="Group",
+            api_group="rbac.authorization.k8s.io",
+            name=team
+        )
+        for team in get_github_groups(ou_github_teams)
+    ]
+
+    kubernetes_dashboard_release_name = get_release_name(kubernetes_dashboard_release)
+    ou_helm_values["dashboard"]["service_name"] = kubernetes_dashboard_release_name.apply(lambda name: sanitize_name(name))
+    ou_helm_values["dashboard"]["auth_service_name"] = kubernetes_dashboard_release_name.apply(lambda name: sanitize_name(name + '-auth'))
+    ou_helm_values["dashboard"]["api_service_name"] = kubernetes_dashboard_release_name.apply(lambda name: sanitize_name(name + '-api'))
+    ou_helm_values["dashboard"]["web_service_name"] = kubernetes_dashboard_release_name.apply(lambda name: sanitize_name(name + '-web'))
 
 
     # Apply function to wait for the dashboard release names before proceeding
@@ -313,32 +372,30 @@ def deploy_openunison(
         return ou_helm_values
 
 
-    orchesrta_login_portal_helm_values = kubernetes_dashboard_release.name.apply(lambda _: wait_for_dashboard_release_names())
+    orchesrta_login_portal_helm_values = kubernetes_dashboard_release_name.apply(lambda _: wait_for_dashboard_release_names())
 
     # Fetch the latest version from the helm chart index
     chart_name = "openunison-operator"
     chart_index_path = "index.yaml"
-    chart_url = "https://nexus.tremolo.io/repository/helm"
+    chart_url = CHART_REPOSITORY
     chart_index_url = f"{chart_url}/{chart_index_path}"
     if version is None:
-        version = get_latest_helm_chart_version(chart_index_url, chart_name)
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_index_url, chart_name))
         pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
     else:
         pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
 
     # Create Helm release
-    operator_release = k8s.helm.v3.Release(
+    operator_release = create_helm_release(
         'openunison-operator',
-        k8s.helm.v3.ReleaseArgs(
-            chart=chart_name,
-            version=version,
-            values=orchesrta_login_portal_helm_values,
-            namespace=ns_name,
-            skip_await=False,
-            repository_opts=k8s.helm.v3.RepositoryOptsArgs(
-                repo=chart_url
-            ),
-        ),
+        chart=chart_name,
+        version=version,
+        values=orchesrta_login_portal_helm_values,
+        namespace=ns_name,
+        skip_await=False,
+        repository=chart_url,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             provider=k8s_provider,
             parent=namespace,
@@ -351,14 +408,29 @@ def deploy_openunison(
         )
     )
 
+    # Generate the orchestra secrets once and keep them in stack state, so that
+    # repeated runs do not rotate them and roll out the OpenUnison pods
+    k8s_db_secret = random.RandomPassword(
+        "orchestra-k8s-db-secret",
+        length=64,
+        special=False,
+        opts=pulumi.ResourceOptions(parent=namespace)
+    )
+    unison_keystore_password = random.RandomPassword(
+        "orchestra-unison-keystore-password",
+        length=64,
+        special=False,
+        opts=pulumi.ResourceOptions(parent=namespace)
+    )
+
     raw_secret_data = {
-        "K8S_DB_SECRET": secrets.token_urlsafe(64),
-        "unisonKeystorePassword": secrets.token_urlsafe(64),
+        "K8S_DB_SECRET": k8s_db_secret.result,
+        "unisonKeystorePassword": unison_keystore_password.result,
         "GITHUB_SECRET_ID": ou_github_client_secret
     }
 
     encoded_secret_data = {
-        key: base64.b64encode(value.encode('utf-8')).decode('utf-8')
+        key: pulumi.Output.from_input(value).apply(lambda v: base64.b64encode(v.encode('utf-8')).decode('utf-8'))
             for key, value in raw_secret_data.items()
     }
 
@@ -378,7 +450,6 @@ def deploy_openunison(
             parent=operator_release,
             provider = k8s_provider,
             retain_on_delete=False,
-            delete_before_replace=True,
             custom_timeouts=pulumi.CustomTimeouts(
                 create="10m",
                 update="10m",
@@ -388,20 +459,18 @@ def deploy_openunison(
     )
 
     orchestra_chart_name = 'orchestra'
-    orchestra_chart_version = get_latest_helm_chart_version(chart_index_url, orchestra_chart_name)
-    ou_orchestra_release = k8s.helm.v3.Release(
+    orchestra_chart_version = resolve_latest_version(orchestra_chart_name, lambda: get_latest_helm_chart_version(chart_index_url, orchestra_chart_name))
+    ou_orchestra_release = create_helm_release(
         'orchestra',
-        k8s.helm.v3.ReleaseArgs(
-            chart=orchestra_chart_name,
-            version=orchestra_chart_version,
-            values=ou_helm_values,
-            namespace=ns_name,
-            skip_await=False,
-            wait_for_jobs=True,
-            repository_opts= k8s.helm.v3.RepositoryOptsArgs(
-                repo=chart_url
-            ),
-        ),
+        chart=orchestra_chart_name,
+        version=orchestra_chart_version,
+        values=ou_helm_values,
+        namespace=ns_name,
+        skip_await=False,
+        wait_for_jobs=True,
+        repository=chart_url,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             parent=operator_release,
             depends_on=[operator_release, orchestra_secret_source],
@@ -414,7 +483,7 @@ def deploy_openunison(
         )
     )
 
-    ou_orchestra_release_name = ou_orchestra_release.name.apply(lambda name: name)
+    ou_orchestra_release_name = get_release_name(ou_orchestra_release)
 
     def update_values(name):
         return {
@@ -429,20 +498,18 @@ def deploy_openunison(
     updated_values = ou_orchestra_release_name.apply(update_values)
 
     orchestra_login_portal_chart_name = 'orchestra-login-portal'
-    orchestra_login_portal_chart_version = get_latest_helm_chart_version(chart_index_url,orchestra_login_portal_chart_name)
-    ou_orchestra_login_portal_release = k8s.helm.v3.Release(
+    orchestra_login_portal_chart_version = resolve_latest_version(orchestra_login_portal_chart_name, lambda: get_latest_helm_chart_version(chart_index_url, orchestra_login_portal_chart_name))
+    ou_orchestra_login_portal_release = create_helm_release(
         'orchestra-login-portal',
-        k8s.helm.v3.ReleaseArgs(
-            chart=orchestra_login_portal_chart_name,
-            version=orchestra_login_portal_chart_version,
-            values=updated_values,
-            namespace=ns_name,
-            skip_await=False,
-            wait_for_jobs=True,
-            repository_opts= k8s.helm.v3.RepositoryOptsArgs(
-                repo=chart_url
-            ),
-        ),
+        chart=orchestra_login_portal_chart_name,
+        version=orchestra_login_portal_chart_version,
+        values=updated_values,
+        namespace=ns_name,
+        skip_await=False,
+        wait_for_jobs=True,
+        repository=chart_url,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             provider = k8s_provider,
             parent=ou_orchestra_release,
@@ -459,21 +526,19 @@ def deploy_openunison(
     proxy_name = sanitize_name('proxy')
 
     orchestra_kube_oidc_proxy_chart_name = 'orchestra-kube-oidc-proxy'
-    orchestra_kube_oidc_proxy_chart_version = get_latest_helm_chart_version(chart_index_url, orchestra_kube_oidc_proxy_chart_name)
+    orchestra_kube_oidc_proxy_chart_version = resolve_latest_version(orchestra_kube_oidc_proxy_chart_name, lambda: get_latest_helm_chart_version(chart_index_url, orchestra_kube_oidc_proxy_chart_name))
 
-    ou_kube_oidc_proxy_release = k8s.helm.v3.Release(
+    ou_kube_oidc_proxy_release = create_helm_release(
         proxy_name,
-        k8s.helm.v3.ReleaseArgs(
-            chart=orchestra_kube_oidc_proxy_chart_name,
-            namespace=ns_name,
-            values=orchesrta_login_portal_helm_values,
-            version=orchestra_kube_oidc_proxy_chart_version,
-            skip_await=False,
-            wait_for_jobs=True,
-            repository_opts= k8s.helm.v3.RepositoryOptsArgs(
-                repo=chart_url
-            ),
-        ),
+        chart=orchestra_kube_oidc_proxy_chart_name,
+        namespace=ns_name,
+        values=orchesrta_login_portal_helm_values,
+        version=orchestra_kube_oidc_proxy_chart_version,
+        skip_await=False,
+        wait_for_jobs=True,
+        repository=chart_url,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             provider = k8s_provider,
             parent=ou_orchestra_login_portal_release,
@@ -486,7 +551,7 @@ def deploy_openunison(
         )
     )
 
-    deploy_kargo_helm(running_in_gh_spaces=running_in_gh_spaces,ou_orchestra_release=ou_orchestra_release,k8s_provider=k8s_provider)
+    deploy_kargo_helm(running_in_gh_spaces=running_in_gh_spaces,ou_orchestra_release=ou_orchestra_release,k8s_provider=k8s_provider,helm_engine=helm_engine,helm_timeouts=helm_timeouts)
     cluster_admin_cluster_role_binding = k8s.rbac.v1.ClusterRoleBinding(
         "clusteradmin-clusterrolebinding",
         metadata=k8s.meta.v1.ObjectMetaArgs(
@@ -513,23 +578,22 @@ def deploy_openunison(
 
 
 
-def deploy_kargo_helm(running_in_gh_spaces: bool,ou_orchestra_release,k8s_provider: k8s.Provider):
+def deploy_kargo_helm(running_in_gh_spaces: bool,ou_orchestra_release,k8s_provider: k8s.Provider,helm_engine: str = "release",helm_timeouts: dict = None):
     kargo_values = {
         "in_github_codespace": running_in_gh_spaces,
-        "orchestra_service_name": ou_orchestra_release.name.apply(lambda name: sanitize_name('openunison-' + name))
+        "orchestra_service_name": get_release_name(ou_orchestra_release).apply(lambda name: sanitize_name('openunison-' + name))
     }
 
     chart_name = "kargo-openunison"
-    kargo_openunison_release = k8s.helm.v3.Release(
+    kargo_openunison_release = create_helm_release(
         'kargo-openunison',
-        k8s.helm.v3.ReleaseArgs(
-            chart='src/helm/openunison-kargo',
-
-            namespace='openunison',
-            skip_await=False,
-
-            values=kargo_values,
-        ),
+        chart='src/helm/openunison-kargo',
+        version=None,
+        namespace='openunison',
+        skip_await=False,
+        values=kargo_values,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             provider = k8s_provider,
             depends_on=[ou_orchestra_release],
@@ -0,0 +1,60 @@
+import pulumi
+import pulumi_kubernetes as k8s
+from src.lib.priority import PRIORITY_CLASS_CRITICAL, PRIORITY_CLASS_PLATFORM, PRIORITY_CLASS_TENANT_VM
+
+# Values stay below the system-* (2000000000+) and kubevirt-cluster-critical (1000000000) classes
+PRIORITY_CLASSES = {
+    PRIORITY_CLASS_CRITICAL: {
+        "value": 100000000,
+        "preemption_policy": "PreemptLowerPriority",
+        "description": "Kargo platform components the cluster depends on, such as certificates, storage and secondary networks.",
+    },
+    PRIORITY_CLASS_PLATFORM: {
+        "value": 10000000,
+        "preemption_policy": "PreemptLowerPriority",
+        "description": "Kargo platform services, such as monitoring, ingress and dashboards.",
+    },
+    PRIORITY_CLASS_TENANT_VM: {
+        "value": 1000000,
+        "preemption_policy": "Never",
+        "description": "Tenant virtual machines, scheduled ahead of ordinary pods but never preempting other workloads.",
+    },
+}
+
+def deploy_priority_classes(
+        depends: pulumi.Input[list],
+        k8s_provider: k8s.Provider
+    ):
+    """
+    Deploys the Kargo PriorityClasses.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+
+    Returns:
+        list: The PriorityClass resources.
+    """
+    priority_classes = []
+    for name, spec in PRIORITY_CLASSES.items():
+        priority_classes.append(k8s.scheduling.v1.PriorityClass(
+            f"priority-class-{name}",
+            metadata=k8s.meta.v1.ObjectMetaArgs(
+                name=name,
+                labels={"ccio.v1/app": "kargo"},
+            ),
+            value=spec["value"],
+            global_default=False,
+            preemption_policy=spec["preemption_policy"],
+            description=spec["description"],
+            opts=pulumi.ResourceOptions(
+                provider=k8s_provider,
+                depends_on=depends,
+                custom_timeouts=pulumi.CustomTimeouts(
+                    create="1m",
+                    update="1m",
+                    delete="1m"
+                )
+            )
+        ))
+    return priority_classes
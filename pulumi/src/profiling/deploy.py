@@ -0,0 +1,255 @@
+import json
+import pulumi
+import pulumi_kubernetes as k8s
+from src.lib.namespace import create_namespace
+from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+
+CHART_NAME = "pyroscope"
+CHART_REPOSITORY = "https://grafana.github.io/helm-charts"
+
+PYROSCOPE_PORT = 4040
+
+# Go pprof profiles Alloy scrapes from annotated pods, CPU profiles come from eBPF
+PPROF_PROFILES = ("memory", "goroutine", "block", "mutex")
+
+def get_pyroscope_url(ns_name: str) -> str:
+    """Returns the in-cluster URL of the Pyroscope service, named by fullnameOverride."""
+    return f"http://{CHART_NAME}.{ns_name}.svc:{PYROSCOPE_PORT}"
+
+def deploy_profiling(
+        depends: pulumi.Input[list],
+        ns_name: str,
+        version: str,
+        namespaces: list,
+        prometheus_enabled: bool,
+        k8s_provider: k8s.Provider,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None
+    ):
+    """
+    Deploys Pyroscope and a Grafana Alloy DaemonSet profiling the Kargo namespaces.
+
+    Alloy records eBPF CPU profiles of every container in the Kargo namespaces, e.g.
+    cilium-agent, virt-handler, cert-manager and the OpenUnison JVM, without changes
+    to the workloads. Pods exposing Go pprof endpoints also get memory, goroutine,
+    block and mutex profiles when annotated with profiles.grafana.com/<profile>.scrape
+    and profiles.grafana.com/<profile>.port. With Prometheus enabled, Pyroscope is
+    added to Grafana as a data source.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on.
+        ns_name (str): The namespace of Pyroscope and Alloy.
+        version (str): The Pyroscope chart version, or None for the latest.
+        namespaces (list): The namespaces to profile.
+        prometheus_enabled (bool): Whether to add the Grafana data source.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+        helm_engine (str): The Helm engine, see src/lib/helm_release.get_helm_engine.
+        helm_timeouts (dict): Helm release timeout overrides.
+
+    Returns:
+        tuple: The Pyroscope chart version and release.
+    """
+    # Alloy runs privileged with the host PID namespace for eBPF
+    namespace = create_namespace(
+        depends,
+        ns_name,
+        False,
+        False,
+        k8s_provider,
+        custom_labels={"pod-security.kubernetes.io/enforce": "privileged"},
+        custom_annotations={}
+    )
+
+    chart_name = CHART_NAME
+    chart_url = CHART_REPOSITORY
+    if version is None:
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(f"{chart_url}/index.yaml", chart_name))
+        version = version.lstrip("v")
+        pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
+    else:
+        pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
+
+    pyroscope_url = get_pyroscope_url(ns_name)
+    release = create_helm_release(
+        CHART_NAME,
+        chart=chart_name,
+        version=version,
+        namespace=ns_name,
+        skip_await=False,
+        repository=chart_url,
+        values=gen_helm_values(namespaces, pyroscope_url),
+        engine=helm_engine,
+        timeouts=helm_timeouts,
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            parent=namespace,
+            depends_on=[namespace],
+            custom_timeouts=pulumi.CustomTimeouts(
+                create="10m",
+                update="10m",
+                delete="5m"
+            )
+        )
+    )
+
+    # The kube-prometheus-stack Grafana sidecar loads data sources labelled grafana_datasource
+    if prometheus_enabled:
+        k8s.core.v1.ConfigMap(
+            "profiling-grafana-datasource",
+            metadata=k8s.meta.v1.ObjectMetaArgs(
+                name="pyroscope-datasource",
+                namespace="monitoring",
+                labels={"grafana_datasource": "1"},
+            ),
+            data={
+                "pyroscope-datasource.yaml": gen_grafana_datasource(pyroscope_url),
+            },
+            opts=pulumi.ResourceOptions(
+                provider=k8s_provider,
+                parent=release,
+                depends_on=depends + [release],
+            )
+        )
+
+    return version, release
+
+def gen_helm_values(namespaces: list, pyroscope_url: str) -> dict:
+    return {
+        "fullnameOverride": CHART_NAME,
+        "alloy": {
+            "enabled": True,
+            # One Alloy per node, eBPF only sees the processes of its own node
+            "controller": {
+                "type": "daemonset",
+                "hostPID": True,
+            },
+            "alloy": {
+                "configMap": {
+                    "create": True,
+                    "content": gen_alloy_config(namespaces, pyroscope_url),
+                },
+                "clustering": {
+                    "enabled": False,
+                },
+                "securityContext": {
+                    "privileged": True,
+                    "runAsUser": 0,
+                    "runAsGroup": 0,
+                },
+                "extraEnv": [{
+                    "name": "NODE_NAME",
+                    "valueFrom": {"fieldRef": {"fieldPath": "spec.nodeName"}},
+                }],
+            },
+        },
+    }
+
+def gen_grafana_datasource(pyroscope_url: str) -> str:
+    return json.dumps({
+        "apiVersion": 1,
+        "datasources": [{
+            "name": "Pyroscope",
+            "uid": "pyroscope",
+            "type": "grafana-pyroscope-datasource",
+            "access": "proxy",
+            "url": pyroscope_url,
+            "editable": False,
+        }],
+    }, indent=2)
+
+def _gen_pprof_scrape(profile: str) -> str:
+    # Scrapes one pprof profile from the pods annotated with profiles.grafana.com/<profile>.scrape
+    profiles = "\n".join(
+        f"    profile.{name} {{ enabled = {'true' if name == profile else 'false'} }}"
+        for name in ("process_cpu",) + PPROF_PROFILES
+    )
+    return f'''
+discovery.relabel "pprof_{profile}" {{
+  targets = discovery.relabel.local_pods.output
+  rule {{
+    source_labels = ["__meta_kubernetes_pod_annotation_profiles_grafana_com_{profile}_scrape"]
+    regex = "true"
+    action = "keep"
+  }}
+  rule {{
+    source_labels = ["__meta_kubernetes_pod_ip", "__meta_kubernetes_pod_annotation_profiles_grafana_com_{profile}_port"]
+    separator = ":"
+    target_label = "__address__"
+  }}
+}}
+
+pyroscope.scrape "pprof_{profile}" {{
+  targets = discovery.relabel.pprof_{profile}.output
+  forward_to = [pyroscope.write.pyroscope.receiver]
+  profiling_config {{
+{profiles}
+  }}
+}}
+'''
+
+def gen_alloy_config(namespaces: list, pyroscope_url: str) -> str:
+    """
+    Generates the Alloy configuration profiling the pods of some namespaces on its node.
+
+    Args:
+        namespaces (list): The namespaces to profile.
+        pyroscope_url (str): The Pyroscope URL to send the profiles to.
+
+    Returns:
+        str: The Alloy configuration.
+    """
+    pprof_scrapes = "".join(_gen_pprof_scrape(profile) for profile in PPROF_PROFILES)
+    return f'''discovery.kubernetes "pods" {{
+  role = "pod"
+  namespaces {{
+    names = {json.dumps(namespaces)}
+  }}
+  selectors {{
+    role = "pod"
+    field = "spec.nodeName=" + sys.env("NODE_NAME")
+  }}
+}}
+
+discovery.relabel "local_pods" {{
+  targets = discovery.kubernetes.pods.targets
+  rule {{
+    source_labels = ["__meta_kubernetes_pod_phase"]
+    regex = "Succeeded|Failed"
+    action = "drop"
+  }}
+  rule {{
+    source_labels = ["__meta_kubernetes_namespace"]
+    target_label = "namespace"
+  }}
+  rule {{
+    source_labels = ["__meta_kubernetes_pod_name"]
+    target_label = "pod"
+  }}
+  rule {{
+    source_labels = ["__meta_kubernetes_pod_container_name"]
+    target_label = "container"
+  }}
+  rule {{
+    source_labels = ["__meta_kubernetes_namespace", "__meta_kubernetes_pod_container_name"]
+    separator = "/"
+    target_label = "service_name"
+  }}
+  rule {{
+    source_labels = ["__meta_kubernetes_pod_node_name"]
+    target_label = "node"
+  }}
+}}
+
+pyroscope.ebpf "cpu" {{
+  targets = discovery.relabel.local_pods.output
+  forward_to = [pyroscope.write.pyroscope.receiver]
+}}
+{pprof_scrapes}
+pyroscope.write "pyroscope" {{
+  endpoint {{
+    url = "{pyroscope_url}"
+  }}
+}}
+'''
@@ -2,13 +2,22 @@ import pulumi
 import pulumi_kubernetes as k8s
 from src.lib.namespace import create_namespace
 from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+from src.lib.sizing import ComponentSizing, get_sizing, resources
+
+CHART_NAME = "kube-prometheus-stack"
+CHART_REPOSITORY = "https://prometheus-community.github.io/helm-charts"
 
 def deploy_prometheus(
         depends: pulumi.Input[list],
         ns_name: str,
         version: str,
         k8s_provider: k8s.Provider,
-        openunison_enabled: bool
+        openunison_enabled: bool,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None,
+        sizing: ComponentSizing = None
     ):
 
     # Create the monitoring Namespace
@@ -31,49 +40,29 @@ def deploy_prometheus(
         ns_annotations
     )
 
-    prometheus_helm_values = {}
-    if openunison_enabled:
-        prometheus_helm_values = {
-            "grafana": {
-                "grafana.ini": {
-                    "users": {
-                        "allow_sign_up": False,
-                        "auto_assign_org": True,
-                        "auto_assign_org_role": "Admin"
-                    },
-                    "auth.proxy": {
-                        "enabled": True,
-                        "header_name": "X-WEBAUTH-USER",
-                        "auto_sign_up": True,
-                        "headers": "Groups:X-WEBAUTH-GROUPS"
-                    }
-                }
-            }
-        }
+    prometheus_helm_values = gen_helm_values(openunison_enabled, sizing)
 
     # Fetch the latest version from the helm chart index
-    chart_name = "kube-prometheus-stack"
+    chart_name = CHART_NAME
     chart_index_path = "index.yaml"
-    chart_url = "https://prometheus-community.github.io/helm-charts"
+    chart_url = CHART_REPOSITORY
     if version is None:
         chart_index_url = f"{chart_url}/{chart_index_path}"
-        version = get_latest_helm_chart_version(chart_index_url, chart_name)
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(chart_index_url, chart_name))
         pulumi.log.info(f"Setting helm release version to latest stable: {chart_name}/{version}")
     else:
         pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
 
-    release = k8s.helm.v3.Release(
+    release = create_helm_release(
         'helm-release-prometheus',
-        k8s.helm.v3.ReleaseArgs(
-            chart=chart_name,
-            version=version,
-            values=prometheus_helm_values,
-            namespace='monitoring',
-            skip_await=False,
-            repository_opts= k8s.helm.v3.RepositoryOptsArgs(
-                repo=chart_url
-            ),
-        ),
+        chart=chart_name,
+        version=version,
+        values=prometheus_helm_values,
+        namespace='monitoring',
+        skip_await=False,
+        repository=chart_url,
+        engine=helm_engine,
+        timeouts=helm_timeouts,
         opts=pulumi.ResourceOptions(
             provider = k8s_provider,
             parent=namespace,
@@ -191,3 +180,44 @@ def deploy_prometheus(
     )
 
     return version, release
+
+def gen_helm_values(openunison_enabled: bool, sizing: ComponentSizing = None):
+    # The sizing applies to Prometheus and Alertmanager, Grafana needs a shared database to scale out
+    sizing = sizing or get_sizing("prometheus", {})
+    pdb = {"enabled": sizing["pdb"], "minAvailable": 1}
+    helm_values = {
+        "prometheus": {
+            "prometheusSpec": {
+                "replicas": sizing["replicas"],
+                "resources": resources(sizing),
+            },
+            "podDisruptionBudget": pdb,
+        },
+        "alertmanager": {
+            "alertmanagerSpec": {
+                "replicas": sizing["replicas"],
+            },
+            "podDisruptionBudget": pdb,
+        },
+    }
+
+    if sizing["priority_class"]:
+        helm_values["prometheus"]["prometheusSpec"]["priorityClassName"] = sizing["priority_class"]
+        helm_values["alertmanager"]["alertmanagerSpec"]["priorityClassName"] = sizing["priority_class"]
+        helm_values["grafana"] = {"priorityClassName": sizing["priority_class"]}
+
+    if openunison_enabled:
+        helm_values.setdefault("grafana", {})["grafana.ini"] = {
+            "users": {
+                "allow_sign_up": False,
+                "auto_assign_org": True,
+                "auto_assign_org_role": "Admin"
+            },
+            "auth.proxy": {
+                "enabled": True,
+                "header_name": "X-WEBAUTH-USER",
+                "auto_sign_up": True,
+                "headers": "Groups:X-WEBAUTH-GROUPS"
+            }
+        }
+    return helm_values
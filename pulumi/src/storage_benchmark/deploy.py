@@ -0,0 +1,217 @@
+import json
+import pulumi
+import pulumi_kubernetes as k8s
+from src.lib.namespace import create_namespace
+from src.lib.benchmark import RESULT_MARKER, run_benchmark_job
+
+DEFAULT_IMAGE = "docker.io/library/alpine:3.20"
+DEFAULT_VOLUME_SIZE = "4Gi"
+DEFAULT_FILE_SIZE = "2G"
+DEFAULT_RUNTIME = 30
+
+VOLUME_MODES = ("Filesystem", "Block")
+
+# Volume modes of the Kargo storage classes, other classes are benchmarked in both modes
+STORAGE_CLASS_VOLUME_MODES = {
+    "ssd": ["Filesystem"],
+    "local-path": ["Filesystem"],
+}
+
+# fio tests as (result key, data direction, fio arguments). Writes run first, so
+# reads are served from written blocks rather than from unallocated space.
+FIO_TESTS = [
+    ("seq_write", "write", "--rw=write --bs=1M --iodepth=16"),
+    ("seq_read", "read", "--rw=read --bs=1M --iodepth=16"),
+    ("rand_write", "write", "--rw=randwrite --bs=4k --iodepth=32"),
+    ("rand_read", "read", "--rw=randread --bs=4k --iodepth=32"),
+]
+
+# Summary of one fio job: bandwidth in MiB/s, IOPS and completion latency percentiles in ms
+FIO_SUMMARY = (
+    '.jobs[0][$dir] | {'
+    'bandwidth_mib: (.bw / 1024), '
+    'iops: .iops, '
+    'latency_ms: {'
+    'p50: (.clat_ns.percentile["50.000000"] / 1000000), '
+    'p99: (.clat_ns.percentile["99.000000"] / 1000000), '
+    'p999: (.clat_ns.percentile["99.900000"] / 1000000)'
+    '}}'
+)
+
+def get_storage_classes(config_storage_benchmark: dict, default_classes: list) -> list:
+    """
+    Resolves the storage classes and volume modes to benchmark.
+
+    Args:
+        config_storage_benchmark (dict): The storage_benchmark module configuration object.
+        default_classes (list): The storage classes of the enabled modules.
+
+    Returns:
+        list: Tuples of storage class name and volume modes.
+
+    Raises:
+        ValueError: If a volume mode is not valid.
+    """
+    storage_classes = []
+    for entry in config_storage_benchmark.get("storage_classes") or default_classes:
+        if isinstance(entry, str):
+            entry = {"name": entry}
+        volume_modes = entry.get("volume_modes") or STORAGE_CLASS_VOLUME_MODES.get(entry["name"]) or list(VOLUME_MODES)
+        for volume_mode in volume_modes:
+            if volume_mode not in VOLUME_MODES:
+                raise ValueError(f"Unsupported volume mode '{volume_mode}' for storage class '{entry['name']}', expected one of: {', '.join(VOLUME_MODES)}")
+        storage_classes.append((entry["name"], volume_modes))
+    return storage_classes
+
+def gen_fio_script(target: str, file_size: str, runtime: int) -> str:
+    """
+    Generates the benchmark script, printing one fio summary per test.
+
+    Args:
+        target (str): The file or block device to benchmark.
+        file_size (str): The fio file size, or the size of the device region to use.
+        runtime (int): The runtime of each test, in seconds.
+
+    Returns:
+        str: The shell script.
+    """
+    lines = [
+        "set -euo pipefail",
+        "apk add --no-cache fio jq >/dev/null",
+    ]
+    for key, direction, args in FIO_TESTS:
+        lines.append(
+            f"result=$(fio --name={key} --filename={target} --size={file_size} --direct=1 --ioengine=libaio "
+            f"--time_based --runtime={runtime} --ramp_time=5 --group_reporting --output-format=json {args} "
+            f"| jq -c --arg dir {direction} '{FIO_SUMMARY}')"
+        )
+        lines.append(f'echo "{RESULT_MARKER} {key} $result"')
+    return "\n".join(lines) + "\n"
+
+def deploy_storage_benchmark(
+        depends: pulumi.Input[list],
+        ns_name: str,
+        run_id: str,
+        storage_classes: list,
+        image: str,
+        volume_size: str,
+        file_size: str,
+        runtime: int,
+        k8s_provider: k8s.Provider
+    ):
+    """
+    Runs fio against a PVC of each storage class and volume mode, one benchmark at a time.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on, including the storage provisioners.
+        ns_name (str): The benchmark namespace.
+        run_id (str): The benchmark run id, changing it runs the benchmarks again.
+        storage_classes (list): Tuples of storage class name and volume modes, see get_storage_classes.
+        image (str): The benchmark container image, or None for DEFAULT_IMAGE. fio and jq are installed with apk.
+        volume_size (str): The PVC size, or None for DEFAULT_VOLUME_SIZE.
+        file_size (str): The fio file size, or None for DEFAULT_FILE_SIZE.
+        runtime (int): The runtime of each fio test in seconds, or None for DEFAULT_RUNTIME.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+
+    Returns:
+        tuple: The results ConfigMap, holding one results.json per storage class and volume mode.
+    """
+    image = image or DEFAULT_IMAGE
+    volume_size = volume_size or DEFAULT_VOLUME_SIZE
+    file_size = file_size or DEFAULT_FILE_SIZE
+    runtime = int(runtime or DEFAULT_RUNTIME)
+
+    namespace = create_namespace(
+        None,
+        ns_name,
+        False,
+        False,
+        k8s_provider,
+        custom_labels={},
+        custom_annotations={}
+    )
+
+    results = {}
+    previous = depends + [namespace]
+    for storage_class, volume_modes in storage_classes:
+        for volume_mode in volume_modes:
+            name = f"storage-benchmark-{storage_class}-{volume_mode.lower()}"
+
+            # WaitForFirstConsumer classes only bind the claim once the Job pod is scheduled
+            pvc = k8s.core.v1.PersistentVolumeClaim(
+                name,
+                metadata=k8s.meta.v1.ObjectMetaArgs(
+                    name=name,
+                    namespace=ns_name,
+                    annotations={"pulumi.com/skipAwait": "true"},
+                ),
+                spec=k8s.core.v1.PersistentVolumeClaimSpecArgs(
+                    access_modes=["ReadWriteOnce"],
+                    storage_class_name=storage_class,
+                    volume_mode=volume_mode,
+                    resources=k8s.core.v1.VolumeResourceRequirementsArgs(
+                        requests={"storage": volume_size},
+                    ),
+                ),
+                opts=pulumi.ResourceOptions(
+                    provider=k8s_provider,
+                    parent=namespace,
+                    depends_on=previous,
+                )
+            )
+
+            container = {
+                "name": "fio",
+                "image": image,
+                "command": ["/bin/sh", "-c"],
+                "resources": k8s.core.v1.ResourceRequirementsArgs(
+                    requests={"cpu": "1", "memory": "512Mi"},
+                    limits={"cpu": "2", "memory": "1Gi"},
+                ),
+            }
+            if volume_mode == "Block":
+                container["args"] = [gen_fio_script("/dev/benchmark", file_size, runtime)]
+                container["volume_devices"] = [k8s.core.v1.VolumeDeviceArgs(name="benchmark", device_path="/dev/benchmark")]
+            else:
+                container["args"] = [gen_fio_script("/benchmark/fio.dat", file_size, runtime)]
+                container["volume_mounts"] = [k8s.core.v1.VolumeMountArgs(name="benchmark", mount_path="/benchmark")]
+
+            _, benchmark_results = run_benchmark_job(
+                name,
+                ns_name,
+                run_id,
+                k8s.core.v1.PodSpecArgs(
+                    restart_policy="Never",
+                    containers=[k8s.core.v1.ContainerArgs(**container)],
+                    volumes=[k8s.core.v1.VolumeArgs(
+                        name="benchmark",
+                        persistent_volume_claim=k8s.core.v1.PersistentVolumeClaimVolumeSourceArgs(claim_name=name),
+                    )],
+                ),
+                k8s_provider,
+                depends_on=[pvc],
+                parent=pvc,
+            )
+
+            results[f"{storage_class}.{volume_mode.lower()}.json"] = benchmark_results.results.apply(
+                lambda r: json.dumps(r, indent=2, sort_keys=True)
+            )
+            # Benchmarks share node disks and network, run the next one after this one
+            previous = [benchmark_results]
+
+    config_map = k8s.core.v1.ConfigMap(
+        "storage-benchmark-results",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="storage-benchmark-results",
+            namespace=ns_name,
+            labels={"ccio.v1/benchmark-run": str(run_id)},
+        ),
+        data=results,
+        opts=pulumi.ResourceOptions(
+            provider=k8s_provider,
+            parent=namespace,
+            depends_on=previous,
+        )
+    )
+
+    return config_map
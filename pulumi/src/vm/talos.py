@@ -1,11 +1,13 @@
 import pulumi
 import pulumi_kubernetes as k8s
+from src.lib.crd_barrier import create_crd_barrier
 
 def deploy_talos_cluster(
         config_talos: dict,
         k8s_provider: k8s.Provider,
         depends_on: pulumi.Output[list],
-        parent
+        parent,
+        priority_class: str = None
     ):
     """
     Deploy the Talos controlplane and worker VirtualMachinePools based on the provided configuration.
@@ -15,15 +17,25 @@ def deploy_talos_cluster(
     controlplane_config = get_talos_config(config_talos.get("controlplane", {}), "controlplane")
     worker_config = get_talos_config(config_talos.get("workers", {}), "workers")
 
-    # Apply the running flag to both configurations
+    # Apply the running flag and priority class to both configurations
     controlplane_config["running"] = config_talos.get("running", True)
     worker_config["running"] = config_talos.get("running", True)
+    controlplane_config["priority_class"] = priority_class
+    worker_config["priority_class"] = priority_class
+
+    # Wait for the KubeVirt VirtualMachinePool CRD to be served before creating the pools
+    crd_barrier = create_crd_barrier(
+        "talos-cluster-crds",
+        ["virtualmachinepools.pool.kubevirt.io"],
+        depends_on=depends_on,
+        parent=parent
+    )
 
     # Deploy the Talos controlplane
     controlplane_vm_pool = deploy_talos_cluster_controlplane(
         config_vm=controlplane_config,
         k8s_provider=k8s_provider,
-        depends_on=depends_on,
+        depends_on=[crd_barrier],
         parent=parent
     )
 
@@ -33,7 +45,7 @@ def deploy_talos_cluster(
         worker_vm_pool = deploy_talos_cluster_workers(
             config_vm=worker_config,
             k8s_provider=k8s_provider,
-            depends_on=depends_on,
+            depends_on=[crd_barrier],
             parent=parent
         )
 
@@ -115,7 +127,8 @@ def deploy_talos_cluster_controlplane(
         empty_disk_size=config_vm["empty_disk_size"],
         image_address=config_vm["image"],
         network_name=config_vm["network_name"],
-        running=config_vm["running"]
+        running=config_vm["running"],
+        priority_class=config_vm["priority_class"]
     )
 
     controlplane_vm_pool = k8s.apiextensions.CustomResource(
@@ -129,7 +142,7 @@ def deploy_talos_cluster_controlplane(
         spec=vm_pool_spec,
         opts=pulumi.ResourceOptions(
             provider=k8s_provider,
-            #depends_on=depends_on,
+            depends_on=depends_on,
             parent=parent
         )
     )
@@ -156,7 +169,8 @@ def deploy_talos_cluster_workers(
             empty_disk_size=config_vm["empty_disk_size"],
             image_address=config_vm["image"],
             network_name=config_vm["network_name"],
-            running=config_vm["running"]
+            running=config_vm["running"],
+            priority_class=config_vm["priority_class"]
         )
 
         worker_vm_pool = k8s.apiextensions.CustomResource(
@@ -170,7 +184,7 @@ def deploy_talos_cluster_workers(
             spec=worker_vm_pool_spec,
             opts=pulumi.ResourceOptions(
                 provider=k8s_provider,
-                #depends_on=depends_on,
+                depends_on=depends_on,
                 parent=parent
             )
         )
@@ -189,7 +203,8 @@ def generate_talos_vmpool_spec(
         empty_disk_size: str,
         image_address: str,
         network_name: str,
-        running: bool
+        running: bool,
+        priority_class: str = None
     ) -> dict:
     """
     Generate the VirtualMachinePool spec for Talos VMs.
@@ -291,6 +306,10 @@ def generate_talos_vmpool_spec(
         }
     }
 
+    # Schedule the VMs with the tenant VM priority class
+    if priority_class:
+        spec["virtualMachineTemplate"]["spec"]["template"]["spec"]["priorityClassName"] = priority_class
+
     # If the empty disk size is greater than 0, add the empty disk to the spec
     if int(empty_disk_size) > 0:
         spec["virtualMachineTemplate"]["spec"]["template"]["spec"]["domain"]["devices"]["disks"].append(
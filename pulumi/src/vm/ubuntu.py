@@ -1,6 +1,7 @@
 import os
 import pulumi
 import pulumi_kubernetes as k8s
+from src.lib.crd_barrier import create_crd_barrier
 
 def deploy_ubuntu_vm(
         config_vm,
@@ -15,6 +16,7 @@ def deploy_ubuntu_vm(
     ssh_user = config_vm.get("ssh_user", "kc2")
     ssh_password = config_vm.get("ssh_password", "kc2")
     ssh_pub_key = config_vm.get("ssh_pub_key", "")
+    priority_class = config_vm.get("priority_class")
     app_name = "kc2"
 
     # Create Secret `kc2-pubkey` from public key string
@@ -88,6 +90,13 @@ def deploy_ubuntu_vm(
         dhcp-identifier: mac
     """
 
+    # Wait for the KubeVirt VirtualMachine CRD to be served before creating the VM
+    crd_barrier = create_crd_barrier(
+        "ubuntu-vm-crds",
+        ["virtualmachines.kubevirt.io"],
+        depends_on=depends_on
+    )
+
     # Define the VirtualMachine
     ubuntu_vm = k8s.apiextensions.CustomResource(
         "ubuntu",
@@ -111,6 +120,7 @@ def deploy_ubuntu_vm(
                 },
                 "spec": {
                     "hostname": instance_name,
+                    **({"priorityClassName": priority_class} if priority_class else {}),
                     "domain": {
                         "clock": {"utc": {}},
                         "cpu": {
@@ -164,7 +174,7 @@ def deploy_ubuntu_vm(
                 }
             }
         },
-        opts=pulumi.ResourceOptions(provider=k8s_provider, depends_on=depends_on)
+        opts=pulumi.ResourceOptions(provider=k8s_provider, depends_on=depends_on + [crd_barrier])
     )
 
     # Export the Service URL and VM name as outputs
@@ -0,0 +1,218 @@
+import pulumi
+import pulumi_kubernetes as k8s
+from src.lib.namespace import create_namespace
+from src.lib.helm_chart_versions import get_latest_helm_chart_version
+from src.lib.version_lock import resolve_latest_version
+from src.lib.helm_release import create_helm_release
+
+CHART_NAME = "vpa"
+CHART_REPOSITORY = "https://charts.fairwinds.com/stable"
+METRICS_SERVER_CHART_NAME = "metrics-server"
+METRICS_SERVER_CHART_REPOSITORY = "https://kubernetes-sigs.github.io/metrics-server"
+GOLDILOCKS_CHART_NAME = "goldilocks"
+
+# VPA update modes, Off only records recommendations
+UPDATE_MODES = ("Off", "Initial", "Auto")
+DEFAULT_UPDATE_MODE = "Off"
+
+# Namespaces of the Kargo modules, kube-system is always included for Cilium and Multus
+MODULE_NAMESPACES = {
+    "cert_manager": "cert-manager",
+    "kubevirt": "kubevirt",
+    "cdi": "cdi",
+    "cnao": "cluster-network-addons",
+    "hostpath_provisioner": "hostpath-provisioner",
+    "prometheus": "monitoring",
+    "kubernetes_dashboard": "kubernetes-dashboard",
+    "kubevirt_manager": "kubevirt-manager",
+    "openunison": "openunison",
+    "ingress_nginx": "ingress-nginx",
+    "ceph": "rook-ceph",
+}
+
+def get_vpa_namespaces(enabled_modules: dict) -> list:
+    """
+    Returns the namespaces to create VerticalPodAutoscalers in.
+
+    Args:
+        enabled_modules (dict): Whether each Kargo module is enabled, keyed by module name.
+
+    Returns:
+        list: kube-system and the namespaces of the enabled modules.
+    """
+    namespaces = ["kube-system"]
+    for module, enabled in enabled_modules.items():
+        if enabled and module in MODULE_NAMESPACES and MODULE_NAMESPACES[module] not in namespaces:
+            namespaces.append(MODULE_NAMESPACES[module])
+    return namespaces
+
+def deploy_vpa(
+        depends: pulumi.Input[list],
+        ns_name: str,
+        version: str,
+        update_mode: str,
+        namespaces: list,
+        kubernetes_distribution: str,
+        k8s_provider: k8s.Provider,
+        helm_engine: str = "release",
+        helm_timeouts: dict = None
+    ):
+    """
+    Deploys metrics-server, the Vertical Pod Autoscaler and Goldilocks.
+
+    Goldilocks creates a VerticalPodAutoscaler for every workload in the labelled
+    namespaces. With the default Off update mode only the VPA recommender runs, and
+    recommendations are recorded without evicting or mutating pods.
+
+    Args:
+        depends (pulumi.Input[list]): The resources to depend on, the labelled namespaces must exist.
+        ns_name (str): The namespace of the VPA components.
+        version (str): The VPA chart version, or None for the latest.
+        update_mode (str): The VPA update mode, one of UPDATE_MODES.
+        namespaces (list): The namespaces to create VerticalPodAutoscalers in.
+        kubernetes_distribution (str): The Kubernetes distribution.
+        k8s_provider (k8s.Provider): The Kubernetes provider.
+        helm_engine (str): The Helm engine, see src/lib/helm_release.get_helm_engine.
+        helm_timeouts (dict): Helm release timeout overrides.
+
+    Returns:
+        tuple: The VPA chart version and the VPA release.
+
+    Raises:
+        ValueError: If the update mode is not valid.
+    """
+    update_mode = update_mode or DEFAULT_UPDATE_MODE
+    if update_mode not in UPDATE_MODES:
+        raise ValueError(f"Unsupported VPA update mode '{update_mode}', expected one of: {', '.join(UPDATE_MODES)}")
+
+    namespace = create_namespace(
+        None,
+        ns_name,
+        False,
+        False,
+        k8s_provider,
+        custom_labels={},
+        custom_annotations={}
+    )
+
+    opts = pulumi.ResourceOptions(
+        provider=k8s_provider,
+        parent=namespace,
+        depends_on=[namespace],
+        custom_timeouts=pulumi.CustomTimeouts(
+            create="8m",
+            update="4m",
+            delete="4m"
+        )
+    )
+
+    # metrics-server serves the resource metrics API the VPA recommender reads
+    metrics_server_version = resolve_chart_version(METRICS_SERVER_CHART_NAME, METRICS_SERVER_CHART_REPOSITORY, None)
+    metrics_server_release = create_helm_release(
+        METRICS_SERVER_CHART_NAME,
+        chart=METRICS_SERVER_CHART_NAME,
+        version=metrics_server_version,
+        namespace=ns_name,
+        skip_await=False,
+        repository=METRICS_SERVER_CHART_REPOSITORY,
+        values=gen_metrics_server_values(kubernetes_distribution),
+        engine=helm_engine,
+        timeouts=helm_timeouts,
+        opts=opts
+    )
+
+    version = resolve_chart_version(CHART_NAME, CHART_REPOSITORY, version)
+    release = create_helm_release(
+        CHART_NAME,
+        chart=CHART_NAME,
+        version=version,
+        namespace=ns_name,
+        skip_await=False,
+        repository=CHART_REPOSITORY,
+        values=gen_helm_values(update_mode),
+        engine=helm_engine,
+        timeouts=helm_timeouts,
+        opts=pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(
+            depends_on=[namespace, metrics_server_release],
+        ))
+    )
+
+    goldilocks_version = resolve_chart_version(GOLDILOCKS_CHART_NAME, CHART_REPOSITORY, None)
+    goldilocks_release = create_helm_release(
+        GOLDILOCKS_CHART_NAME,
+        chart=GOLDILOCKS_CHART_NAME,
+        version=goldilocks_version,
+        namespace=ns_name,
+        skip_await=False,
+        repository=CHART_REPOSITORY,
+        values=gen_goldilocks_values(),
+        engine=helm_engine,
+        timeouts=helm_timeouts,
+        opts=pulumi.ResourceOptions.merge(opts, pulumi.ResourceOptions(
+            depends_on=[namespace, release],
+        ))
+    )
+
+    # Opt the Kargo namespaces in to Goldilocks, the patches only own these labels
+    for ns in namespaces:
+        k8s.core.v1.NamespacePatch(
+            f"vpa-namespace-{ns}",
+            metadata=k8s.meta.v1.ObjectMetaPatchArgs(
+                name=ns,
+                labels={
+                    "goldilocks.fairwinds.com/enabled": "true",
+                    "goldilocks.fairwinds.com/vpa-update-mode": update_mode.lower(),
+                },
+            ),
+            opts=pulumi.ResourceOptions(
+                provider=k8s_provider,
+                parent=goldilocks_release,
+                depends_on=depends + [goldilocks_release],
+            )
+        )
+
+    return version, release
+
+def resolve_chart_version(chart_name: str, chart_url: str, version: str) -> str:
+    """Returns the configured chart version, or the latest version from the chart index."""
+    if version is None:
+        version = resolve_latest_version(chart_name, lambda: get_latest_helm_chart_version(f"{chart_url}/index.yaml", chart_name))
+        version = version.lstrip("v")
+        pulumi.log.info(f"Setting helm release version to latest: {chart_name}/{version}")
+    else:
+        pulumi.log.info(f"Using helm release version: {chart_name}/{version}")
+    return version
+
+def gen_metrics_server_values(kubernetes_distribution: str) -> dict:
+    helm_values = {
+        "args": [],
+    }
+    # Kind and Talos kubelets serve self-signed certificates by default
+    if kubernetes_distribution in ("kind", "talos"):
+        helm_values["args"].append("--kubelet-insecure-tls")
+    return helm_values
+
+def gen_helm_values(update_mode: str) -> dict:
+    # The admission controller applies recommendations to new pods, and the updater
+    # evicts running pods, so neither runs in the recommend-only Off mode
+    return {
+        "recommender": {
+            "enabled": True,
+        },
+        "updater": {
+            "enabled": update_mode == "Auto",
+        },
+        "admissionController": {
+            "enabled": update_mode != "Off",
+        },
+    }
+
+def gen_goldilocks_values() -> dict:
+    return {
+        "vpa": {
+            "enabled": False,
+        },
+        "dashboard": {
+            "enabled": False,
+        },
+    }
@@ -0,0 +1,127 @@
+"""Attribution of Pulumi resources to Kargo modules."""
+
+# Resource name prefixes of the top-level resources each Kargo module registers
+RESOURCE_NAME_MODULES = [
+    ("cilium", "cilium"),
+    ("cert-manager", "cert_manager"),
+    ("cluster-selfsigned-issuer", "cert_manager"),
+    ("kubevirt-manager", "kubevirt_manager"),
+    ("kubevirt", "kubevirt"),
+    ("cdi", "cdi"),
+    ("cluster-network-addons", "cnao"),
+    ("network-addons", "cnao"),
+    ("k8snetworkplumbingwg-multus", "multus"),
+    ("kargo-net-attach-def", "multus"),
+    ("multus-crds", "multus"),
+    ("kube-multus", "multus"),
+    ("hostpath", "hostpath_provisioner"),
+    ("monitoring", "prometheus"),
+    ("helm-release-prometheus", "prometheus"),
+    ("service-grafana", "prometheus"),
+    ("service-alertmanager", "prometheus"),
+    ("service-prometheus", "prometheus"),
+    ("kubernetes-dashboard", "kubernetes_dashboard"),
+    ("ingress-nginx", "ingress_nginx"),
+    ("openunison", "openunison"),
+    ("orchestra", "openunison"),
+    ("ou-tls-certificate", "openunison"),
+    ("proxy", "openunison"),
+    ("kargo-openunison", "openunison"),
+    ("clusteradmin-clusterrolebinding", "openunison"),
+    ("rook-ceph", "ceph"),
+    ("kargo-dev-", "talos_cluster"),
+    ("talos-cluster", "talos_cluster"),
+    ("kc2-pubkey", "ubuntu_vm"),
+    ("ubuntu", "ubuntu_vm"),
+    ("priority-class", "priority_classes"),
+    ("node-local-dns", "node_local_dns"),
+    ("vpa", "vpa"),
+    ("metrics-server", "vpa"),
+    ("goldilocks", "vpa"),
+    ("descheduler", "descheduler"),
+    ("storage-benchmark", "storage_benchmark"),
+    ("network-benchmark", "network_benchmark"),
+    ("ingress-benchmark", "ingress_benchmark"),
+    ("canary-gate", "canary"),
+    ("flow-schema-kargo-", "control_plane_accounting"),
+    ("pyroscope", "profiling"),
+    ("profiling", "profiling"),
+    ("k8sProvider", "kargo"),
+]
+
+# Namespaces owned by each Kargo module, used when no resource name matches
+NAMESPACE_MODULES = {
+    "cert-manager": "cert_manager",
+    "kubevirt": "kubevirt",
+    "kubevirt-manager": "kubevirt_manager",
+    "cdi": "cdi",
+    "cluster-network-addons": "cnao",
+    "hostpath-provisioner": "hostpath_provisioner",
+    "monitoring": "prometheus",
+    "kubernetes-dashboard": "kubernetes_dashboard",
+    "ingress-nginx": "ingress_nginx",
+    "openunison": "openunison",
+    "rook-ceph": "ceph",
+    "vpa": "vpa",
+    "storage-benchmark": "storage_benchmark",
+    "network-benchmark": "network_benchmark",
+    "ingress-benchmark": "ingress_benchmark",
+    "profiling": "profiling",
+}
+
+def urn_name(urn: str) -> str:
+    """Returns the resource name part of a Pulumi URN."""
+    return urn.split("::")[-1]
+
+def urn_type(urn: str) -> str:
+    """Returns the resource type part of a Pulumi URN."""
+    return urn.split("::")[-2].split("$")[-1]
+
+def module_for_name(name: str):
+    """Returns the Kargo module registering a resource name, or None."""
+    for prefix, module in RESOURCE_NAME_MODULES:
+        if name.startswith(prefix):
+            return module
+    return None
+
+def _resource_namespace(resource: dict):
+    for field in ("outputs", "inputs"):
+        metadata = (resource.get(field) or {}).get("metadata") or {}
+        if isinstance(metadata, dict) and metadata.get("namespace"):
+            return metadata["namespace"]
+    return None
+
+def attribute_resource(resource: dict, resources_by_urn: dict) -> str:
+    """
+    Attributes a checkpoint resource to a Kargo module.
+
+    The resource and its parents are matched by name first, then by namespace.
+
+    Args:
+        resource (dict): The checkpoint resource.
+        resources_by_urn (dict): All checkpoint resources keyed by URN.
+
+    Returns:
+        str: The Kargo module name, "stack" for the stack itself or "other".
+    """
+    if resource.get("type") == "pulumi:pulumi:Stack":
+        return "stack"
+
+    chain = []
+    current = resource
+    while current is not None and current.get("type") != "pulumi:pulumi:Stack":
+        chain.append(current)
+        current = resources_by_urn.get(current.get("parent"))
+
+    # Match the top-most ancestor first, child resource names are chart defined
+    for ancestor in reversed(chain):
+        module = module_for_name(urn_name(ancestor["urn"]))
+        if module:
+            return module
+
+    for ancestor in chain:
+        namespace = _resource_namespace(ancestor)
+        if namespace in NAMESPACE_MODULES:
+            return NAMESPACE_MODULES[namespace]
+
+    return "other"
@@ -0,0 +1,237 @@
+"""
+Version resolver micro-benchmarks.
+
+Runs the resolvers in src/lib/helm_chart_versions.py against a local HTTP fixture
+server that serves synthetic Helm `index.yaml` files of realistic sizes and
+GitHub-style `releases/latest` redirects. Reports latency, peak Python memory and
+upstream request counts for cold, warm and concurrent lookups.
+
+Usage (from the pulumi directory):
+    python -m tools.bench_resolvers --sizes 1,10,30 --iterations 3
+    python -m tools.bench_resolvers --sizes 1 --json /tmp/bench.json
+
+New resolvers are benchmarked by adding a scenario to SCENARIOS.
+"""
+import argparse
+import json
+import logging
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+
+from src.lib import helm_chart_versions
+
+BENCH_CHART = "bench-chart"
+GITHUB_RELEASE_TAG = "v1.60.2"
+
+def generate_index(size_mb: float, seed_charts: int = 50) -> bytes:
+    """
+    Generates a synthetic Helm repository index of roughly the given size.
+
+    The index mimics real repositories: many charts with long version histories,
+    including pre-releases, digests, URLs and maintainer metadata.
+
+    Args:
+        size_mb (float): The target size in megabytes.
+        seed_charts (int): The number of distinct charts to spread versions across.
+
+    Returns:
+        bytes: The YAML document.
+    """
+    target = int(size_mb * 1024 * 1024)
+    entries = {BENCH_CHART: []}
+    for chart in range(seed_charts):
+        entries.setdefault(f"chart-{chart}", [])
+
+    def chart_version(name, major, minor, patch, prerelease=""):
+        version = f"{major}.{minor}.{patch}{prerelease}"
+        return {
+            "apiVersion": "v2",
+            "appVersion": f"v{major}.{minor}.{patch}",
+            "created": "2024-08-01T12:00:00.000000000Z",
+            "description": f"Synthetic chart {name} used to benchmark the Kargo version resolvers.",
+            "digest": f"{abs(hash((name, version))):064x}"[:64],
+            "home": f"https://example.com/{name}",
+            "icon": f"https://example.com/{name}/icon.png",
+            "keywords": ["kargo", "benchmark", name],
+            "maintainers": [{"email": "maintainers@example.com", "name": "Kargo"}],
+            "name": name,
+            "sources": [f"https://github.com/example/{name}"],
+            "type": "application",
+            "urls": [f"https://example.com/charts/{name}-{version}.tgz"],
+            "version": version,
+        }
+
+    # Size a single entry to estimate how many versions reach the target size
+    entry_size = len(yaml.safe_dump(chart_version("chart-0", 1, 0, 0)))
+    total_versions = max(target // entry_size, 1)
+
+    names = list(entries)
+    for i in range(total_versions):
+        name = names[i % len(names)]
+        n = i // len(names)
+        major, minor, patch = n // 100, (n // 10) % 10, n % 10
+        prerelease = "-rc.1" if n % 7 == 0 else ""
+        entries[name].append(chart_version(name, major, minor, patch, prerelease))
+
+    return yaml.dump(
+        {"apiVersion": "v1", "entries": entries, "generated": "2024-08-01T12:00:00Z"},
+        Dumper=getattr(yaml, "CSafeDumper", yaml.SafeDumper),
+        default_flow_style=False,
+    ).encode("utf-8")
+
+class FixtureServer:
+    """Local HTTP server serving chart indexes and GitHub releases/latest redirects."""
+
+    def __init__(self, indexes: dict):
+        self.indexes = indexes
+        self.requests = Counter()
+        self.bytes_sent = Counter()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests[self.path] += 1
+                if self.path.endswith("/releases/latest"):
+                    self.send_response(302)
+                    self.send_header("Location", self.path.replace("/releases/latest", f"/releases/tag/{GITHUB_RELEASE_TAG}"))
+                    self.end_headers()
+                    return
+                body = server.indexes.get(self.path.split("/")[1])
+                if body is None or not self.path.endswith("/index.yaml"):
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-yaml")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                server.bytes_sent[self.path] += len(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def index_url(self, repo: str) -> str:
+        return f"{self.base_url}/{repo}/index.yaml"
+
+    def release_url(self) -> str:
+        return f"{self.base_url}/example/project/releases/latest"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def scenario_cold(server, repo, concurrency):
+    return helm_chart_versions.get_latest_helm_chart_version(server.index_url(repo), BENCH_CHART)
+
+def scenario_concurrent(server, repo, concurrency):
+    charts = [BENCH_CHART] + [f"chart-{i}" for i in range(concurrency - 1)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(lambda chart: helm_chart_versions.get_latest_helm_chart_version(server.index_url(repo), chart), charts))
+
+def scenario_github(server, repo, concurrency):
+    return helm_chart_versions.get_latest_github_release_version(server.release_url())
+
+# (name, callable, warm up before measuring, uses the index fixture). The resolvers
+# keep no state between lookups, the warm scenarios only warm the fixture server,
+# connection setup and imports.
+SCENARIOS = [
+    ("index-cold", scenario_cold, False, True),
+    ("index-warm", scenario_cold, True, True),
+    ("index-concurrent", scenario_concurrent, False, True),
+    ("github-latest-cold", scenario_github, False, False),
+    ("github-latest-warm", scenario_github, True, False),
+]
+
+def run_scenario(server, repo, scenario, iterations, concurrency) -> dict:
+    """Runs a scenario and returns latency, peak memory and request count statistics."""
+    name, func, warm_up, _ = scenario
+    if warm_up:
+        func(server, repo, concurrency)
+
+    latencies = []
+    requests_before = sum(server.requests.values())
+    bytes_before = sum(server.bytes_sent.values())
+    for _ in range(iterations):
+        start = time.perf_counter()
+        result = func(server, repo, concurrency)
+        latencies.append(time.perf_counter() - start)
+    requests = sum(server.requests.values()) - requests_before
+    bytes_sent = sum(server.bytes_sent.values()) - bytes_before
+
+    # Measure peak memory in a separate iteration, tracemalloc skews latency
+    tracemalloc.start()
+    func(server, repo, concurrency)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {
+        "scenario": name,
+        "repo": repo,
+        "iterations": iterations,
+        "latency_ms_median": statistics.median(latencies) * 1000,
+        "latency_ms_max": max(latencies) * 1000,
+        "peak_memory_mb": peak / (1024 * 1024),
+        "requests_per_iteration": requests / iterations,
+        "upstream_mb_per_iteration": bytes_sent / iterations / (1024 * 1024),
+        "result": result if isinstance(result, str) else f"{len(result)} lookups",
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Kargo version resolvers against a local fixture chart repository.")
+    parser.add_argument("--sizes", default="1,10,30", help="Comma separated index sizes in MB.")
+    parser.add_argument("--iterations", type=int, default=3, help="Measured iterations per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel lookups in the concurrent scenario.")
+    parser.add_argument("--scenarios", help="Comma separated subset of scenarios to run.")
+    parser.add_argument("--json", help="Write the results as JSON to this file.")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    selected = set(args.scenarios.split(",")) if args.scenarios else None
+    sizes = [float(size) for size in args.sizes.split(",")]
+
+    print("Generating fixture indexes...", file=sys.stderr)
+    indexes = {f"repo-{size:g}mb": generate_index(size) for size in sizes}
+
+    results = []
+    with FixtureServer(indexes) as server:
+        for repo, body in indexes.items():
+            print(f"{repo}: {len(body) / (1024 * 1024):.1f} MB", file=sys.stderr)
+            for scenario in SCENARIOS:
+                if selected and scenario[0] not in selected:
+                    continue
+                if not scenario[3] and repo != next(iter(indexes)):
+                    # GitHub redirects do not depend on the index size
+                    continue
+                results.append(run_scenario(server, repo, scenario, args.iterations, args.concurrency))
+
+    print(f"{'scenario':<24} {'repo':<12} {'median ms':>10} {'max ms':>10} {'peak MB':>9} {'req/iter':>9} {'MB/iter':>8}  result")
+    for r in results:
+        print(f"{r['scenario']:<24} {r['repo']:<12} {r['latency_ms_median']:>10.1f} {r['latency_ms_max']:>10.1f} "
+              f"{r['peak_memory_mb']:>9.1f} {r['requests_per_iteration']:>9.1f} {r['upstream_mb_per_iteration']:>8.1f}  {r['result']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Control-plane load report.
+
+Attributes the API server load to Kargo modules, from the API Priority and Fairness
+metrics of the FlowSchemas created by the control_plane_accounting module. The API
+server metrics are scraped twice, and the report shows for each FlowSchema over the
+interval:
+
+- the request rate and its share of all requests,
+- the rejected request rate,
+- the p99 queue wait and execution latency.
+
+Watches are not counted per FlowSchema, so the open watches on the API groups each
+module owns are reported instead.
+
+Usage (from the pulumi directory):
+    python -m tools.control_plane_load
+    python -m tools.control_plane_load --kubeconfig ../.kube/config --interval 60 --top 3 --json
+"""
+import argparse
+import json
+import math
+import re
+import sys
+import time
+
+from src.control_plane_accounting.deploy import get_flow_schema_module
+
+DISPATCHED = "apiserver_flowcontrol_dispatched_requests_total"
+REJECTED = "apiserver_flowcontrol_rejected_requests_total"
+EXECUTION = "apiserver_flowcontrol_request_execution_seconds_bucket"
+WAIT = "apiserver_flowcontrol_request_wait_duration_seconds_bucket"
+LONGRUNNING = "apiserver_longrunning_requests"
+
+# API groups owned by each Kargo module, sub-groups such as pool.kubevirt.io included
+GROUP_MODULES = {
+    "cilium.io": "cilium",
+    "k8s.cni.cncf.io": "multus",
+    "cert-manager.io": "cert_manager",
+    "cdi.kubevirt.io": "cdi",
+    "hostpathprovisioner.kubevirt.io": "hostpath_provisioner",
+    "networkaddonsoperator.network.kubevirt.io": "cnao",
+    "kubevirt.io": "kubevirt",
+    "monitoring.coreos.com": "prometheus",
+    "openunison.tremolo.io": "openunison",
+    "ceph.rook.io": "ceph",
+    "autoscaling.k8s.io": "vpa",
+}
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+def parse_metrics(text: str, names: tuple) -> list:
+    """Parses the samples of some metrics from the Prometheus text format, as (name, labels, value)."""
+    samples = []
+    for line in text.splitlines():
+        match = SAMPLE.match(line)
+        if match and match.group(1) in names:
+            labels = dict(LABEL.findall(match.group(2) or ""))
+            samples.append((match.group(1), labels, float(match.group(3))))
+    return samples
+
+def sum_by(samples: list, name: str, keys: tuple) -> dict:
+    """Sums the samples of a metric by some of their labels."""
+    sums = {}
+    for sample_name, labels, value in samples:
+        if sample_name == name:
+            key = tuple(labels.get(k, "") for k in keys)
+            sums[key] = sums.get(key, 0.0) + value
+    return sums
+
+def histogram_quantile(quantile: float, buckets: dict) -> float:
+    """
+    Estimates a quantile from cumulative histogram buckets, like PromQL histogram_quantile.
+
+    Args:
+        quantile (float): The quantile, e.g. 0.99.
+        buckets (dict): The cumulative bucket counts keyed by upper bound.
+
+    Returns:
+        float: The estimate, or None without observations.
+    """
+    bounds = sorted(buckets)
+    if not bounds or buckets[bounds[-1]] <= 0:
+        return None
+    rank = quantile * buckets[bounds[-1]]
+    lower, lower_count = 0.0, 0.0
+    for bound in bounds:
+        if buckets[bound] >= rank:
+            if math.isinf(bound):
+                return lower
+            if buckets[bound] == lower_count:
+                return bound
+            return lower + (bound - lower) * (rank - lower_count) / (buckets[bound] - lower_count)
+        lower, lower_count = bound, buckets[bound]
+    return lower
+
+def _quantiles(before: list, after: list, name: str) -> dict:
+    # p99 of the observations between the scrapes, per FlowSchema
+    start = sum_by(before, name, ("flow_schema", "le"))
+    end = sum_by(after, name, ("flow_schema", "le"))
+    buckets = {}
+    for (flow_schema, le), count in end.items():
+        buckets.setdefault(flow_schema, {})[float(le)] = count - start.get((flow_schema, le), 0.0)
+    return {flow_schema: histogram_quantile(0.99, counts) for flow_schema, counts in buckets.items()}
+
+def group_module(group: str) -> str:
+    """Returns the Kargo module owning an API group, or None."""
+    for owned, module in GROUP_MODULES.items():
+        if group == owned or group.endswith("." + owned):
+            return module
+    return None
+
+def build_report(before: list, after: list, interval: float) -> dict:
+    """
+    Builds the report from two scrapes of the API server metrics.
+
+    Args:
+        before (list): The samples of the first scrape, see parse_metrics.
+        after (list): The samples of the second scrape.
+        interval (float): The time between the scrapes, in seconds.
+
+    Returns:
+        dict: The FlowSchema rows sorted by request rate, and the watches per module.
+    """
+    start = sum_by(before, DISPATCHED, ("flow_schema", "priority_level"))
+    end = sum_by(after, DISPATCHED, ("flow_schema", "priority_level"))
+    rejected_start = sum_by(before, REJECTED, ("flow_schema",))
+    rejected_end = sum_by(after, REJECTED, ("flow_schema",))
+    execution = _quantiles(before, after, EXECUTION)
+    wait = _quantiles(before, after, WAIT)
+
+    total = sum(end.values()) - sum(start.values())
+    rows = []
+    for (flow_schema, priority_level), count in end.items():
+        rate = (count - start.get((flow_schema, priority_level), 0.0)) / interval
+        rejected = (rejected_end.get((flow_schema,), 0.0) - rejected_start.get((flow_schema,), 0.0)) / interval
+        rows.append({
+            "module": get_flow_schema_module(flow_schema),
+            "flow_schema": flow_schema,
+            "priority_level": priority_level,
+            "qps": round(rate, 3),
+            "share": round(100 * rate * interval / total, 1) if total > 0 else 0.0,
+            "rejected_qps": round(rejected, 3),
+            "p99_wait_ms": None if wait.get(flow_schema) is None else round(wait[flow_schema] * 1000, 1),
+            "p99_execution_ms": None if execution.get(flow_schema) is None else round(execution[flow_schema] * 1000, 1),
+        })
+
+    watches = {}
+    for (verb, group), count in sum_by(after, LONGRUNNING, ("verb", "group")).items():
+        module = group_module(group)
+        if verb == "WATCH" and module:
+            watches[module] = watches.get(module, 0) + int(count)
+
+    return {
+        "interval_seconds": interval,
+        "flow_schemas": sorted(rows, key=lambda row: row["qps"], reverse=True),
+        "watches": dict(sorted(watches.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+def top_offenders(report: dict, top: int) -> list:
+    """Returns the Kargo FlowSchema rows with the highest request rates."""
+    return [row for row in report["flow_schemas"] if row["module"] and row["qps"] > 0][:top]
+
+def scrape(kubeconfig: str = None, context: str = None) -> list:
+    """Scrapes the flow control and long-running request metrics of the API server."""
+    from kubernetes import client, config
+
+    config.load_kube_config(config_file=kubeconfig, context=context)
+    response = client.ApiClient().call_api(
+        "/metrics",
+        "GET",
+        auth_settings=["BearerToken"],
+        _preload_content=False,
+        _return_http_data_only=True,
+    )
+    return parse_metrics(response.data.decode(), (DISPATCHED, REJECTED, EXECUTION, WAIT, LONGRUNNING))
+
+def _ms(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+def print_report(report: dict, top: int):
+    """Prints a human readable control-plane load report."""
+    if not any(row["module"] for row in report["flow_schemas"]):
+        print("No Kargo FlowSchemas found, enable the control_plane_accounting module to attribute requests to modules.\n")
+
+    offenders = {row["flow_schema"] for row in top_offenders(report, top)}
+    print(f"API server requests over {report['interval_seconds']:.0f}s, by FlowSchema:")
+    print(f"  {'':<2}{'module':<22} {'flow schema':<36} {'priority level':<16} {'qps':>8} {'share':>6} {'rejected':>8} {'p99 wait':>9} {'p99 exec':>9}")
+    for row in report["flow_schemas"]:
+        marker = "*" if row["flow_schema"] in offenders else ""
+        print(
+            f"  {marker:<2}{row['module'] or '-':<22} {row['flow_schema']:<36} {row['priority_level']:<16}"
+            f" {row['qps']:>8.2f} {row['share']:>5.1f}% {row['rejected_qps']:>8.2f}"
+            f" {_ms(row['p99_wait_ms']):>9} {_ms(row['p99_execution_ms']):>9}"
+        )
+
+    if report["watches"]:
+        print("\nOpen watches on the API groups of each module:")
+        for module, count in report["watches"].items():
+            print(f"  {module:<22} {count:>6}")
+
+    if offenders:
+        print(f"\nTop offenders (*): {', '.join(row['module'] + ' (' + row['flow_schema'] + ')' for row in top_offenders(report, top))}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attribute API server request rate, latency and watches to Kargo modules.")
+    parser.add_argument("--kubeconfig", help="Kubeconfig file, defaults to KUBECONFIG or ~/.kube/config.")
+    parser.add_argument("--context", help="Kubeconfig context.")
+    parser.add_argument("--interval", type=float, default=30, help="Seconds between the two metric scrapes (default: 30).")
+    parser.add_argument("--top", type=int, default=3, help="Number of Kargo FlowSchemas to highlight (default: 3).")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    args = parser.parse_args(argv)
+
+    # With several API servers, each scrape reaches the one behind the endpoint
+    before = scrape(args.kubeconfig, args.context)
+    time.sleep(args.interval)
+    after = scrape(args.kubeconfig, args.context)
+    report = build_report(before, after, args.interval)
+
+    if args.json:
+        json.dump({**report, "top_offenders": top_offenders(report, args.top)}, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report, args.top)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+"""
+Deploy history database.
+
+Records the per-module durations, resource counts, upstream bytes and outcome of
+every `pulumi up` in a local SQLite database, keyed by stack and resolved version
+set, and reports statistically significant slowdowns between runs and between
+version sets.
+
+Each run is recorded from two sources:
+  - the engine event log (`pulumi up --event-log <file>`): per-resource step
+    timings, attributed to Kargo modules via tools.attribution
+  - the program metrics (`KARGO_METRICS_FILE=<file> pulumi up`): per-module
+    program time, upstream bytes and the resolved version set, written by
+    src/lib/instrumentation.py
+
+Usage (from the pulumi directory):
+    KARGO_METRICS_FILE=/tmp/metrics.json pulumi up --event-log /tmp/events.jsonl; status=$?
+    python -m tools.deploy_history record --event-log /tmp/events.jsonl --metrics /tmp/metrics.json --exit-code $status
+    python -m tools.deploy_history runs --stack <stack>
+    python -m tools.deploy_history report --stack <stack>
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+from tools.attribution import attribute_resource
+
+DEFAULT_DATABASE = os.path.join("..", ".pulumi", "deploy-history.db")
+
+# Step operations that change the stack, as opposed to same/read/refresh
+CHANGING_OPS = {"create", "update", "delete", "replace", "create-replacement", "delete-replaced", "import"}
+
+# Per-module metrics that can be compared by the report
+METRICS = ("duration_seconds", "step_seconds", "program_seconds", "upstream_bytes")
+
+# Baseline runs needed to judge a module, so the baseline has a spread to compare against
+MIN_BASELINE_RUNS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stack TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version_set TEXT NOT NULL,
+    versions TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration_seconds REAL,
+    outcome TEXT NOT NULL,
+    resource_changes TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_stack_version_set ON runs (stack, version_set);
+CREATE TABLE IF NOT EXISTS module_runs (
+    run_id INTEGER NOT NULL REFERENCES runs (id) ON DELETE CASCADE,
+    module TEXT NOT NULL,
+    duration_seconds REAL,
+    step_seconds REAL,
+    program_seconds REAL,
+    resources INTEGER,
+    changed INTEGER,
+    failed INTEGER,
+    upstream_bytes INTEGER,
+    upstream_requests INTEGER,
+    PRIMARY KEY (run_id, module)
+);
+"""
+
+def connect(path: str) -> sqlite3.Connection:
+    """Opens the history database, creating the schema if needed."""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA foreign_keys = ON")
+    db.executescript(SCHEMA)
+    return db
+
+def version_set_key(versions: dict) -> str:
+    """Returns a short stable key of a resolved version set."""
+    return hashlib.sha256(json.dumps(versions, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def parse_event_log(path: str) -> dict:
+    """
+    Parses a `pulumi up --event-log` file into per-module step timings.
+
+    Args:
+        path (str): The JSON lines engine event log.
+
+    Returns:
+        dict: The run start, duration, outcome, resource changes and per-module timings.
+    """
+    steps = {}
+    resources_by_urn = {}
+    run = {"started_at": None, "duration_seconds": None, "outcome": "succeeded", "resource_changes": {}}
+
+    with open(path, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            event = json.loads(line)
+            timestamp = event.get("timestamp")
+            if timestamp and run["started_at"] is None:
+                run["started_at"] = timestamp
+
+            for kind in ("resourcePreEvent", "resOutputsEvent", "resOpFailedEvent"):
+                if kind not in event:
+                    continue
+                metadata = event[kind].get("metadata") or {}
+                if event[kind].get("planning"):
+                    continue
+                urn = metadata.get("urn")
+                state = metadata.get("new") or metadata.get("old") or {}
+                resources_by_urn[urn] = {
+                    "urn": urn,
+                    "type": metadata.get("type"),
+                    "parent": state.get("parent"),
+                    "inputs": state.get("inputs"),
+                    "outputs": state.get("outputs"),
+                }
+                step = steps.setdefault(urn, {"op": metadata.get("op"), "start": timestamp, "end": None, "failed": False})
+                if kind == "resourcePreEvent":
+                    step["start"] = timestamp
+                else:
+                    step["end"] = timestamp
+                    step["failed"] = kind == "resOpFailedEvent"
+
+            if "summaryEvent" in event:
+                run["duration_seconds"] = event["summaryEvent"].get("durationSeconds")
+                run["resource_changes"] = event["summaryEvent"].get("resourceChanges") or {}
+            if "cancelEvent" in event:
+                run["outcome"] = "cancelled"
+            if (event.get("diagnosticEvent") or {}).get("severity") == "error" and run["outcome"] == "succeeded":
+                run["outcome"] = "failed"
+
+    modules = defaultdict(lambda: {"start": None, "end": None, "step_seconds": 0.0, "resources": 0, "changed": 0, "failed": 0})
+    for urn, step in steps.items():
+        resource = resources_by_urn[urn]
+        if resource["type"] == "pulumi:pulumi:Stack":
+            continue
+        module = modules[attribute_resource(resource, resources_by_urn)]
+        module["resources"] += 1
+        module["changed"] += step["op"] in CHANGING_OPS
+        module["failed"] += step["failed"]
+        if step["start"] is None or step["end"] is None:
+            continue
+        module["step_seconds"] += step["end"] - step["start"]
+        module["start"] = step["start"] if module["start"] is None else min(module["start"], step["start"])
+        module["end"] = step["end"] if module["end"] is None else max(module["end"], step["end"])
+
+    run["modules"] = {
+        name: {
+            "duration_seconds": (module["end"] - module["start"]) if module["start"] is not None else None,
+            "step_seconds": module["step_seconds"],
+            "resources": module["resources"],
+            "changed": module["changed"],
+            "failed": module["failed"],
+        }
+        for name, module in modules.items()
+    }
+    return run
+
+def record_run(db: sqlite3.Connection, stack: str, kind: str, events: dict, metrics: dict, exit_code: int = None) -> int:
+    """
+    Records a run in the history database.
+
+    Args:
+        db (sqlite3.Connection): The history database.
+        stack (str): The stack name.
+        kind (str): The kind of run, only runs of the same kind are compared.
+        events (dict): The parsed event log, see parse_event_log.
+        metrics (dict): The program metrics, see src/lib/instrumentation.py.
+        exit_code (int): The `pulumi up` exit code, overrides the outcome derived from the event log.
+
+    Returns:
+        int: The run id.
+    """
+    versions = metrics.get("versions") or {}
+    outcome = events.get("outcome", "unknown")
+    if exit_code is not None:
+        outcome = "succeeded" if exit_code == 0 else ("cancelled" if outcome == "cancelled" else "failed")
+
+    cursor = db.execute(
+        "INSERT INTO runs (stack, kind, version_set, versions, started_at, duration_seconds, outcome, resource_changes) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            stack,
+            kind,
+            version_set_key(versions),
+            json.dumps(versions, sort_keys=True),
+            events.get("started_at") or time.time(),
+            events.get("duration_seconds"),
+            outcome,
+            json.dumps(events.get("resource_changes") or {}, sort_keys=True),
+        ),
+    )
+    run_id = cursor.lastrowid
+
+    program_modules = metrics.get("modules") or {}
+    for module in sorted(set(events.get("modules", {})) | set(program_modules)):
+        engine = events.get("modules", {}).get(module, {})
+        program = program_modules.get(module, {})
+        db.execute(
+            "INSERT INTO module_runs (run_id, module, duration_seconds, step_seconds, program_seconds, resources, "
+            "changed, failed, upstream_bytes, upstream_requests) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                run_id,
+                module,
+                engine.get("duration_seconds"),
+                engine.get("step_seconds"),
+                program.get("program_seconds"),
+                engine.get("resources"),
+                engine.get("changed"),
+                engine.get("failed"),
+                program.get("upstream_bytes"),
+                program.get("upstream_requests"),
+            ),
+        )
+    db.commit()
+    return run_id
+
+def permutation_test(baseline: list, candidate: list, iterations: int = 10000, seed: int = 0) -> float:
+    """
+    One-sided permutation test that the candidate mean is greater than the baseline mean.
+
+    Enumerates all permutations exactly when there are fewer than `iterations`.
+
+    Args:
+        baseline (list): The baseline samples.
+        candidate (list): The candidate samples.
+        iterations (int): The number of random permutations.
+        seed (int): The random seed, for reproducible reports.
+
+    Returns:
+        float: The p-value.
+    """
+    pooled = baseline + candidate
+    k = len(candidate)
+    observed = statistics.fmean(candidate) - statistics.fmean(baseline)
+    total = sum(pooled)
+
+    def statistic(candidate_sum):
+        return candidate_sum / k - (total - candidate_sum) / (len(pooled) - k)
+
+    if math.comb(len(pooled), k) <= iterations:
+        samples = [statistic(sum(combination)) for combination in itertools.combinations(pooled, k)]
+        return sum(s >= observed - 1e-12 for s in samples) / len(samples)
+
+    rng = random.Random(seed)
+    extreme = sum(statistic(sum(rng.sample(pooled, k))) >= observed - 1e-12 for _ in range(iterations))
+    return (extreme + 1) / (iterations + 1)
+
+def z_test(baseline: list, value: float) -> float:
+    """
+    One-sided test that a single value is above the baseline distribution.
+
+    The value is scored against a normal prediction interval of the baseline, so
+    one run can be judged, unlike with a permutation test whose smallest p-value
+    is 1 / (len(baseline) + 1).
+
+    Args:
+        baseline (list): The baseline samples, at least MIN_BASELINE_RUNS.
+        value (float): The candidate value.
+
+    Returns:
+        float: The p-value.
+    """
+    mean = statistics.fmean(baseline)
+    spread = statistics.stdev(baseline) * math.sqrt(1 + 1 / len(baseline))
+    if spread == 0:
+        return 0.0 if value > mean else 1.0
+    return 1 - statistics.NormalDist().cdf((value - mean) / spread)
+
+def compare(baseline: list, candidate: list, alpha: float, min_slowdown: float) -> dict:
+    """
+    Compares two samples, flagging significant slowdowns above the minimum relative change.
+
+    A single candidate value is compared with z_test, larger samples with permutation_test.
+    """
+    baseline_mean = statistics.fmean(baseline)
+    candidate_mean = statistics.fmean(candidate)
+    ratio = candidate_mean / baseline_mean if baseline_mean else math.inf if candidate_mean else 1.0
+    test = "z" if len(candidate) == 1 else "permutation"
+    p_value = z_test(baseline, candidate[0]) if test == "z" else permutation_test(baseline, candidate)
+    return {
+        "baseline_mean": baseline_mean,
+        "candidate_mean": candidate_mean,
+        "baseline_runs": len(baseline),
+        "candidate_runs": len(candidate),
+        "ratio": ratio,
+        "test": test,
+        "p_value": p_value,
+        "slowdown": p_value < alpha and ratio > 1 + min_slowdown,
+    }
+
+def module_samples(db: sqlite3.Connection, run_ids: list, metric: str) -> dict:
+    """Returns the samples of a metric per module over the given runs."""
+    samples = defaultdict(list)
+    if not run_ids:
+        return samples
+    rows = db.execute(
+        f"SELECT module, {metric} AS value FROM module_runs WHERE run_id IN ({','.join('?' * len(run_ids))}) "
+        f"AND {metric} IS NOT NULL",
+        run_ids,
+    )
+    for row in rows:
+        samples[row["module"]].append(float(row["value"]))
+    return samples
+
+def build_report(db: sqlite3.Connection, stack: str, kind: str, metric: str, window: int, alpha: float, min_slowdown: float) -> dict:
+    """
+    Compares the latest run against earlier runs of the same version set, and the
+    latest version set against the previous one, per module.
+
+    Only succeeded runs of the same stack and kind are compared.
+
+    Returns:
+        dict: The latest run and the run and version set comparisons.
+    """
+    runs = db.execute(
+        "SELECT * FROM runs WHERE stack = ? AND kind = ? AND outcome = 'succeeded' ORDER BY started_at DESC, id DESC",
+        (stack, kind),
+    ).fetchall()
+    report = {"stack": stack, "kind": kind, "metric": metric, "latest_run": None, "runs": [], "version_sets": None}
+    if not runs:
+        return report
+
+    latest = runs[0]
+    report["latest_run"] = dict(latest)
+
+    # Between runs: the latest run against earlier runs of the same version set
+    same_set = [run["id"] for run in runs[1:] if run["version_set"] == latest["version_set"]][:window]
+    baseline = module_samples(db, same_set, metric)
+    candidate = module_samples(db, [latest["id"]], metric)
+    for module in sorted(candidate):
+        if len(baseline.get(module, [])) >= MIN_BASELINE_RUNS:
+            report["runs"].append({"module": module, **compare(baseline[module], candidate[module], alpha, min_slowdown)})
+
+    # Between version sets: all runs of the latest set against the previous set
+    sets = []
+    for run in runs:
+        if run["version_set"] not in sets:
+            sets.append(run["version_set"])
+    if len(sets) >= 2:
+        current_runs = [run for run in runs if run["version_set"] == sets[0]][:window]
+        previous_runs = [run for run in runs if run["version_set"] == sets[1]][:window]
+        current_versions = json.loads(current_runs[0]["versions"])
+        previous_versions = json.loads(previous_runs[0]["versions"])
+        baseline = module_samples(db, [run["id"] for run in previous_runs], metric)
+        candidate = module_samples(db, [run["id"] for run in current_runs], metric)
+        report["version_sets"] = {
+            "current": sets[0],
+            "previous": sets[1],
+            "changed_versions": {
+                module: {"previous": previous_versions.get(module), "current": current_versions.get(module)}
+                for module in sorted(set(current_versions) | set(previous_versions))
+                if current_versions.get(module) != previous_versions.get(module)
+            },
+            "modules": [
+                {"module": module, **compare(baseline[module], candidate[module], alpha, min_slowdown)}
+                for module in sorted(candidate)
+                if len(baseline.get(module, [])) >= MIN_BASELINE_RUNS
+            ],
+        }
+    return report
+
+def print_comparisons(comparisons: list):
+    print(f"  {'module':<24} {'baseline':>10} {'candidate':>10} {'ratio':>7} {'p':>7} {'runs':>7}")
+    for c in comparisons:
+        flag = "  SLOWER" if c["slowdown"] else ""
+        print(
+            f"  {c['module']:<24} {c['baseline_mean']:>10.1f} {c['candidate_mean']:>10.1f} {c['ratio']:>7.2f} "
+            f"{c['p_value']:>7.3f} {c['baseline_runs']:>3}/{c['candidate_runs']:<3}{flag}"
+        )
+
+def print_report(report: dict):
+    """Prints a human readable slowdown report."""
+    latest = report["latest_run"]
+    if not latest:
+        print(f"No succeeded '{report['kind']}' runs recorded for stack '{report['stack']}'.")
+        return
+
+    started = time.strftime("%Y-%m-%d %H:%M", time.localtime(latest["started_at"]))
+    print(f"Latest run #{latest['id']} of {report['stack']} at {started}, version set {latest['version_set']}, metric {report['metric']}")
+
+    print("\nAgainst earlier runs of the same version set:")
+    if report["runs"]:
+        print_comparisons(report["runs"])
+    else:
+        print("  Not enough runs of this version set yet.")
+
+    version_sets = report["version_sets"]
+    print("\nAgainst the previous version set:")
+    if not version_sets:
+        print("  No previous version set recorded.")
+        return
+    print(f"  {version_sets['previous']} -> {version_sets['current']}")
+    for module, change in version_sets["changed_versions"].items():
+        print(f"    {module}: {change['previous']} -> {change['current']}")
+    if version_sets["modules"]:
+        print_comparisons(version_sets["modules"])
+    else:
+        print("  Not enough runs of the previous version set yet.")
+
+def print_runs(db: sqlite3.Connection, stack: str, limit: int):
+    """Prints the most recent runs."""
+    query = "SELECT * FROM runs" + (" WHERE stack = ?" if stack else "") + " ORDER BY started_at DESC, id DESC LIMIT ?"
+    rows = db.execute(query, ((stack,) if stack else ()) + (limit,)).fetchall()
+    print(f"{'id':>5}  {'started':<16}  {'stack':<16} {'kind':<10} {'version set':<12} {'seconds':>8}  outcome")
+    for row in rows:
+        started = time.strftime("%Y-%m-%d %H:%M", time.localtime(row["started_at"]))
+        duration = f"{row['duration_seconds']:.0f}" if row["duration_seconds"] is not None else "-"
+        print(f"{row['id']:>5}  {started:<16}  {row['stack']:<16} {row['kind']:<10} {row['version_set']:<12} {duration:>8}  {row['outcome']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Record and compare Kargo deploy performance history.")
+    parser.add_argument("--db", default=os.environ.get("KARGO_HISTORY_DB", DEFAULT_DATABASE), help="SQLite history database.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record = subparsers.add_parser("record", help="Record a `pulumi up` run.")
+    record.add_argument("--event-log", help="The `pulumi up --event-log` file.")
+    record.add_argument("--metrics", help="The KARGO_METRICS_FILE written by the program.")
+    record.add_argument("--stack", help="Stack name, defaults to the stack in the metrics file.")
+    record.add_argument("--kind", default="up", help="Kind of run, e.g. 'initial' or 'converge'. Only runs of the same kind are compared.")
+    record.add_argument("--exit-code", type=int, help="The `pulumi up` exit code.")
+
+    runs = subparsers.add_parser("runs", help="List recorded runs.")
+    runs.add_argument("--stack", help="Only list runs of this stack.")
+    runs.add_argument("--limit", type=int, default=20)
+
+    report = subparsers.add_parser("report", help="Flag significant slowdowns between runs and version sets.")
+    report.add_argument("--stack", required=True)
+    report.add_argument("--kind", default="up")
+    report.add_argument("--metric", choices=METRICS, default="duration_seconds")
+    report.add_argument("--window", type=int, default=20, help="Maximum runs per sample.")
+    report.add_argument("--alpha", type=float, default=0.05, help="Significance level.")
+    report.add_argument("--min-slowdown", type=float, default=0.1, help="Minimum relative slowdown to flag.")
+    report.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    report.add_argument("--fail-on-slowdown", action="store_true", help="Exit non-zero when a slowdown is flagged.")
+
+    args = parser.parse_args(argv)
+    db = connect(args.db)
+
+    if args.command == "record":
+        events = parse_event_log(args.event_log) if args.event_log and os.path.exists(args.event_log) else {}
+        metrics = {}
+        if args.metrics and os.path.exists(args.metrics):
+            with open(args.metrics, "r") as f:
+                metrics = json.load(f)
+        stack = args.stack or metrics.get("stack")
+        if not stack:
+            parser.error("--stack is required when the metrics file does not name the stack")
+        run_id = record_run(db, stack, args.kind, events, metrics, args.exit_code)
+        print(f"Recorded run #{run_id} of {stack} ({len(events.get('modules', {}))} modules)", file=sys.stderr)
+
+    elif args.command == "runs":
+        print_runs(db, args.stack, args.limit)
+
+    elif args.command == "report":
+        result = build_report(db, args.stack, args.kind, args.metric, args.window, args.alpha, args.min_slowdown)
+        if args.json:
+            json.dump(result, sys.stdout, indent=2, default=str)
+            print()
+        else:
+            print_report(result)
+        slowdowns = [c for c in result["runs"] + ((result["version_sets"] or {}).get("modules") or []) if c["slowdown"]]
+        if args.fail_on_slowdown and slowdowns:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
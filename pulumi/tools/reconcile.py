@@ -0,0 +1,352 @@
+"""
+Long-running reconcile mode.
+
+Runs the Kargo program in-process through the Pulumi Automation API, so that the
+version lock and imported modules stay loaded between updates. It watches the
+stack config file and the version lockfile. Each change is mapped to the affected
+modules, using the module boundaries of __main__.py and tools.attribution, and
+applied as a targeted update without a refresh.
+
+The queue and the last apply latency are served as JSON on /status and in the
+Prometheus text format on /metrics.
+
+Usage (from the pulumi directory, with .envrc sourced):
+    python -m tools.reconcile --stack <org>/kargo/<stack> --port 8420
+    curl -s localhost:8420/status
+"""
+import argparse
+import json
+import os
+import runpy
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yaml
+from pulumi import automation as auto
+
+from src.lib import helm_release, instrumentation, version_lock
+from tools.attribution import attribute_resource
+
+PULUMI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(PULUMI_DIR)
+
+# Config keys of module boundaries that are not named after their module in __main__.py
+CONFIG_MODULES = {
+    "vm": "ubuntu_vm",
+    "talos": "talos_cluster",
+}
+
+# Config keys affecting every module, changes to them trigger a full update
+GLOBAL_CONFIG_KEYS = {"kubernetes", "version_lock", "outputs", "sizing", "helm_values_validation", "priority_classes"}
+
+# Lockfile components resolved by each module
+LOCK_COMPONENT_MODULES = {
+    "cilium": "cilium",
+    "cert-manager": "cert_manager",
+    "kubevirt": "kubevirt",
+    "cdi": "cdi",
+    "cnao": "cnao",
+    "hostpath-provisioner": "hostpath_provisioner",
+    "kube-prometheus-stack": "prometheus",
+    "kubernetes-dashboard": "kubernetes_dashboard",
+    "ingress-nginx": "ingress_nginx",
+    "openunison-operator": "openunison",
+    "orchestra": "openunison",
+    "orchestra-login-portal": "openunison",
+    "orchestra-kube-oidc-proxy": "openunison",
+    "rook-ceph": "ceph",
+    "metrics-server": "vpa",
+    "vpa": "vpa",
+    "goldilocks": "vpa",
+    "descheduler": "descheduler",
+    "pyroscope": "profiling",
+}
+
+# Marker for changes that cannot be narrowed down to modules
+ALL_MODULES = "*"
+
+def kargo_program():
+    """Inline program evaluating __main__.py in this process, keeping imported module caches warm."""
+    instrumentation.reset_module_metrics()
+    helm_release.reset_helm_releases()
+    runpy.run_path(os.path.join(PULUMI_DIR, "__main__.py"), run_name="__main__")
+
+def load_yaml(path: str) -> dict:
+    try:
+        with open(path, "r") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+
+def changed_keys(old: dict, new: dict) -> set:
+    """Returns the top-level keys whose values differ between two mappings."""
+    return {key for key in set(old) | set(new) if old.get(key) != new.get(key)}
+
+def config_modules(project: str, keys: set) -> set:
+    """Maps changed stack config keys to the affected modules."""
+    modules = set()
+    for key in keys:
+        namespace, _, name = key.partition(":")
+        if namespace != project or name in GLOBAL_CONFIG_KEYS:
+            return {ALL_MODULES}
+        modules.add(CONFIG_MODULES.get(name, name))
+    return modules
+
+def lock_modules(components: set) -> set:
+    """Maps changed lockfile components to the affected modules."""
+    modules = set()
+    for component in components:
+        if component not in LOCK_COMPONENT_MODULES:
+            return {ALL_MODULES}
+        modules.add(LOCK_COMPONENT_MODULES[component])
+    return modules
+
+def create_workspace_project(work_dir: str) -> str:
+    """
+    Creates the reconcile workspace project next to the repository project.
+
+    The repository project refreshes on every update (`options.refresh: always`),
+    which the Automation API cannot turn off per update. The reconcile workspace
+    uses a copy of the project without that option, reading the same stack config.
+
+    Args:
+        work_dir (str): The workspace directory.
+
+    Returns:
+        str: The project name.
+    """
+    project = load_yaml(os.path.join(REPO_DIR, "Pulumi.yaml"))
+    project.pop("options", None)
+    project.pop("main", None)
+    project["runtime"] = {"name": "python"}
+    project["stackConfigDir"] = os.path.relpath(
+        os.path.join(REPO_DIR, project.get("stackConfigDir", ".")), work_dir
+    )
+
+    # Relative kubeconfig paths are relative to the repository root
+    kubernetes = (project.get("config") or {}).get("kubernetes", {}).get("value") or {}
+    if kubernetes.get("kubeconfig") and not os.path.isabs(kubernetes["kubeconfig"]):
+        kubernetes["kubeconfig"] = os.path.join(REPO_DIR, kubernetes["kubeconfig"])
+
+    os.makedirs(work_dir, exist_ok=True)
+    with open(os.path.join(work_dir, "Pulumi.yaml"), "w") as f:
+        f.write("# Generated by tools/reconcile.py from the repository Pulumi.yaml, do not edit.\n")
+        yaml.safe_dump(project, f, default_flow_style=False, sort_keys=False)
+    return project["name"]
+
+class Reconciler:
+    """Watches the stack config and lockfile and applies changes as targeted updates."""
+
+    def __init__(self, stack: auto.Stack, project: str, config_path: str, lockfile_path: str, debounce: float):
+        self.stack = stack
+        self.project = project
+        self.config_path = config_path
+        self.lockfile_path = lockfile_path
+        self.debounce = debounce
+
+        self.config = (load_yaml(config_path).get("config") or {})
+        self.lock = load_yaml(lockfile_path)
+        self.mtimes = self._mtimes()
+
+        self.queue = []
+        self.condition = threading.Condition()
+        self.state = "idle"
+        self.last_apply = None
+        self.applies = 0
+        self.failures = 0
+
+    def _mtimes(self):
+        return {path: os.path.getmtime(path) if os.path.exists(path) else None for path in (self.config_path, self.lockfile_path)}
+
+    def enqueue(self, reason: str, modules: set):
+        with self.condition:
+            self.queue.append({"reason": reason, "modules": sorted(modules), "enqueued_at": time.time()})
+            self.condition.notify()
+
+    def poll(self):
+        """Detects config and lockfile changes and enqueues the affected modules."""
+        mtimes = self._mtimes()
+        if mtimes == self.mtimes:
+            return
+        self.mtimes = mtimes
+
+        config = load_yaml(self.config_path).get("config") or {}
+        keys = changed_keys(self.config, config)
+        self.config = config
+        if keys:
+            self.enqueue(f"config: {', '.join(sorted(keys))}", config_modules(self.project, keys))
+
+        lock = load_yaml(self.lockfile_path)
+        components = changed_keys(self.lock, lock)
+        self.lock = lock
+        if components:
+            version_lock.reload_version_lock()
+            self.enqueue(f"lockfile: {', '.join(sorted(components))}", lock_modules(components))
+
+    def watch(self, interval: float):
+        while True:
+            try:
+                self.poll()
+            except (OSError, yaml.YAMLError) as e:
+                print(f"reconcile: skipping unreadable change: {e}", file=sys.stderr)
+            time.sleep(interval)
+
+    def module_targets(self, modules: set):
+        """Returns the URNs of the resources of the given modules, or None when a full update is needed."""
+        if ALL_MODULES in modules:
+            return None
+        resources = self.stack.export_stack().deployment.get("resources") or []
+        resources_by_urn = {resource["urn"]: resource for resource in resources}
+        targets = {module: [] for module in modules}
+        for resource in resources:
+            if resource["type"] == "pulumi:pulumi:Stack" or resource["type"].startswith("pulumi:providers:"):
+                continue
+            module = attribute_resource(resource, resources_by_urn)
+            if module in targets:
+                targets[module].append(resource["urn"])
+
+        # Newly enabled modules have no resources yet, their URNs are only known to the program
+        if any(not urns for urns in targets.values()):
+            return None
+        return sorted(urn for urns in targets.values() for urn in urns)
+
+    def apply(self, batch: list):
+        """Applies a batch of queued changes as a single targeted update."""
+        modules = set().union(*(set(item["modules"]) for item in batch))
+        started = time.time()
+        self.state = "applying"
+        result = {"modules": sorted(modules), "reasons": [item["reason"] for item in batch]}
+        try:
+            targets = self.module_targets(modules)
+            result["full"] = targets is None
+            result["targets"] = len(targets or [])
+            print(f"reconcile: applying {', '.join(sorted(modules))} ({'full update' if targets is None else f'{len(targets)} targets'})", file=sys.stderr)
+            up = self.stack.up(
+                target=targets,
+                target_dependents=True if targets else None,
+                on_output=lambda line: print(line, file=sys.stderr),
+            )
+            result["result"] = up.summary.result
+            result["changes"] = up.summary.resource_changes
+        except auto.CommandError as e:
+            self.failures += 1
+            result["result"] = "failed"
+            result["error"] = str(e).strip().splitlines()[-1] if str(e).strip() else "update failed"
+        finally:
+            finished = time.time()
+            self.applies += 1
+            self.state = "idle"
+            # The program records newly resolved versions in the lockfile itself, do not re-apply them
+            self.lock = load_yaml(self.lockfile_path)
+            self.mtimes = self._mtimes()
+            result["started_at"] = started
+            result["apply_seconds"] = finished - started
+            # Latency from the first detected change to the update completing
+            result["latency_seconds"] = finished - min(item["enqueued_at"] for item in batch)
+            self.last_apply = result
+            print(f"reconcile: {result['result']} in {result['latency_seconds']:.1f}s", file=sys.stderr)
+
+    def run(self):
+        """Applies queued changes, coalescing those arriving within the debounce window."""
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+            time.sleep(self.debounce)
+            with self.condition:
+                batch, self.queue = self.queue, []
+            self.apply(batch)
+
+    def status(self) -> dict:
+        with self.condition:
+            queue = list(self.queue)
+        return {
+            "stack": self.stack.name,
+            "state": self.state,
+            "queue": queue,
+            "last_apply": self.last_apply,
+            "applies": self.applies,
+            "failures": self.failures,
+        }
+
+    def metrics(self) -> str:
+        status = self.status()
+        last_apply = status["last_apply"] or {}
+        lines = [
+            "# TYPE kargo_reconcile_queue_length gauge",
+            f"kargo_reconcile_queue_length {len(status['queue'])}",
+            "# TYPE kargo_reconcile_applying gauge",
+            f"kargo_reconcile_applying {int(status['state'] == 'applying')}",
+            "# TYPE kargo_reconcile_applies_total counter",
+            f"kargo_reconcile_applies_total {status['applies']}",
+            "# TYPE kargo_reconcile_failures_total counter",
+            f"kargo_reconcile_failures_total {status['failures']}",
+        ]
+        if last_apply:
+            lines += [
+                "# TYPE kargo_reconcile_last_apply_latency_seconds gauge",
+                f"kargo_reconcile_last_apply_latency_seconds {last_apply['latency_seconds']:.3f}",
+                "# TYPE kargo_reconcile_last_apply_duration_seconds gauge",
+                f"kargo_reconcile_last_apply_duration_seconds {last_apply['apply_seconds']:.3f}",
+            ]
+        return "\n".join(lines) + "\n"
+
+def serve_status(reconciler: Reconciler, port: int):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/status":
+                body, content_type = json.dumps(reconciler.status(), indent=2, default=str), "application/json"
+            elif self.path == "/metrics":
+                body, content_type = reconciler.metrics(), "text/plain; version=0.0.4"
+            else:
+                self.send_response(404)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.end_headers()
+            self.wfile.write(body.encode("utf-8"))
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply Kargo stack config changes incrementally with a warm in-process program.")
+    parser.add_argument("--stack", required=True, help="Fully qualified stack name, e.g. <org>/kargo/<stack>.")
+    parser.add_argument("--port", type=int, default=8420, help="Port of the /status and /metrics endpoints.")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between file change checks.")
+    parser.add_argument("--debounce", type=float, default=2.0, help="Seconds to wait for more changes before applying.")
+    parser.add_argument("--initial-up", action="store_true", help="Run a full update on start instead of a preview.")
+    parser.add_argument("--work-dir", default=os.path.join(REPO_DIR, ".pulumi", "reconcile"), help="Automation API workspace directory.")
+    args = parser.parse_args(argv)
+
+    project = create_workspace_project(args.work_dir)
+    workspace = auto.LocalWorkspace(work_dir=args.work_dir, program=kargo_program)
+    stack = auto.Stack.select(args.stack, workspace)
+
+    stack_name = args.stack.split("/")[-1]
+    project_settings = load_yaml(os.path.join(REPO_DIR, "Pulumi.yaml"))
+    config_path = os.path.join(REPO_DIR, project_settings.get("stackConfigDir", "."), f"Pulumi.{stack_name}.yaml")
+    lockfile_path = os.path.join(PULUMI_DIR, version_lock.LOCKFILE_DIR, f"{stack_name}.versions.lock.yaml")
+
+    # Load the program, and converge the stack if asked to
+    print(f"reconcile: {'updating' if args.initial_up else 'previewing'} {args.stack} to warm the program caches", file=sys.stderr)
+    if args.initial_up:
+        stack.up(on_output=lambda line: print(line, file=sys.stderr))
+    else:
+        stack.preview()
+
+    reconciler = Reconciler(stack, project, config_path, lockfile_path, args.debounce)
+    serve_status(reconciler, args.port)
+    threading.Thread(target=reconciler.watch, args=(args.interval,), daemon=True).start()
+    print(f"reconcile: watching {config_path} and {lockfile_path}, status on http://127.0.0.1:{args.port}/status", file=sys.stderr)
+    reconciler.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+Right-sizing report.
+
+Compares the VerticalPodAutoscaler recommendations recorded by the vpa module with
+the resource requests each Kargo module sets on its workloads. For the components
+sized by src/lib/sizing.py it also suggests the smallest sizing profile covering
+the recommendation.
+
+Usage (from the pulumi directory):
+    python -m tools.rightsizing_report
+    python -m tools.rightsizing_report --kubeconfig ../.kube/config --module cert_manager --json
+"""
+import argparse
+import json
+import sys
+
+from kubernetes.utils import parse_quantity
+
+from src.lib.sizing import COMPONENT_REQUESTS, SIZING_PROFILES, scale_quantity
+from tools.attribution import NAMESPACE_MODULES, module_for_name
+
+RESOURCES = ("cpu", "memory")
+
+# Workload kinds a VPA can target, and their read functions on the apps/v1 API
+WORKLOAD_READERS = {
+    "Deployment": "read_namespaced_deployment",
+    "DaemonSet": "read_namespaced_daemon_set",
+    "StatefulSet": "read_namespaced_stateful_set",
+    "ReplicaSet": "read_namespaced_replica_set",
+}
+
+def workload_module(namespace: str, name: str) -> str:
+    """Returns the Kargo module owning a workload, by name and then by namespace."""
+    return module_for_name(name) or NAMESPACE_MODULES.get(namespace) or "other"
+
+def format_quantity(resource: str, value) -> str:
+    """Formats a cpu quantity in millicores and a memory quantity in MiB."""
+    if value is None:
+        return "-"
+    if resource == "cpu":
+        return f"{int(value * 1000)}m"
+    return f"{int(value / (1024 * 1024))}Mi"
+
+def verdict(request, lower, upper) -> str:
+    """Classifies a request against the VPA lower and upper bounds."""
+    if request is None:
+        return "missing"
+    if lower is not None and request < lower:
+        return "under"
+    if upper is not None and request > upper:
+        return "over"
+    return "ok"
+
+def suggest_profile(module: str, target: dict) -> str:
+    """Returns the smallest sizing profile whose requests cover a recommendation, or None."""
+    if module not in COMPONENT_REQUESTS:
+        return None
+    for profile, settings in SIZING_PROFILES.items():
+        requests = COMPONENT_REQUESTS[module]
+        if all(
+            target.get(resource) is None
+            or parse_quantity(scale_quantity(requests[resource], settings["scale"])) >= target[resource]
+            for resource in RESOURCES if resource in requests
+        ):
+            return profile
+    return "override"
+
+def _quantities(resources: dict) -> dict:
+    return {resource: parse_quantity(resources[resource]) for resource in RESOURCES if resource in (resources or {})}
+
+def compare(vpa: dict, workload: dict) -> list:
+    """
+    Compares the container recommendations of a VPA with its target workload requests.
+
+    Args:
+        vpa (dict): The VerticalPodAutoscaler object.
+        workload (dict): The target workload object, or None when it no longer exists.
+
+    Returns:
+        list: One row per recommended container.
+    """
+    namespace = vpa["metadata"]["namespace"]
+    target_ref = vpa["spec"]["targetRef"]
+    module = workload_module(namespace, target_ref["name"])
+
+    containers = {}
+    if workload:
+        pod_spec = workload.get("spec", {}).get("template", {}).get("spec", {})
+        for container in pod_spec.get("containers", []):
+            containers[container["name"]] = _quantities((container.get("resources") or {}).get("requests"))
+
+    rows = []
+    recommendation = (vpa.get("status") or {}).get("recommendation") or {}
+    for container in recommendation.get("containerRecommendations", []):
+        name = container["containerName"]
+        requests = containers.get(name, {})
+        target = _quantities(container.get("target"))
+        lower = _quantities(container.get("lowerBound"))
+        upper = _quantities(container.get("upperBound"))
+
+        row = {
+            "module": module,
+            "namespace": namespace,
+            "workload": f"{target_ref['kind']}/{target_ref['name']}",
+            "container": name,
+            "profile": suggest_profile(module, target),
+        }
+        for resource in RESOURCES:
+            row[resource] = {
+                "request": format_quantity(resource, requests.get(resource)),
+                "target": format_quantity(resource, target.get(resource)),
+                "lower": format_quantity(resource, lower.get(resource)),
+                "upper": format_quantity(resource, upper.get(resource)),
+                "verdict": verdict(requests.get(resource), lower.get(resource), upper.get(resource)),
+            }
+        rows.append(row)
+    return rows
+
+def collect_report(kubeconfig: str = None, context: str = None, namespace: str = None) -> list:
+    """Collects the report rows of every VPA with a recommendation."""
+    from kubernetes import client, config
+    from kubernetes.client.rest import ApiException
+
+    config.load_kube_config(config_file=kubeconfig, context=context)
+    api_client = client.ApiClient()
+    custom_api = client.CustomObjectsApi(api_client)
+    apps_api = client.AppsV1Api(api_client)
+
+    if namespace:
+        vpas = custom_api.list_namespaced_custom_object("autoscaling.k8s.io", "v1", namespace, "verticalpodautoscalers")
+    else:
+        vpas = custom_api.list_cluster_custom_object("autoscaling.k8s.io", "v1", "verticalpodautoscalers")
+
+    rows = []
+    for vpa in vpas.get("items", []):
+        target_ref = vpa["spec"].get("targetRef") or {}
+        reader = WORKLOAD_READERS.get(target_ref.get("kind"))
+        if not reader:
+            continue
+        try:
+            workload = getattr(apps_api, reader)(target_ref["name"], vpa["metadata"]["namespace"])
+            workload = api_client.sanitize_for_serialization(workload)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            workload = None
+        rows.extend(compare(vpa, workload))
+
+    return sorted(rows, key=lambda row: (row["module"], row["namespace"], row["workload"], row["container"]))
+
+def print_report(rows: list):
+    """Prints a human readable right-sizing report."""
+    if not rows:
+        print("No VPA recommendations yet, the recommender needs a few minutes of metrics after the vpa module is deployed.")
+        return
+
+    print(f"  {'module':<20} {'workload':<48} {'container':<24} {'cpu req':>8} {'target':>8} {'':<8} {'mem req':>8} {'target':>8} {'':<8} profile")
+    for row in rows:
+        cpu, memory = row["cpu"], row["memory"]
+        print(
+            f"  {row['module']:<20} {row['namespace'] + '/' + row['workload']:<48} {row['container']:<24}"
+            f" {cpu['request']:>8} {cpu['target']:>8} {cpu['verdict']:<8}"
+            f" {memory['request']:>8} {memory['target']:>8} {memory['verdict']:<8} {row['profile'] or '-'}"
+        )
+
+    counts = {}
+    for row in rows:
+        for resource in RESOURCES:
+            counts[row[resource]["verdict"]] = counts.get(row[resource]["verdict"], 0) + 1
+    print("\n" + ", ".join(f"{count} {name}" for name, count in sorted(counts.items())))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare VPA recommendations with the requests of Kargo workloads.")
+    parser.add_argument("--kubeconfig", help="Kubeconfig file, defaults to KUBECONFIG or ~/.kube/config.")
+    parser.add_argument("--context", help="Kubeconfig context.")
+    parser.add_argument("--namespace", help="Only report the VPAs of one namespace.")
+    parser.add_argument("--module", help="Only report the workloads of one Kargo module.")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    parser.add_argument("--fail-on", choices=["missing", "under", "over"], action="append", default=[], help="Exit non-zero when any container gets this verdict.")
+    args = parser.parse_args(argv)
+
+    rows = collect_report(args.kubeconfig, args.context, args.namespace)
+    if args.module:
+        rows = [row for row in rows if row["module"] == args.module]
+
+    if args.json:
+        json.dump(rows, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(rows)
+
+    if any(row[resource]["verdict"] in args.fail_on for row in rows for resource in RESOURCES):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
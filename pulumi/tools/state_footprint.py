@@ -0,0 +1,195 @@
+"""
+Stack checkpoint footprint analyzer.
+
+Attributes the bytes of an exported stack checkpoint to Kargo modules, resources
+and the largest fields within them (Helm values, CRD schemas, manifests), and
+optionally tracks the totals over time.
+
+Usage (from the pulumi directory):
+    pulumi stack export --file /tmp/checkpoint.json
+    python -m tools.state_footprint /tmp/checkpoint.json --history ../.pulumi/state-footprint.jsonl
+
+    # or export the selected stack directly
+    python -m tools.state_footprint --stack <org>/kargo/<stack>
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from tools.attribution import attribute_resource, urn_name, urn_type
+
+def json_size(value) -> int:
+    """Returns the size in bytes of a value serialized as compact JSON."""
+    return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+
+def classify_field(resource_type: str, path: str) -> str:
+    """Returns the contributor category of a field path within a resource."""
+    if path.endswith("kubectl.kubernetes.io/last-applied-configuration") or "__inputs" in path:
+        return "last-applied-configuration"
+    if resource_type.endswith("CustomResourceDefinition") and ".spec" in path:
+        return "crd-schema"
+    if resource_type.startswith("kubernetes:helm.sh") and path.split(".")[1] in ("values", "valueYamlFiles"):
+        return "helm-values"
+    if path.split(".")[1] in ("manifest", "resourceNames", "resources"):
+        return "manifest"
+    if resource_type == "kubernetes:core/v1:Secret" or resource_type == "kubernetes:core/v1:ConfigMap":
+        return "data"
+    return "other"
+
+def collect_fields(value, path: str, depth: int, fields: list):
+    """Collects (size, path) pairs of nested fields down to the given depth."""
+    if depth == 0 or not isinstance(value, dict):
+        fields.append((json_size(value), path))
+        return
+    for key, child in value.items():
+        collect_fields(child, f"{path}.{key}", depth - 1, fields)
+
+def analyze_checkpoint(checkpoint: dict, field_depth: int = 4) -> dict:
+    """
+    Analyzes an exported stack checkpoint.
+
+    Args:
+        checkpoint (dict): The `pulumi stack export` document.
+        field_depth (int): How deep to descend into inputs and outputs when sizing fields.
+
+    Returns:
+        dict: Totals, per-module and per-resource sizes and the largest field contributors.
+    """
+    deployment = checkpoint.get("deployment", checkpoint)
+    resources = deployment.get("resources") or []
+    resources_by_urn = {resource["urn"]: resource for resource in resources}
+
+    modules = defaultdict(lambda: {"bytes": 0, "resources": 0})
+    categories = defaultdict(int)
+    resource_sizes = []
+    fields = []
+
+    for resource in resources:
+        size = json_size(resource)
+        module = attribute_resource(resource, resources_by_urn)
+        modules[module]["bytes"] += size
+        modules[module]["resources"] += 1
+        resource_sizes.append({
+            "bytes": size,
+            "module": module,
+            "type": resource.get("type"),
+            "name": urn_name(resource["urn"]),
+        })
+
+        resource_fields = []
+        for section in ("inputs", "outputs"):
+            collect_fields(resource.get(section) or {}, section, field_depth, resource_fields)
+        for field_size, path in resource_fields:
+            category = classify_field(resource.get("type", ""), path)
+            categories[category] += field_size
+            fields.append({
+                "bytes": field_size,
+                "module": module,
+                "resource": f"{urn_type(resource['urn'])}::{urn_name(resource['urn'])}",
+                "path": path,
+                "category": category,
+            })
+
+    return {
+        "total_bytes": json_size(checkpoint),
+        "resource_count": len(resources),
+        "modules": dict(sorted(modules.items(), key=lambda item: item[1]["bytes"], reverse=True)),
+        "categories": dict(sorted(categories.items(), key=lambda item: item[1], reverse=True)),
+        "resources": sorted(resource_sizes, key=lambda item: item["bytes"], reverse=True),
+        "fields": sorted(fields, key=lambda item: item["bytes"], reverse=True),
+    }
+
+def record_history(history_path: str, stack: str, report: dict):
+    """Appends the totals of a report to the JSON lines history file and returns the previous entry."""
+    previous = None
+    try:
+        with open(history_path, "r") as f:
+            lines = [line for line in f if line.strip()]
+            previous = json.loads(lines[-1]) if lines else None
+    except FileNotFoundError:
+        pass
+
+    entry = {
+        "timestamp": int(time.time()),
+        "stack": stack,
+        "total_bytes": report["total_bytes"],
+        "resource_count": report["resource_count"],
+        "modules": {module: totals["bytes"] for module, totals in report["modules"].items()},
+    }
+    with open(history_path, "a") as f:
+        f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    return previous
+
+def format_bytes(size: int) -> str:
+    """Formats a byte count for humans."""
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+def print_report(report: dict, top: int, previous: dict = None):
+    """Prints a human readable footprint report."""
+    total = report["total_bytes"]
+    print(f"Checkpoint: {format_bytes(total)} across {report['resource_count']} resources")
+    if previous:
+        delta = total - previous["total_bytes"]
+        print(f"Change since {time.strftime('%Y-%m-%d %H:%M', time.localtime(previous['timestamp']))}: {'+' if delta >= 0 else ''}{format_bytes(delta)}")
+
+    print("\nBy module:")
+    for module, totals in report["modules"].items():
+        line = f"  {module:<24} {format_bytes(totals['bytes']):>12} {totals['bytes'] / total:>6.1%} {totals['resources']:>5} resources"
+        if previous and module in previous.get("modules", {}):
+            delta = totals["bytes"] - previous["modules"][module]
+            line += f"  ({'+' if delta >= 0 else ''}{format_bytes(delta)})"
+        print(line)
+
+    print("\nBy contributor category:")
+    for category, size in report["categories"].items():
+        print(f"  {category:<28} {format_bytes(size):>12} {size / total:>6.1%}")
+
+    print(f"\nTop {top} resources:")
+    for resource in report["resources"][:top]:
+        print(f"  {format_bytes(resource['bytes']):>12}  {resource['module']:<20} {resource['type']}::{resource['name']}")
+
+    print(f"\nTop {top} fields:")
+    for field in report["fields"][:top]:
+        print(f"  {format_bytes(field['bytes']):>12}  {field['category']:<26} {field['resource']} {field['path']}")
+
+def load_checkpoint(path: str, stack: str) -> dict:
+    """Loads a checkpoint from a file, stdin ("-") or `pulumi stack export`."""
+    if path == "-":
+        return json.load(sys.stdin)
+    if path:
+        with open(path, "r") as f:
+            return json.load(f)
+    command = ["pulumi", "stack", "export"] + (["--stack", stack] if stack else [])
+    return json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Attribute stack checkpoint bytes to Kargo modules and resources.")
+    parser.add_argument("checkpoint", nargs="?", help="Exported checkpoint file, '-' for stdin. Defaults to `pulumi stack export`.")
+    parser.add_argument("--stack", help="Stack to export when no checkpoint file is given.")
+    parser.add_argument("--top", type=int, default=15, help="Number of top resources and fields to show.")
+    parser.add_argument("--depth", type=int, default=4, help="Field depth within inputs/outputs to attribute bytes to.")
+    parser.add_argument("--history", help="JSON lines file to append totals to and compare against.")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON.")
+    args = parser.parse_args(argv)
+
+    checkpoint = load_checkpoint(args.checkpoint, args.stack)
+    report = analyze_checkpoint(checkpoint, args.depth)
+
+    previous = record_history(args.history, args.stack or args.checkpoint or "", report) if args.history else None
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(report, args.top, previous)
+
+if __name__ == "__main__":
+    main()
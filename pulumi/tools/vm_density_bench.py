@@ -0,0 +1,267 @@
+"""
+VM boot-time and density benchmark.
+
+Creates throwaway Talos VirtualMachinePools from the same spec builder as the
+talos module (src/vm/talos.generate_talos_vmpool_spec), one replica count at a
+time, and measures from pool creation to:
+  - DataVolume import done (phase Succeeded)
+  - VMI Running
+  - guest agent ready (VMI condition AgentConnected)
+
+It also records the per-node memory overhead: the node memory growth reported by
+metrics-server, and the memory the virt-launcher pods request beyond the guest
+memory. Each pool is deleted, and its volumes released, before the next count.
+
+Usage (from the pulumi directory):
+    python -m tools.vm_density_bench --replicas 1,10,50
+    python -m tools.vm_density_bench --replicas 10 --storage-class ssd --json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+from kubernetes.utils import parse_quantity
+
+from src.vm.talos import generate_talos_vmpool_spec
+
+DEFAULT_NAMESPACE = "vm-density-bench"
+DEFAULT_IMAGE = "docker.io/containercraft/talos:1.7.6"
+POLL_INTERVAL = 2
+
+# Milestones, as the key of the first time each VM reaches them
+MILESTONES = ("dv_imported", "vmi_running", "agent_ready")
+
+def percentiles(values: list) -> dict:
+    """Returns the p50, p95 and max of a list of durations, or None when empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    def q(p):
+        return values[min(len(values) - 1, max(0, int(round(p * len(values))) - 1))]
+    return {"p50": round(statistics.median(values), 1), "p95": round(q(0.95), 1), "max": round(values[-1], 1)}
+
+class Cluster:
+    """The Kubernetes API calls of the benchmark."""
+
+    def __init__(self, kubeconfig: str = None, context: str = None):
+        from kubernetes import client, config
+        from kubernetes.client.rest import ApiException
+
+        config.load_kube_config(config_file=kubeconfig, context=context)
+        self.ApiException = ApiException
+        self.core = client.CoreV1Api()
+        self.custom = client.CustomObjectsApi()
+
+    def ensure_namespace(self, namespace: str) -> bool:
+        """Creates a namespace when missing, returning whether it was created."""
+        try:
+            self.core.read_namespace(namespace)
+            return False
+        except self.ApiException as e:
+            if e.status != 404:
+                raise
+            self.core.create_namespace({"metadata": {"name": namespace, "labels": {"ccio.v1/app": "kargo"}}})
+            return True
+
+    def delete_namespace(self, namespace: str):
+        self.core.delete_namespace(namespace)
+
+    def node_memory(self) -> dict:
+        """Returns the memory usage of each node in bytes, or None without metrics-server."""
+        try:
+            nodes = self.custom.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "nodes")
+        except self.ApiException:
+            return None
+        return {node["metadata"]["name"]: int(parse_quantity(node["usage"]["memory"])) for node in nodes["items"]}
+
+    def create_pool(self, namespace: str, name: str, spec: dict):
+        self.custom.create_namespaced_custom_object("pool.kubevirt.io", "v1alpha1", namespace, "virtualmachinepools", {
+            "apiVersion": "pool.kubevirt.io/v1alpha1",
+            "kind": "VirtualMachinePool",
+            "metadata": {"name": name, "namespace": namespace, "labels": {"ccio.v1/app": "kargo"}},
+            "spec": spec,
+        })
+
+    def delete_pool(self, namespace: str, name: str):
+        try:
+            self.custom.delete_namespaced_custom_object(
+                "pool.kubevirt.io", "v1alpha1", namespace, "virtualmachinepools", name,
+                propagation_policy="Foreground")
+        except self.ApiException as e:
+            if e.status != 404:
+                raise
+
+    def data_volumes(self, namespace: str, prefix: str) -> list:
+        items = self.custom.list_namespaced_custom_object("cdi.kubevirt.io", "v1beta1", namespace, "datavolumes")["items"]
+        return [dv for dv in items if dv["metadata"]["name"].startswith(prefix)]
+
+    def vmis(self, namespace: str, pool: str) -> list:
+        return self.custom.list_namespaced_custom_object(
+            "kubevirt.io", "v1", namespace, "virtualmachineinstances",
+            label_selector=f"kubevirt.io/vmpool={pool}")["items"]
+
+    def launcher_pods(self, namespace: str, pool: str) -> list:
+        return self.core.list_namespaced_pod(namespace, label_selector=f"kubevirt.io=virt-launcher,kubevirt.io/vmpool={pool}").items
+
+    def pvcs(self, namespace: str, prefix: str) -> list:
+        return [pvc for pvc in self.core.list_namespaced_persistent_volume_claim(namespace).items if pvc.metadata.name.startswith(prefix)]
+
+def _agent_connected(vmi: dict) -> bool:
+    conditions = (vmi.get("status") or {}).get("conditions") or []
+    return any(c.get("type") == "AgentConnected" and c.get("status") == "True" for c in conditions)
+
+def measure_pool(cluster: Cluster, namespace: str, name: str, replicas: int, timeout: int, agent_timeout: int) -> dict:
+    """
+    Waits for the VMs of a pool to boot, recording when each VM reaches each milestone.
+
+    The guest agent is waited for at most agent_timeout seconds once all VMIs are
+    Running, since images without the agent never report it.
+
+    Returns:
+        dict: The seconds since pool creation to each milestone, per VM.
+    """
+    started = time.monotonic()
+    reached = {milestone: {} for milestone in MILESTONES}
+    all_running_at = None
+
+    while True:
+        elapsed = time.monotonic() - started
+        for dv in cluster.data_volumes(namespace, name):
+            if (dv.get("status") or {}).get("phase") == "Succeeded":
+                reached["dv_imported"].setdefault(dv["metadata"]["name"], elapsed)
+        for vmi in cluster.vmis(namespace, name):
+            if (vmi.get("status") or {}).get("phase") == "Running":
+                reached["vmi_running"].setdefault(vmi["metadata"]["name"], elapsed)
+            if _agent_connected(vmi):
+                reached["agent_ready"].setdefault(vmi["metadata"]["name"], elapsed)
+
+        if len(reached["vmi_running"]) >= replicas and all_running_at is None:
+            all_running_at = elapsed
+        if len(reached["agent_ready"]) >= replicas:
+            break
+        if all_running_at is not None and elapsed - all_running_at >= agent_timeout:
+            break
+        if elapsed >= timeout:
+            print(f"  timed out after {timeout}s: {len(reached['vmi_running'])}/{replicas} VMIs Running", file=sys.stderr)
+            break
+        time.sleep(POLL_INTERVAL)
+
+    return reached
+
+def launcher_overhead(cluster: Cluster, namespace: str, pool: str, guest_memory: int) -> dict:
+    """Returns the virt-launcher memory requests beyond the guest memory, summed per node, in bytes."""
+    overhead = defaultdict(int)
+    for pod in cluster.launcher_pods(namespace, pool):
+        requested = sum(
+            int(parse_quantity((container.resources.requests or {}).get("memory", "0")))
+            for container in pod.spec.containers
+        )
+        overhead[pod.spec.node_name or "unscheduled"] += requested - guest_memory
+    return dict(overhead)
+
+def teardown(cluster: Cluster, namespace: str, name: str, timeout: int):
+    """Deletes a pool and waits for its VMIs and volumes to be gone."""
+    cluster.delete_pool(namespace, name)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if not cluster.vmis(namespace, name) and not cluster.data_volumes(namespace, name) and not cluster.pvcs(namespace, name):
+            return
+        time.sleep(POLL_INTERVAL)
+    print(f"  warning: {namespace}/{name} not fully deleted after {timeout}s", file=sys.stderr)
+
+def run_density(cluster: Cluster, args, replicas: int) -> dict:
+    """Runs the benchmark for one replica count and returns its result."""
+    name = f"vm-density-{replicas}"
+    spec = generate_talos_vmpool_spec(
+        vm_pool_name=name,
+        namespace=args.namespace,
+        replicas=replicas,
+        cpu_cores=args.cpu_cores,
+        memory_size=args.memory_size,
+        root_disk_size=args.root_disk_size,
+        empty_disk_size="0",
+        image_address=args.image,
+        network_name=args.network,
+        running=True,
+    )
+    if args.storage_class:
+        for template in spec["virtualMachineTemplate"]["spec"]["dataVolumeTemplates"]:
+            template["spec"]["storage"]["storageClassName"] = args.storage_class
+
+    memory_before = cluster.node_memory()
+    print(f"Creating {args.namespace}/{name} with {replicas} VMs", file=sys.stderr)
+    cluster.create_pool(args.namespace, name, spec)
+    try:
+        reached = measure_pool(cluster, args.namespace, name, replicas, args.timeout, args.agent_timeout)
+        memory_after = cluster.node_memory()
+        overhead = launcher_overhead(cluster, args.namespace, name, int(parse_quantity(f"{args.memory_size}Gi")))
+    finally:
+        teardown(cluster, args.namespace, name, args.timeout)
+
+    nodes = {}
+    for node, requested in overhead.items():
+        nodes[node] = {"launcher_overhead_mib": round(requested / 2**20)}
+        if memory_before and memory_after and node in memory_before and node in memory_after:
+            nodes[node]["memory_growth_mib"] = round((memory_after[node] - memory_before[node]) / 2**20)
+
+    return {
+        "replicas": replicas,
+        "completed": {milestone: len(times) for milestone, times in reached.items()},
+        "seconds": {milestone: percentiles(list(times.values())) for milestone, times in reached.items()},
+        "overhead_per_vm_mib": round(sum(overhead.values()) / max(len(reached["vmi_running"]), 1) / 2**20),
+        "nodes": nodes,
+    }
+
+def print_report(results: list):
+    """Prints a human readable density report."""
+    def fmt(stats):
+        return f"{stats['p50']:>7.1f} {stats['p95']:>7.1f} {stats['max']:>7.1f}" if stats else f"{'-':>7} {'-':>7} {'-':>7}"
+
+    print(f"{'':>9}  {'DV imported (s)':^23}  {'VMI Running (s)':^23}  {'Agent ready (s)':^23}")
+    print(f"{'replicas':>9}  " + "  ".join(f"{'p50':>7} {'p95':>7} {'max':>7}" for _ in MILESTONES) + "  overhead/VM")
+    for result in results:
+        line = f"{result['replicas']:>9}  " + "  ".join(fmt(result["seconds"][milestone]) for milestone in MILESTONES)
+        print(f"{line}  {result['overhead_per_vm_mib']:>7} MiB")
+        incomplete = [f"{milestone} {count}/{result['replicas']}" for milestone, count in result["completed"].items() if count < result["replicas"]]
+        if incomplete:
+            print(f"{'':>11}incomplete: {', '.join(incomplete)}")
+        for node, stats in sorted(result["nodes"].items()):
+            growth = f", node memory +{stats['memory_growth_mib']} MiB" if "memory_growth_mib" in stats else ""
+            print(f"{'':>11}{node}: launcher overhead {stats['launcher_overhead_mib']} MiB{growth}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the boot time and density of throwaway Talos VirtualMachinePools.")
+    parser.add_argument("--replicas", default="1,10,50", help="Comma separated replica counts, benchmarked one at a time.")
+    parser.add_argument("--namespace", default=DEFAULT_NAMESPACE, help="Namespace of the throwaway pools, created when missing.")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="Talos container disk image imported by CDI.")
+    parser.add_argument("--network", default="default/br0", help="Multus NetworkAttachmentDefinition of the VM NIC.")
+    parser.add_argument("--storage-class", help="Storage class of the root disks, defaults to the cluster default.")
+    parser.add_argument("--cpu-cores", type=int, default=1)
+    parser.add_argument("--memory-size", default="2", help="Guest memory in GiB.")
+    parser.add_argument("--root-disk-size", default="8", help="Root disk size in GiB.")
+    parser.add_argument("--timeout", type=int, default=1800, help="Seconds to wait for all VMIs of a pool to run, and for teardown.")
+    parser.add_argument("--agent-timeout", type=int, default=120, help="Seconds to wait for guest agents once all VMIs run.")
+    parser.add_argument("--kubeconfig", help="Kubeconfig file, defaults to KUBECONFIG or ~/.kube/config.")
+    parser.add_argument("--context", help="Kubeconfig context.")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    args = parser.parse_args(argv)
+
+    cluster = Cluster(args.kubeconfig, args.context)
+    created = cluster.ensure_namespace(args.namespace)
+    try:
+        results = [run_density(cluster, args, int(replicas)) for replicas in args.replicas.split(",")]
+    finally:
+        if created:
+            cluster.delete_namespace(args.namespace)
+
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print_report(results)
+
+if __name__ == "__main__":
+    main()